@@ -3,19 +3,42 @@
 # ===========================================================
 # Standard library
 import os
+import json
+import time
 from datetime import datetime, timedelta
-from urllib.parse import urlparse
 from functools import wraps
 
 # Third-party
-from flask import Flask, render_template, request, redirect, session, flash, jsonify, url_for, send_file
+from flask import Flask, Response, render_template, request, redirect, session, flash, jsonify, url_for, send_file
 from werkzeug.utils import secure_filename
-from werkzeug.security import generate_password_hash
-import psycopg2
+import psycopg2.errors
 from psycopg2.extras import RealDictCursor
 from flask_apscheduler import APScheduler
-from werkzeug.security import check_password_hash
-from werkzeug.utils import secure_filename
+
+# Local
+import dashboard
+import db
+import downloads
+import enrollments
+import jobs
+import pagination
+import querylog
+import passwords
+import profiler
+import request_board
+import search
+import static_assets
+import uploads
+import images
+import metrics
+import ratelimit
+from db import get_db, get_cursor, load_children, pool_stats, DatabaseUnavailable
+from degraded import serve_stale
+from page_cache import cached_page, page_cache
+from ratelimit import Rate, rate_limited
+from student_context import student_contexts
+from registration import (registration_state, DEFAULT_OPEN_MESSAGE, DEFAULT_CLOSED_MESSAGE,
+                          STREAM_LIFETIME, STREAM_KEEPALIVE)
 
 
 # ===========================================================
@@ -23,85 +46,70 @@ from werkzeug.utils import secure_filename
 # ===========================================================
 app = Flask(__name__)
 app.secret_key = 'edu-boost-up-secret-key-2024'  # CHANGE WHEN GOING LIVE
-app.config['UPLOAD_FOLDER'] = os.path.join("static", "uploads")
+app.config['UPLOAD_FOLDER'] = uploads.UPLOAD_ROOT
+# Refuse oversized bodies before they are parsed; per-file limits are in uploads.py
+app.config['MAX_CONTENT_LENGTH'] = uploads.MAX_PDF_BYTES + uploads.MB
+# Let Apache / lighttpd send protected downloads (nginx uses DOWNLOAD_ACCEL_PREFIX, see downloads.py)
+app.config['USE_X_SENDFILE'] = os.getenv("USE_X_SENDFILE") == "1"
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf'}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# Hashed, precompressed, immutable static URLs behind url_for('static', ...)
+static_assets.init_app(app)
 
-# ===========================================================
-# LOCAL DATABASE CONFIG (fallback)
-# ===========================================================
-LOCAL_DB = {
-    'host': 'localhost',
-    'database': 'eduboostup',
-    'user': 'postgres',
-    'password': 'Admin2023',
-    'port': '5432'
-}
+# Thumbnail / WebP srcsets for uploaded photos (templates/responsive_image.html)
+app.jinja_env.globals['image_variants'] = images.variants
 
 
 # ===========================================================
-# START SCHEDULER
+# DATABASE (POOLED, ONE CONNECTION PER REQUEST)
 # ===========================================================
-scheduler = APScheduler()
-scheduler.init_app(app)
-scheduler.start()  # Start scheduler immediately
+db.init_app(app)
 
+# Prometheus metrics at /metrics (merged across gunicorn workers, see metrics.py)
+metrics.init_app(app)
 
-# ===========================================================
-# DATABASE CONNECTION HANDLER (LOCAL OR RAILWAY)
-# ===========================================================
-def get_db_connection():
-    """
-    Connect to Railway PostgreSQL if DATABASE_URL exists,
-    otherwise connect to the local PostgreSQL database.
-    """
-    try:
-        DATABASE_URL = os.getenv("DATABASE_URL")
+# Slow-query log always; repeated-statement (N+1) warnings in debug / test runs
+querylog.init_app(app)
 
-        if DATABASE_URL:
-            # -----------------------------------------------------------
-            # RAILWAY DATABASE CONNECTION
-            # -----------------------------------------------------------
-            result = urlparse(DATABASE_URL)
+# Admin-triggered request profiles (cProfile / stack sampler / tracemalloc, see profiler.py)
+profiler.init_app(app)
 
-            conn = psycopg2.connect(
-                database=result.path[1:],  # remove "/" at the start
-                user=result.username,
-                password=result.password,
-                host=result.hostname,
-                port=result.port
-            )
 
-            print("🌍 Connected to RAILWAY PostgreSQL")
-            return conn
+@app.errorhandler(DatabaseUnavailable)
+def database_unavailable(e):
+    print(f"❌ DATABASE CONNECTION ERROR: {e}")
+    return "❌ Database is busy or unavailable. Please try again shortly.", 503, {'Retry-After': '30'}
 
-        else:
-            # -----------------------------------------------------------
-            # LOCAL DATABASE CONNECTION
-            # -----------------------------------------------------------
-            conn = psycopg2.connect(
-                host=LOCAL_DB['host'],
-                database=LOCAL_DB['database'],
-                user=LOCAL_DB['user'],
-                password=LOCAL_DB['password'],
-                port=LOCAL_DB['port']
-            )
-
-            print("🖥 Connected to LOCAL PostgreSQL")
-            return conn
 
-    except Exception as e:
-        print(f"❌ DATABASE CONNECTION ERROR: {e}")
-        return None
+@app.errorhandler(413)
+def upload_too_large(e):
+    flash(f"File exceeds the {uploads.MAX_PDF_BYTES // uploads.MB}MB limit.", "danger")
+    return redirect(request.referrer or '/')
+
+
+# ===========================================================
+# START SCHEDULER
+# ===========================================================
+# Every worker runs a scheduler; jobs.run() lets only one of them execute each job
+app.config['SCHEDULER_JOB_DEFAULTS'] = {'coalesce': True, 'max_instances': 1}
+scheduler = APScheduler()
+scheduler.init_app(app)
+scheduler.start()  # Start scheduler immediately
 
 
 # ===========================================================
 # HOME ROUTE
 # ===========================================================
+def registration_version():
+    # Pages that change with the registration status are cached per status
+    return registration_state.current()['version']
+
+
 @app.route('/')
+@cached_page()
 def index():
     return render_template('index.html')
 
@@ -111,21 +119,83 @@ def index():
 # ===========================================================
 @app.route('/check-db')
 def check_db():
-    conn = get_db_connection()
-
-    if not conn:
-        return "❌ Could not connect to any database."
-
-    cursor = conn.cursor()
+    cursor = get_cursor()
     cursor.execute("SELECT NOW();")
     result = cursor.fetchone()
 
-    cursor.close()
-    conn.close()
-
     return f"✅ Database connected successfully! TIME = {result[0]}"
 
 
+@app.route('/check-db/pool')
+def check_db_pool():
+    # Per-worker pool size, saturation and checkout wait times
+    if session.get('user_role') not in ['admin', 'superadmin']:
+        return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify(pool_stats())
+
+
+@app.route('/check-db/passwords')
+def check_db_passwords():
+    # Hash cost and recent verification times for this worker
+    if session.get('user_role') not in ['admin', 'superadmin']:
+        return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify(passwords.stats())
+
+
+@app.route('/check-db/jobs')
+def check_db_jobs():
+    # Last run / last success of every scheduled job
+    if session.get('user_role') not in ['admin', 'superadmin']:
+        return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify(jobs.status())
+
+
+@app.route('/check-db/page-cache')
+def check_db_page_cache():
+    # Size, hit rate and evictions of this worker's anonymous page cache
+    if session.get('user_role') not in ['admin', 'superadmin']:
+        return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify(page_cache.stats())
+
+
+@app.route('/check-db/rate-limits')
+def check_db_rate_limits():
+    # Limited / shed counts per endpoint and the bucket backend in use
+    if session.get('user_role') not in ['admin', 'superadmin']:
+        return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify(ratelimit.stats())
+
+
+@app.route('/check-db/profiles')
+def check_db_profiles():
+    # Stored request profiles from every worker, newest first
+    if session.get('user_role') not in ['admin', 'superadmin']:
+        return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify(profiler.list_profiles())
+
+
+@app.route('/check-db/profiles/token')
+def check_db_profile_token():
+    # Signed token: send as X-Profile or ?_profile=<token> to profile matching requests
+    if session.get('user_role') not in ['admin', 'superadmin']:
+        return jsonify({'error': 'Unauthorized'}), 401
+    token = profiler.issue_token(mode=request.args.get('mode', 'cprofile'),
+                                 memory=request.args.get('mem') == '1',
+                                 endpoint=request.args.get('endpoint'))
+    return jsonify({'token': token, 'expires_in': profiler.TOKEN_MAX_AGE})
+
+
+@app.route('/check-db/profiles/<profile_id>/<fmt>')
+def check_db_profile_download(profile_id, fmt):
+    # fmt: json (metadata and memory), collapsed (flamegraph), pstats or txt (cProfile)
+    if session.get('user_role') not in ['admin', 'superadmin']:
+        return jsonify({'error': 'Unauthorized'}), 401
+    response = profiler.send_profile(profile_id, fmt)
+    if response is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return response
+
+
 # ===========================================================
 # SIGN UP PAGES AND RESET PASSWORD
 # ===========================================================
@@ -196,29 +266,13 @@ def luhn_check(id_num):
 
 
 @app.route('/signup', methods=['GET', 'POST'])
+@rate_limited(ip=Rate(20, 600), account=Rate(3, 600))
+@cached_page(registration_version)
 def signup():
-    # Check if registration is open
-    if request.method == 'GET':
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        try:
-            cur.execute("""
-                SELECT message FROM Notification 
-                WHERE notification_type = 'registration_status' 
-                ORDER BY date_sent DESC LIMIT 1
-            """)
-            notification = cur.fetchone()
-            
-            if notification and 'closed' in notification[0].lower():
-                return redirect('/registration-closed')
-                
-        except Exception as e:
-            print(f"Error checking registration status: {e}")
-        finally:
-            cur.close()
-            conn.close()
-    
+    # Check if registration is open (served from the per-worker cache)
+    if request.method == 'GET' and registration_state.is_closed():
+        return redirect('/registration-closed')
+
     if request.method == 'POST':
 
         student_id = request.form.get('student_id')
@@ -254,45 +308,29 @@ def signup():
             return render_template("singuperror.html",
                                    error_message="Invalid grade format.")
 
+        # Hash password (before borrowing a connection; this is the slow part)
+        hashed_password = passwords.hash_password(password)
+
         # --- CONNECT DB ---
-        conn = get_db_connection()
-        if not conn:
-            return render_template("singuperror.html",
-                                   error_message="Database connection failed.")
+        conn = get_db()
 
         try:
-            cur = conn.cursor()
-
-            # Check email
-            cur.execute("SELECT email FROM Student WHERE email=%s", (email,))
-            if cur.fetchone():
-                return render_template("singupIdUsed.html",
-                                       error_message="Email already registered.")
-
-            # Check student ID
-            cur.execute("SELECT student_id FROM Student WHERE student_id=%s", (student_id,))
-            if cur.fetchone():
-                return render_template("singupIdUsed.html",
-                                       error_message="Student ID already registered.")
-
-            # Hash password
-            hashed_password = generate_password_hash(password)
-
-            # Insert student
-            cur.execute("""
-                INSERT INTO Student (student_id, name, surname, email, password, grade, phone)
-                VALUES (%s,%s,%s,%s,%s,%s,%s)
-            """, (student_id, name, surname, email, password, grade, phone))
-
-            # Insert enrollment
-            cur.execute("""
-                INSERT INTO Enrollment (student_id, enrollment_days, days_remaining, status)
-                VALUES (%s, 0, 0, 'active')
-            """, (student_id,))
+            cur = get_cursor()
+
+            # Student and enrollment in one statement; duplicates are caught
+            # by the primary key / unique email constraints, not pre-checks
+            cur.execute(f"""
+                WITH new_student AS (
+                    INSERT INTO Student (student_id, name, surname, email, password, grade, phone)
+                    VALUES (%s,%s,%s,%s,%s,%s,%s)
+                    RETURNING student_id
+                ), new_enrollment AS (
+                    {enrollments.insert_for_sql('new_student')}
+                )
+                SELECT student_id FROM new_student
+            """, (student_id, name, surname, email, hashed_password, grade, phone))
 
             conn.commit()
-            cur.close()
-            conn.close()
 
             # Session
             session['user_id'] = student_id
@@ -307,9 +345,16 @@ def signup():
                                    grade=grade,
                                    age=age)
 
+        except psycopg2.errors.UniqueViolation as e:
+            conn.rollback()
+            if 'email' in (e.diag.constraint_name or ''):
+                message = "Email already registered."
+            else:
+                message = "Student ID already registered."
+            return render_template("singupIdUsed.html", error_message=message)
+
         except Exception as e:
-            if conn:
-                conn.close()
+            conn.rollback()
             return render_template("singuperror.html", error_message=f"Registration failed: {e}")
 
     return render_template("signup.html")
@@ -319,56 +364,82 @@ def signup():
 @scheduler.task('cron', id='reduce_days_job', hour=0, minute=0)
 def scheduled_reduce_days():
     print("⏰ Scheduled job triggered at midnight")
-    reduce_enrollment_days()
+    jobs.run('reduce_days')
+
+
+# Picks up runs missed while no process was up (or that failed)
+@scheduler.task('interval', id='catch_up_jobs', minutes=jobs.CATCH_UP_MINUTES)
+def scheduled_catch_up():
+    jobs.catch_up()
+
+
+# Recount the dashboard counters; just after midnight this also picks up
+# classes and enrollments that aged out
+@scheduler.task('cron', id='reconcile_dashboard_job', minute=5)
+def scheduled_reconcile_dashboard():
+    jobs.run('reconcile_dashboard')
+
+
+def run_reduce_days():
+    # Jobs run outside a request, so push an app context to borrow a pooled connection
+    with app.app_context():
+        return reduce_enrollment_days()
+
+
+def run_reconcile_dashboard():
+    with app.app_context():
+        conn = get_db()
+        dashboard.reconcile(get_cursor())
+        conn.commit()
+        return len(dashboard.COUNTERS)
 
 
 def reduce_enrollment_days():
-    """Reduce enrollment days by 1 for all active enrollments WITHOUT updating any date fields."""
-    conn = get_db_connection()
-    if not conn:
-        print("❌ DB connection failed for daily reduction")
-        return
-    
+    """
+    Mark enrollments whose expires_at has passed as expired WITHOUT updating any date fields.
+    days_remaining is derived from expires_at, so only lapsed rows are written.
+    """
     try:
-        cur = conn.cursor()
-        print("🔄 Running daily reduction WITHOUT updating date...")
+        conn = get_db()
+    except DatabaseUnavailable as e:
+        print(f"❌ DB connection failed for daily reduction: {e}")
+        raise
 
-        # Only reduce days_remaining (do NOT touch last_updated)
-        cur.execute("""
-            UPDATE Enrollment
-            SET days_remaining = days_remaining - 1
-            WHERE status = 'active'
-            AND days_remaining > 0
-        """)
-        
-        reduced = cur.rowcount
+    try:
+        cur = get_cursor()
+        print("🔄 Running daily expiry check WITHOUT updating date...")
 
         # Mark expired without touching last_updated
-        cur.execute("""
-            UPDATE Enrollment
-            SET status = 'expired'
-            WHERE status = 'active'
-            AND days_remaining <= 0
-        """)
-        
-        expired = cur.rowcount
+        expired_students = enrollments.expire_lapsed(cur)
+
+        # Cached days_remaining roll over by themselves (short TTL);
+        # only students whose status flipped need dropping now
+        if len(expired_students) > 100:
+            student_contexts.invalidate(cur)
+        else:
+            for student_id in set(expired_students):
+                student_contexts.invalidate(cur, student_id)
 
         conn.commit()
-        print(f"✅ Reduced: {reduced}, Expired: {expired}")
+        print(f"✅ Expired: {len(expired_students)}")
+        return len(expired_students)
 
     except Exception as e:
         conn.rollback()
         print("❌ Error:", str(e))
+        raise
+
 
-    finally:
-        cur.close()
-        conn.close()
+jobs.register('reduce_days', run_reduce_days, period='day')
+jobs.register('reconcile_dashboard', run_reconcile_dashboard, period='hour')
 
 
 # ===========================================================
 #  LOGIN FOR ALL USERS AND RESET PASSWORD
 # ===========================================================
 @app.route('/login', methods=['GET', 'POST'])
+@rate_limited(ip=Rate(30, 60), account=Rate(5, 300))
+@cached_page()
 def login():
     if request.method == 'POST':
         email = request.form.get('email')
@@ -380,70 +451,39 @@ def login():
                                 error='Please enter both email and password',
                                 email=email)
 
-        conn = get_db_connection()
-        if not conn:
-            return render_template('login.html', 
-                                error='Database connection failed. Please try again.',
-                                email=email)
-
         try:
-            cur = conn.cursor(cursor_factory=RealDictCursor)
+            conn = get_db()
+            cur = get_cursor(RealDictCursor)
 
-            # Check Student
-            cur.execute("""
-                SELECT * FROM Student 
-                WHERE email = %s AND password = %s AND status = 'active'
-            """, (email, password))
-            student = cur.fetchone()
-
-            if student:
-                session['user_id'] = student['student_id']
-                session['user_name'] = f"{student['name']} {student['surname']}"
-                session['grade'] = student['grade']
+            # One lookup across Student, Mentor and Admin, then verify the hash
+            principal = passwords.authenticate(cur, email, password)
+            conn.commit()  # keeps a transparent rehash, if there was one
+
+            if principal and principal['role'] == 'student':
+                session['user_id'] = principal['principal_id']
+                session['user_name'] = f"{principal['name']} {principal['surname']}"
+                session['grade'] = principal['grade']
                 session['user_role'] = 'student'
                 session['email'] = email
-                cur.close()
-                conn.close()
-                
+
                 # Redirect based on user role
                 return redirect('/student/dashboard')
 
-            # Check Mentor
-            cur.execute("""
-                SELECT * FROM Mentor
-                WHERE email = %s AND password = %s AND status = 'active'
-            """, (email, password))
-            mentor = cur.fetchone()
-            
-            if mentor:
-                session['user_id'] = mentor['mentor_id']
-                session['user_name'] = f"{mentor['name']} {mentor['surname']}"
+            if principal and principal['role'] == 'mentor':
+                session['user_id'] = int(principal['principal_id'])
+                session['user_name'] = f"{principal['name']} {principal['surname']}"
                 session['user_role'] = 'mentor'
                 session['email'] = email
-                cur.close()
-                conn.close()
                 return redirect('/employee/dashboard')
 
-            # Check Admin
-            cur.execute("""
-                SELECT * FROM Admin 
-                WHERE email = %s AND password = %s
-            """, (email, password))
-            admin = cur.fetchone()
-            
-            if admin:
-                session['user_id'] = admin['admin_id']
-                session['user_name'] = admin['name']
+            if principal and principal['role'] == 'admin':
+                session['user_id'] = int(principal['principal_id'])
+                session['user_name'] = principal['name']
                 session['user_role'] = 'admin'
-                session['role'] = admin['role']
+                session['role'] = principal['admin_role']
                 session['email'] = email
-                cur.close()
-                conn.close()
                 return redirect('/admin/dashboard')
 
-            cur.close()
-            conn.close()
-            
             # If no user found with these credentials
             return render_template('login.html', 
                                 error='Invalid email or password. Please try again.',
@@ -451,9 +491,6 @@ def login():
 
         except Exception as e:
             print("LOGIN ERROR:", e)
-            if conn:
-                cur.close()
-                conn.close()
             return render_template('login.html', 
                                 error='Server error. Please try again later.',
                                 email=email)
@@ -464,6 +501,8 @@ def login():
 
 # ---------- Step 1: Identity confirmation (Email only) ----------
 @app.route("/reset", methods=["GET", "POST"])
+@rate_limited(ip=Rate(10, 600), account=Rate(3, 900))
+@cached_page()
 def reset_request():
     if request.method == "POST":
         email = request.form.get("email").strip()
@@ -472,28 +511,24 @@ def reset_request():
             flash("❌ Please enter your email.", "danger")
             return render_template("reset_request.html")
 
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        try:
-            # Check if student exists
-            cur.execute("""
-                SELECT student_id, email 
-                FROM Student 
-                WHERE email = %s
-            """, (email,))
-            student = cur.fetchone()
-
-            if student:
-                # Save temporary session info for reset
-                session['reset_student_id'] = student['student_id']
-                session['reset_email'] = student['email']
-                flash("✅ Identity confirmed. You can now reset your password.", "success")
-                return redirect("/reset/password")
-            else:
-                flash("❌ Email not found. Please check and try again.", "danger")
-        finally:
-            cur.close()
-            conn.close()
+        cur = get_cursor(RealDictCursor)
+
+        # Check if student exists
+        cur.execute("""
+            SELECT student_id, email
+            FROM Student
+            WHERE email = %s
+        """, (email,))
+        student = cur.fetchone()
+
+        if student:
+            # Save temporary session info for reset
+            session['reset_student_id'] = student['student_id']
+            session['reset_email'] = student['email']
+            flash("✅ Identity confirmed. You can now reset your password.", "success")
+            return redirect("/reset/password")
+        else:
+            flash("❌ Email not found. Please check and try again.", "danger")
 
     return render_template("reset_request.html")
 
@@ -517,27 +552,23 @@ def reset_password():
             student_id = session['reset_student_id']
             email = session['reset_email']
 
-            conn = get_db_connection()
-            cur = conn.cursor()
-            try:
-                # Update student password (hashing recommended!)
-                cur.execute("""
-                    UPDATE Student 
-                    SET password = %s 
-                    WHERE student_id = %s AND email = %s
-                """, (new_password, student_id, email))
-                conn.commit()
+            cur = get_cursor()
+
+            # Update student password
+            cur.execute("""
+                UPDATE Student
+                SET password = %s
+                WHERE student_id = %s AND email = %s
+            """, (passwords.hash_password(new_password), student_id, email))
+            get_db().commit()
 
-                flash("✅ Password reset successful. Please log in.", "success")
+            flash("✅ Password reset successful. Please log in.", "success")
 
-                # Clear session info
-                session.pop('reset_student_id')
-                session.pop('reset_email')
+            # Clear session info
+            session.pop('reset_student_id')
+            session.pop('reset_email')
 
-                return redirect("/login")
-            finally:
-                cur.close()
-                conn.close()
+            return redirect("/login")
 
     return render_template("reset_password.html")
 
@@ -549,6 +580,7 @@ def reset_password():
 # STUDENT DASHBOARD
 # ------------------------------
 @app.route("/student/dashboard")
+@serve_stale
 def student_dashboard():
     # 1️⃣ Check student login
     if 'user_role' not in session or session['user_role'] != 'student':
@@ -557,49 +589,34 @@ def student_dashboard():
     student_id = session['user_id']
     grade = session.get('grade')
 
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-
-    try:
-        # 2️⃣ Get student profile
-        cur.execute("SELECT * FROM Student WHERE student_id = %s", (student_id,))
-        student = cur.fetchone()
-
-        if not student:
-            session.clear()
-            return redirect('/login')
+    # 2️⃣ Get student profile and enrollment (cached)
+    context = student_contexts.get(student_id)
 
-        # 3️⃣ Get OR create student enrollment
-        cur.execute("""
-            SELECT days_remaining FROM Enrollment
-            WHERE student_id = %s AND status = 'active'
-            ORDER BY enrollment_id DESC LIMIT 1
-        """, (student_id,))
-        enroll = cur.fetchone()
-
-        days_remaining = enroll['days_remaining'] if enroll else 0
+    if not context:
+        session.clear()
+        return redirect('/login')
 
-        # 4️⃣ Load mentors with images
-        cur.execute("""
-            SELECT mentor_id, name, surname, subject_speciality, bio, profile_image, phone
-            FROM Mentor
-            WHERE status = 'active'
-            ORDER BY name ASC
-        """)
-        mentors = cur.fetchall()
+    student = context['student']
+    days_remaining = context['days_remaining']
 
-        # 5️⃣ Load subjects for this student's grade
-        cur.execute("""
-            SELECT DISTINCT subject
-            FROM Content
-            WHERE grade = %s
-            ORDER BY subject
-        """, (grade,))
-        courses = cur.fetchall()
+    # 4️⃣ Load mentors with images
+    cur = get_cursor(RealDictCursor)
+    cur.execute("""
+        SELECT mentor_id, name, surname, subject_speciality, bio, profile_image, phone
+        FROM Mentor
+        WHERE status = 'active'
+        ORDER BY name ASC
+    """)
+    mentors = cur.fetchall()
 
-    finally:
-        cur.close()
-        conn.close()
+    # 5️⃣ Load subjects for this student's grade
+    cur.execute("""
+        SELECT DISTINCT subject
+        FROM Content
+        WHERE grade = %s
+        ORDER BY subject
+    """, (grade,))
+    courses = cur.fetchall()
 
     # 6️⃣ Render dashboard
     return render_template(
@@ -619,17 +636,15 @@ def student_profile():
 
     student_id = session['user_id']
 
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-
     # Fetch student info
-    cur.execute("SELECT * FROM Student WHERE student_id = %s", (student_id,))
-    student = cur.fetchone()
+    context = student_contexts.get(student_id)
 
-    if not student:
+    if not context:
         session.clear()
         return redirect('/login')
 
+    student = context['student']
+
     if request.method == 'POST':
         name = request.form.get('name')
         surname = request.form.get('surname')
@@ -640,15 +655,21 @@ def student_profile():
 
         image_path = student['profile_image']  # keep old one if no new upload
 
+        # Update student info
+        conn = get_db()
+        cur = get_cursor()
+
         # If user uploaded NEW IMAGE
         if profile_file and allowed_file(profile_file.filename):
-            filename = secure_filename(profile_file.filename)
-            save_path = os.path.join("static/uploads", filename)
-            profile_file.save(save_path)
+            try:
+                stored = uploads.store(cur, profile_file, uploads.IMAGE_TYPES, uploads.MAX_IMAGE_BYTES)
+            except uploads.UploadError as e:
+                flash(str(e), "error")
+                return redirect('/student/profile')
 
-            image_path = f"/static/uploads/{filename}"  # store as URL path
+            image_path = stored.url  # store as URL path
+            images.schedule(stored.name)
 
-        # Update student info
         cur.execute("""
             UPDATE Student
             SET name = %s,
@@ -658,10 +679,9 @@ def student_profile():
                 profile_image = %s
             WHERE student_id = %s
         """, (name, surname, phone, grade, image_path, student_id))
+        student_contexts.invalidate(cur, student_id)
 
         conn.commit()
-        cur.close()
-        conn.close()
 
         # Update session values
         session['user_name'] = f"{name} {surname}"
@@ -669,13 +689,11 @@ def student_profile():
 
         return redirect('/student/dashboard')
 
-    cur.close()
-    conn.close()
-
     return render_template("student_profile.html", student=student)
 
 
 @app.route("/student/classes")
+@serve_stale
 def student_classes():
     # FIXED: Added missing days_remaining and student object
     if 'user_role' not in session or session['user_role'] != 'student':
@@ -684,42 +702,29 @@ def student_classes():
     student_id = session['user_id']
     grade = session.get('grade')
 
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-
-    try:
-        # Get student details
-        cur.execute("SELECT * FROM Student WHERE student_id = %s", (student_id,))
-        student = cur.fetchone()
+    # Get student details and days_remaining (cached)
+    context = student_contexts.get(student_id)
 
-        if not student:
-            session.clear()
-            return redirect('/login')
+    if not context:
+        session.clear()
+        return redirect('/login')
 
-        # Get enrollment for days_remaining
-        cur.execute("""
-            SELECT days_remaining FROM Enrollment
-            WHERE student_id = %s AND status = 'active'
-            ORDER BY enrollment_id DESC LIMIT 1
-        """, (student_id,))
-        enroll = cur.fetchone()
+    student = context['student']
+    days_remaining = context['days_remaining']
 
-        days_remaining = enroll['days_remaining'] if enroll else 0
+    # Get classes for the student's grade
+    cur = get_cursor(RealDictCursor)
 
-        # Get classes for the student's grade
-        cur.execute("""
-            SELECT C.class_id, C.title, C.topic, C.type, C.start_time,
-                   C.duration, C.upload_date, C.link,
-                   M.name AS mentor_name, M.surname AS mentor_surname
-            FROM Class C
-            LEFT JOIN Mentor M ON C.mentor_id = M.mentor_id
-            WHERE C.grade = %s
-            ORDER BY C.upload_date DESC
-        """, (grade,))
-        classes = cur.fetchall()
-    finally:
-        cur.close()
-        conn.close()
+    cur.execute("""
+        SELECT C.class_id, C.title, C.topic, C.type, C.start_time,
+               C.duration, C.upload_date, C.link,
+               M.name AS mentor_name, M.surname AS mentor_surname
+        FROM Class C
+        LEFT JOIN Mentor M ON C.mentor_id = M.mentor_id
+        WHERE C.grade = %s
+        ORDER BY C.upload_date DESC
+    """, (grade,))
+    classes = cur.fetchall()
 
     # FIXED: Now passing all required variables
     return render_template("student_classes.html", 
@@ -730,6 +735,7 @@ def student_classes():
 
 
 @app.route("/student/courses/<string:subject>/contents")
+@serve_stale
 def student_course_contents(subject):
     # Ensure student is logged in
     if 'user_role' not in session or session['user_role'] != 'student' or 'user_id' not in session:
@@ -737,65 +743,41 @@ def student_course_contents(subject):
 
     student_id = session['user_id']
 
-    conn = get_db_connection()
-    if not conn:
-        return "❌ Failed to connect to database", 500
+    # Get student's grade, info and days_remaining (cached)
+    context = student_contexts.get(student_id)
+    if not context or context['student']['status'] != 'active':
+        return "❌ Student not found or inactive", 404
 
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        # Get student's grade and info
-        cur.execute("""
-            SELECT name, surname, grade
-            FROM Student
-            WHERE student_id = %s AND status='active'
-            LIMIT 1
-        """, (student_id,))
-        student_result = cur.fetchone()
-        if not student_result:
-            return "❌ Student not found or inactive", 404
-
-        grade = student_result['grade']
-        student = {
-            'name': student_result['name'],
-            'surname': student_result['surname'],
-            'grade': grade
-        }
+    grade = context['student']['grade']
+    student = {
+        'name': context['student']['name'],
+        'surname': context['student']['surname'],
+        'grade': grade
+    }
+    days_remaining = context['days_remaining']
 
-        # Get enrollment for days_remaining
-        cur.execute("""
-            SELECT days_remaining FROM Enrollment
-            WHERE student_id = %s AND status = 'active'
-            ORDER BY enrollment_id DESC LIMIT 1
-        """, (student_id,))
-        enroll = cur.fetchone()
-        days_remaining = enroll['days_remaining'] if enroll else 0
-
-        # Get all content for this subject and grade
-        cur.execute("""
-            SELECT C.content_id, C.title, C.description, C.type,
-                   C.file_url, C.file_name, C.file_size_mb, C.upload_date,
-                   M.name AS mentor_name, M.surname AS mentor_surname
-            FROM Content C
-            LEFT JOIN Mentor M ON C.mentor_id = M.mentor_id
-            WHERE C.subject = %s AND C.grade = %s
-            ORDER BY C.upload_date DESC
-        """, (subject, grade))
-        contents = cur.fetchall()
-
-        # Get multiple video links for each content
-        content_links = {}
-        for content in contents:
-            cur.execute("""
-                SELECT file_link, upload_date 
-                FROM ContentRecord 
-                WHERE content_id = %s
-                ORDER BY upload_date DESC
-            """, (content['content_id'],))
-            content_links[content['content_id']] = cur.fetchall()
+    # Get all content for this subject and grade
+    cur = get_cursor(RealDictCursor)
 
-    finally:
-        cur.close()
-        conn.close()
+    cur.execute("""
+        SELECT C.content_id, C.title, C.description, C.type,
+               C.file_url, C.pdf_file IS NOT NULL AS has_pdf,
+               C.file_name, C.file_size_mb, C.upload_date,
+               M.name AS mentor_name, M.surname AS mentor_surname
+        FROM Content C
+        LEFT JOIN Mentor M ON C.mentor_id = M.mentor_id
+        WHERE C.subject = %s AND C.grade = %s
+        ORDER BY C.upload_date DESC
+    """, (subject, grade))
+    contents = cur.fetchall()
+
+    # Get multiple video links for all contents in one query
+    content_links = load_children("""
+        SELECT content_id, file_link, upload_date
+        FROM ContentRecord
+        WHERE content_id = ANY(%(ids)s)
+        ORDER BY upload_date DESC
+    """, [content['content_id'] for content in contents], key='content_id')
 
     return render_template(
         "course_contents.html",
@@ -808,7 +790,67 @@ def student_course_contents(subject):
     )
 
 
+# ===========================================================
+# PROTECTED DOWNLOADS (ENROLLMENT-CHECKED, RANGE / CONDITIONAL GET)
+# ===========================================================
+@app.route("/downloads/content/<int:content_id>")
+def download_content(content_id):
+    if 'user_role' not in session:
+        return redirect('/login')
+
+    found = downloads.content_file(get_cursor(), content_id)
+    if not found:
+        return "❌ File not found, or your enrollment does not include it", 404
+    return downloads.send(*found)
+
+
+@app.route("/downloads/requests/<int:request_id>")
+def download_request_file(request_id):
+    if 'user_role' not in session:
+        return redirect('/login')
+
+    found = downloads.request_file(get_cursor(), request_id)
+    if not found:
+        return "❌ File not found or access denied", 404
+    return downloads.send(*found)
+
+
+def _student_search_grade():
+    # Grade of the logged-in student with a current enrollment, else None
+    if session.get('user_role') != 'student' or 'user_id' not in session:
+        return None
+    context = student_contexts.get(session['user_id'])
+    if not context or not context['active_enrollment'] or context['days_remaining'] <= 0:
+        return None
+    return context['student']['grade']
+
+
+@app.route("/student/search")
+def student_search():
+    # Ranked full-text search over the student's grade
+    grade = _student_search_grade()
+    if grade is None:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    query = search.normalise(request.args.get('q'))
+    results = search.search(grade, query)
+    return jsonify({'query': query, 'results': results})
+
+
+@app.route("/student/search/suggest")
+def student_search_suggest():
+    # Typeahead titles for the search box
+    grade = _student_search_grade()
+    if grade is None:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    response = jsonify({'suggestions': search.suggest(grade, request.args.get('q'))})
+    response.headers['Cache-Control'] = 'private, max-age=60'
+    return response
+
+
 @app.route("/student/dashboard/courses")
+@serve_stale
 def student_courses():
     # 1️⃣ Ensure student is logged in
     if 'user_role' not in session or session['user_role'] != 'student':
@@ -817,27 +859,13 @@ def student_courses():
     student_id = session['user_id']
     grade = session.get('grade')
 
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-
     try:
-        # Get student info for sidebar
-        cur.execute("""
-            SELECT name, surname, grade
-            FROM Student
-            WHERE student_id = %s
-        """, (student_id,))
-        student = cur.fetchone()
+        # Get student info for sidebar (cached)
+        context = student_contexts.get(student_id)
+        student = context['student'] if context else None
 
         # 2️⃣ Check enrollment
-        cur.execute("""
-            SELECT days_remaining 
-            FROM Enrollment
-            WHERE student_id = %s AND status = 'active'
-            ORDER BY enrollment_id DESC
-            LIMIT 1
-        """, (student_id,))
-        enrollment = cur.fetchone()
+        enrollment = context['active_enrollment'] if context else None
 
         if not enrollment or enrollment['days_remaining'] <= 0:
             return redirect('/student/payment?expired=1')
@@ -845,6 +873,8 @@ def student_courses():
         days_remaining = enrollment['days_remaining']
 
         # 3️⃣ Get distinct subjects for the student's grade
+        cur = get_cursor(RealDictCursor)
+
         cur.execute("""
             SELECT DISTINCT subject
             FROM Content
@@ -858,9 +888,6 @@ def student_courses():
         subjects = []
         student = None
         days_remaining = 0
-    finally:
-        cur.close()
-        conn.close()
 
     return render_template(
         "student_courses.html", 
@@ -879,26 +906,19 @@ def student_request():
     student_id = session['user_id']
     grade = session.get('grade')
 
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    conn = get_db()
+    cur = get_cursor(RealDictCursor)
 
     try:
-        # Get student details for sidebar
-        cur.execute("SELECT * FROM Student WHERE student_id = %s", (student_id,))
-        student = cur.fetchone()
+        # Get student details and days_remaining for sidebar (cached)
+        context = student_contexts.get(student_id)
 
-        if not student:
+        if not context:
             session.clear()
             return redirect('/login')
 
-        # Get enrollment for days_remaining
-        cur.execute("""
-            SELECT days_remaining FROM Enrollment
-            WHERE student_id = %s AND status = 'active'
-            ORDER BY enrollment_id DESC LIMIT 1
-        """, (student_id,))
-        enroll = cur.fetchone()
-        days_remaining = enroll['days_remaining'] if enroll else 0
+        student = context['student']
+        days_remaining = context['days_remaining']
 
         # 2️⃣ Fetch all active mentors for dropdown
         cur.execute("""
@@ -920,10 +940,12 @@ def student_request():
             if 'pdf' in request.files:
                 file = request.files['pdf']
                 if file.filename != '':
-                    filename = secure_filename(file.filename)
-                    pdf_file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                    file.save(pdf_file_path)
-                    pdf_file_url = f"uploads/{filename}"  # store relative path in DB
+                    try:
+                        stored = uploads.store(cur, file, uploads.PDF_TYPES, uploads.MAX_PDF_BYTES)
+                    except uploads.UploadError as e:
+                        flash(str(e), "error")
+                        return redirect('/student/request')
+                    pdf_file_url = f"uploads/{stored.name}"  # store relative path in DB
 
             # 4️⃣ Insert request into DB
             cur.execute("""
@@ -945,10 +967,6 @@ def student_request():
         flash("Failed to send request. Please try again.", "error")
         success = False
 
-    finally:
-        cur.close()
-        conn.close()
-
     # 5️⃣ Render the form if GET or POST fails
     success = request.args.get('success') == 'true'
     return render_template("student_request.html", 
@@ -965,43 +983,37 @@ def student_enrollment():
     student_id = session['user_id']
     grade = session.get('grade')
 
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    # Get student details and latest enrollment (cached)
+    context = student_contexts.get(student_id)
 
-    try:
-        # Get student details
-        cur.execute("SELECT name, surname FROM Student WHERE student_id = %s", (student_id,))
-        student = cur.fetchone()
+    if not context:
+        session.clear()
+        return redirect('/login')
 
-        if not student:
-            session.clear()
-            return redirect('/login')
+    student = context['student']
+    latest = context['latest_enrollment']
+
+    if not latest:
+        # No enrollment found - redirect to payment
+        return redirect("/student/payment?no_enrollment=1")
+
+    # Enrollment info with student details
+    enrollment = {
+        'enrollment_id': latest['enrollment_id'],
+        'days_remaining': latest['days_remaining'],
+        'status': latest['status'],
+        'enrollment_date': latest['last_updated'],
+        'name': student['name'],
+        'surname': student['surname'],
+        'grade': student['grade']
+    }
 
-        # Get enrollment info with student details
-        cur.execute("""
-            SELECT e.enrollment_id, e.days_remaining, e.status, e.last_updated AS enrollment_date,
-                   s.name, s.surname, s.grade
-            FROM Enrollment e
-            JOIN Student s ON e.student_id = s.student_id
-            WHERE e.student_id = %s
-            ORDER BY e.enrollment_id DESC
-            LIMIT 1
-        """, (student_id,))
-        enrollment = cur.fetchone()
-
-        if not enrollment:
-            # No enrollment found - redirect to payment
-            return redirect("/student/payment?no_enrollment=1")
-        
-        if enrollment["status"] != "active" or enrollment["days_remaining"] <= 0:
-            # Enrollment expired - redirect to payment
-            return redirect("/student/payment?expired=1")
 
-        days_remaining = enrollment["days_remaining"]
+    if enrollment["status"] != "active" or enrollment["days_remaining"] <= 0:
+        # Enrollment expired - redirect to payment
+        return redirect("/student/payment?expired=1")
 
-    finally:
-        cur.close()
-        conn.close()
+    days_remaining = enrollment["days_remaining"]
 
     # ✅ Pass all required variables to template
     return render_template(
@@ -1032,30 +1044,13 @@ def student_payment():
     expired = request.args.get('expired')
     no_enrollment = request.args.get('no_enrollment')
     
-    # Get student info
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    
-    try:
-        cur.execute("SELECT name, surname, grade FROM Student WHERE student_id = %s", (student_id,))
-        student = cur.fetchone()
-        
-        # Get enrollment status
-        cur.execute("""
-            SELECT status, days_remaining 
-            FROM Enrollment 
-            WHERE student_id = %s 
-            ORDER BY enrollment_id DESC 
-            LIMIT 1
-        """, (student_id,))
-        enrollment = cur.fetchone()
-        
-        days_remaining = enrollment['days_remaining'] if enrollment else 0
+    # Get student info and enrollment status (cached)
+    context = student_contexts.get(student_id)
+    student = context['student'] if context else None
+    enrollment = context['latest_enrollment'] if context else None
+
+    days_remaining = enrollment['days_remaining'] if enrollment else 0
         
-    finally:
-        cur.close()
-        conn.close()
-    
     # Determine message based on why they're here
     if expired == '1':
         message = "Your enrollment has expired. Please renew your subscription to continue accessing content."
@@ -1104,6 +1099,7 @@ def mentor_required(f):
     return decorated
 
 @app.route('/employee/dashboard')
+@serve_stale
 def employee_dashboard():
     # ✅ Ensure user is logged in as mentor
     if 'user_role' not in session or session['user_role'] != 'mentor':
@@ -1112,25 +1108,18 @@ def employee_dashboard():
 
     mentor_id = session['user_id']  # use 'user_id' set during login
 
-    conn = get_db_connection()
-    if not conn:
-        return "❌ Failed to connect to database", 500
+    cur = get_cursor(RealDictCursor)
 
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        # Fetch mentor details
-        cur.execute("""
-            SELECT name, surname, subject_speciality, bio, profile_image, phone
-            FROM Mentor
-            WHERE mentor_id = %s AND status='active'
-        """, (mentor_id,))
-        mentor = cur.fetchone()
+    # Fetch mentor details
+    cur.execute("""
+        SELECT name, surname, subject_speciality, bio, profile_image, phone
+        FROM Mentor
+        WHERE mentor_id = %s AND status='active'
+    """, (mentor_id,))
+    mentor = cur.fetchone()
 
-        if not mentor:
-            return "❌ Mentor not found or inactive", 404
-    finally:
-        cur.close()
-        conn.close()
+    if not mentor:
+        return "❌ Mentor not found or inactive", 404
 
     # Render template with mentor dictionary
     return render_template('employee_dashboard.html', mentor=mentor)
@@ -1142,8 +1131,7 @@ def mentor_login():
         email = request.form.get('email')
         password_input = request.form.get('password')
 
-        conn = get_db_connection()
-        cur = conn.cursor()
+        cur = get_cursor()
 
         cur.execute("""
             SELECT mentor_id, name, surname, email, password, status
@@ -1152,20 +1140,20 @@ def mentor_login():
         """, (email,))
         mentor = cur.fetchone()
 
-        cur.close()
-        conn.close()
-
-        if mentor:
-            db_password = mentor[4]  # password column
+        # Hashed (or legacy plaintext, upgraded on success) password check
+        ok, needs_rehash = passwords.verify(mentor[4] if mentor else None, password_input)
+        if ok:
+            if needs_rehash:
+                cur.execute("UPDATE Mentor SET password = %s WHERE mentor_id = %s",
+                            (passwords.hash_password(password_input), mentor[0]))
+                get_db().commit()
 
-            # Compare raw password directly (no hashing)
-            if db_password == password_input:
-                session['mentor_id'] = mentor[0]
-                session['mentor_name'] = mentor[1] + " " + mentor[2]
-                session['mentor_email'] = mentor[3]
-                session['user_role'] = 'mentor'
+            session['mentor_id'] = mentor[0]
+            session['mentor_name'] = mentor[1] + " " + mentor[2]
+            session['mentor_email'] = mentor[3]
+            session['user_role'] = 'mentor'
 
-                return redirect('/employee/dashboard')
+            return redirect('/employee/dashboard')
 
         return render_template('employee_login.html', error_message="Invalid email or password")
 
@@ -1185,36 +1173,29 @@ def upload_pdf():
         description = request.form['description']
         subject = request.form['subject']
 
-        file = request.files['pdf_file']
+        file = request.files.get('pdf_file')
 
         if not file:
             flash("Please upload a PDF file.", "danger")
             return redirect(request.url)
 
-        pdf_data = file.read()
-        file_name = secure_filename(file.filename)
-        file_size_mb = round(len(pdf_data) / (1024 * 1024), 2)
+        conn = get_db()
+        cur = get_cursor()
 
-        if file_size_mb > 25:
-            flash("PDF exceeds 25MB limit.", "danger")
+        # Stream to storage (size limit enforced while copying)
+        try:
+            stored = uploads.store(cur, file, uploads.PDF_TYPES, uploads.MAX_PDF_BYTES)
+        except uploads.UploadError as e:
+            flash(str(e), "danger")
             return redirect(request.url)
-
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        # Save file
-        filename = secure_filename(file.filename)
-        pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(pdf_path)
+        file_name = secure_filename(file.filename)
 
         cur.execute("""
             INSERT INTO Content (mentor_id, title, description, subject, grade, pdf_file, file_name, file_size_mb)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s) RETURNING content_id
-        """, (session["mentor_id"], title, description, subject, grade, pdf_path, file_name, file_size_mb))
+        """, (session["mentor_id"], title, description, subject, grade, stored.path, file_name, stored.size_mb))
 
         conn.commit()
-        cur.close()
-        conn.close()
 
         flash("✅ PDF uploaded successfully for Grade " + grade, "success")
         return redirect('/employee/dashboard')
@@ -1250,8 +1231,8 @@ def employee_content_upload():
             flash("Title and Subject are required.", "danger")
             return redirect(request.url)
 
-        conn = get_db_connection()
-        cur = conn.cursor()
+        conn = get_db()
+        cur = get_cursor()
 
         try:
             # Insert main content record (PDF stored as link)
@@ -1281,10 +1262,6 @@ def employee_content_upload():
             flash(f"Failed to upload content: {e}", "danger")
             print(f"Error uploading content: {e}")
 
-        finally:
-            cur.close()
-            conn.close()
-
     return render_template("upload_content.html", grade=grade)
 
 
@@ -1297,8 +1274,7 @@ def employee_manage_contents():
 
     mentor_id = session['user_id']  # Unified session key
 
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = get_cursor(RealDictCursor)
 
     # Get all content uploaded by this mentor
     cur.execute("""
@@ -1309,18 +1285,14 @@ def employee_manage_contents():
     """, (mentor_id,))
     contents = cur.fetchall()
 
-    # Get multiple resource/video links for each content
-    content_links = {}
-    for c in contents:
-        cur.execute("""
-            SELECT file_link 
-            FROM ContentRecord 
-            WHERE content_id = %s
-        """, (c['content_id'],))
-        content_links[c['content_id']] = [row['file_link'] for row in cur.fetchall()]
-
-    cur.close()
-    conn.close()
+    # Get multiple resource/video links for all contents in one query
+    records = load_children("""
+        SELECT content_id, file_link
+        FROM ContentRecord
+        WHERE content_id = ANY(%(ids)s)
+    """, [c['content_id'] for c in contents], key='content_id')
+    content_links = {content_id: [row['file_link'] for row in rows]
+                     for content_id, rows in records.items()}
 
     return render_template(
         "manage_contents.html",
@@ -1335,8 +1307,8 @@ def delete_content(content_id):
         flash("Unauthorized", "danger")
         return redirect("/login")
 
-    conn = get_db_connection()
-    cur = conn.cursor()
+    conn = get_db()
+    cur = get_cursor()
 
     # Delete associated extra links first
     cur.execute("DELETE FROM ContentRecord WHERE content_id = %s", (content_id,))
@@ -1344,8 +1316,6 @@ def delete_content(content_id):
     cur.execute("DELETE FROM Content WHERE content_id = %s", (content_id,))
     
     conn.commit()
-    cur.close()
-    conn.close()
 
     flash("Content deleted successfully.", "success")
     return redirect("/employee/manage-contents")
@@ -1358,27 +1328,15 @@ def employee_requests():
         flash("Please login first.", "warning")
         return redirect("/login")  # unified login page
 
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-
     try:
-        cur.execute("""
-            SELECT R.request_id, R.topic, R.message, R.request_type, R.status, R.created_at, R.pdf_url,
-                   S.name AS student_name, S.surname AS student_surname, S.phone AS student_phone, S.email AS student_email
-            FROM Request R
-            LEFT JOIN Student S ON R.student_id = S.student_id
-            ORDER BY R.created_at DESC
-        """)
-        requests = cur.fetchall()
+        # One page of requests plus the status/type counts
+        page = request_board.board(request.args, columns=request_board.EMPLOYEE_COLUMNS)
     except Exception as e:
         print(f"Error fetching requests: {e}")
         flash("Failed to load requests.", "danger")
-        requests = []
-    finally:
-        cur.close()
-        conn.close()
+        page = request_board.empty_board(request.args)
 
-    return render_template("employee_requests.html", requests=requests)
+    return render_template("employee_requests.html", **page)
 
 
 @app.route("/update-request-status/<int:request_id>", methods=["POST"])
@@ -1401,9 +1359,9 @@ def update_request_status(request_id):
         if new_status not in ['pending', 'in-progress', 'completed']:
             return jsonify({'error': 'Invalid status', 'success': False}), 400
         
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
+        conn = get_db()
+        cur = get_cursor()
+
         try:
             # Check if request exists
             cur.execute("""
@@ -1436,9 +1394,6 @@ def update_request_status(request_id):
             conn.rollback()
             print(f"Database error updating request status: {e}")
             return jsonify({'error': 'Database error', 'success': False}), 500
-        finally:
-            cur.close()
-            conn.close()
             
     except Exception as e:
         print(f"Error in update_request_status: {e}")
@@ -1450,10 +1405,9 @@ def debug_requests():
     # Check if user is logged in as mentor or admin
     if 'user_role' not in session or session.get('user_role') not in ['mentor', 'admin']:
         return "Unauthorized", 401
-    
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    
+
+    cur = get_cursor(RealDictCursor)
+
     try:
         cur.execute("""
             SELECT R.request_id, R.topic, R.status, R.request_type, R.created_at, R.updated_at,
@@ -1477,9 +1431,6 @@ def debug_requests():
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        cur.close()
-        conn.close()
 
 
 @app.route("/employee/profile/edit", methods=["GET", "POST"])
@@ -1489,8 +1440,8 @@ def employee_profile_edit():
 
     mentor_id = session['mentor_id']
 
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    conn = get_db()
+    cur = get_cursor(RealDictCursor)
 
     if request.method == "POST":
         name = request.form.get("name")
@@ -1506,16 +1457,12 @@ def employee_profile_edit():
         """, (name, surname, phone, subject_speciality, bio, mentor_id))
         conn.commit()
 
-        cur.close()
-        conn.close()
         return redirect("/employee/dashboard")
 
     # Load existing data
     cur.execute("SELECT * FROM Mentor WHERE mentor_id = %s", (mentor_id,))
     mentor = cur.fetchone()
 
-    cur.close()
-    conn.close()
     return render_template("employee_profile_edit.html", mentor=mentor)
 
 @app.route("/employee/profile/password", methods=["GET", "POST"])
@@ -1535,33 +1482,28 @@ def employee_change_password():
             error = "Both fields are required."
             return render_template("employee_change_password.html", error=error)
 
-        conn = get_db_connection()
-        cur = conn.cursor()
+        conn = get_db()
+        cur = get_cursor()
 
         # Fetch current password from DB
         cur.execute("SELECT password FROM Mentor WHERE mentor_id = %s", (mentor_id,))
         result = cur.fetchone()
 
         if not result:
-            cur.close()
-            conn.close()
             error = "Mentor not found."
             return render_template("employee_change_password.html", error=error)
 
         db_password = result[0]
 
-        # Direct comparison
-        if db_password != current_password:
-            cur.close()
-            conn.close()
+        ok, _ = passwords.verify(db_password, current_password)
+        if not ok:
             error = "Current password is incorrect."
             return render_template("employee_change_password.html", error=error)
 
         # Update password
-        cur.execute("UPDATE Mentor SET password = %s WHERE mentor_id = %s", (new_password, mentor_id))
+        cur.execute("UPDATE Mentor SET password = %s WHERE mentor_id = %s",
+                    (passwords.hash_password(new_password), mentor_id))
         conn.commit()
-        cur.close()
-        conn.close()
 
         # Redirect after successful change
         return redirect("/employee/dashboard")
@@ -1598,8 +1540,8 @@ def create_new_class():
             flash("Title and Grade are required.", "danger")
             return redirect(request.url)
 
-        conn = get_db_connection()
-        cur = conn.cursor()
+        conn = get_db()
+        cur = get_cursor()
 
         try:
             cur.execute("""
@@ -1614,10 +1556,6 @@ def create_new_class():
             flash(f"Failed to post class: {e}", "danger")
             print(f"Error creating new class: {e}")
 
-        finally:
-            cur.close()
-            conn.close()
-
     return render_template("employee_class_new.html")
 
 
@@ -1632,8 +1570,7 @@ def view_classes():
 
     mentor_id = session['user_id']  # ✅ use unified session key
 
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = get_cursor(RealDictCursor)
 
     try:
         cur.execute("""
@@ -1650,10 +1587,6 @@ def view_classes():
         print(f"Error fetching mentor classes: {e}")
         classes = []
 
-    finally:
-        cur.close()
-        conn.close()
-
     return render_template("employee_classes.html", classes=classes)
 
 @app.route("/mentor/classes/delete/<int:class_id>", methods=["POST", "GET"])
@@ -1665,8 +1598,8 @@ def mentor_delete_class(class_id):
 
     mentor_id = session['user_id']
 
-    conn = get_db_connection()
-    cur = conn.cursor()
+    conn = get_db()
+    cur = get_cursor()
 
     try:
         # ✔ Ensure mentor only deletes THEIR OWN class
@@ -1686,10 +1619,6 @@ def mentor_delete_class(class_id):
         conn.rollback()
         flash("Error deleting class: " + str(e), "danger")
 
-    finally:
-        cur.close()
-        conn.close()
-
     return redirect("/employee/classes")
 
 
@@ -1706,8 +1635,7 @@ def admin_login():
         email = request.form.get('email')
         password_input = request.form.get('password')
 
-        conn = get_db_connection()
-        cur = conn.cursor()
+        cur = get_cursor()
 
         # Match your table structure
         cur.execute("""
@@ -1716,19 +1644,19 @@ def admin_login():
         """, (email,))
         admin = cur.fetchone()
 
-        cur.close()
-        conn.close()
+        # Hashed (or legacy plaintext, upgraded on success) password check
+        ok, needs_rehash = passwords.verify(admin[4] if admin else None, password_input)
+        if ok:
+            if needs_rehash:
+                cur.execute("UPDATE Admin SET password = %s WHERE admin_id = %s",
+                            (passwords.hash_password(password_input), admin[0]))
+                get_db().commit()
 
-        if admin:
-            db_password = admin[4]  # password column index
-
-            # Direct string comparison (NO hash)
-            if db_password == password_input:
-                session['admin_id'] = admin[0]
-                session['admin_name'] = admin[1]
-                session['admin_email'] = admin[3]
-                session['user_role'] = admin[5] if admin[5] else "superadmin"
-                return redirect('/admin/dashboard')
+            session['admin_id'] = admin[0]
+            session['admin_name'] = admin[1]
+            session['admin_email'] = admin[3]
+            session['user_role'] = admin[5] if admin[5] else "superadmin"
+            return redirect('/admin/dashboard')
 
         # If wrong password or email not found
         return render_template('admin_login.html', error_message="Invalid email or password")
@@ -1750,61 +1678,18 @@ def admin_required(f):
 # --------------- ADMIN DASHBOARD ---------------
 @app.route('/admin/dashboard')
 @admin_required
+@serve_stale
 def admin_dashboard():
-    conn = get_db_connection()
     stats = {}
     recent_requests = []
-    registration_status = 'open'
+    registration_status = registration_state.current()['status']
     
-    if conn:
-        try:
-            cur = conn.cursor(cursor_factory=RealDictCursor)
-            
-            # Count students
-            cur.execute("SELECT COUNT(*) as count FROM Student")
-            stats['students'] = cur.fetchone()['count']
-            
-            # Count mentors
-            cur.execute("SELECT COUNT(*) as count FROM Mentor")
-            stats['mentors'] = cur.fetchone()['count']
-            
-            # Count classes - FIXED: Using new columns
-            cur.execute("SELECT COUNT(*) as count FROM Class WHERE start_date >= CURRENT_DATE")
-            stats['classes'] = cur.fetchone()['count']
-            
-            # Count active enrollments
-            cur.execute("SELECT COUNT(*) as count FROM Enrollment WHERE status = 'active' AND days_remaining > 0")
-            stats['active_enrollments'] = cur.fetchone()['count']
-            
-            # Get recent student requests - Now includes updated_at
-            cur.execute("""
-                SELECT r.request_id, r.message, r.status, r.created_at, r.updated_at,
-                       s.name as student_name, s.surname as student_surname, s.phone as student_phone,
-                       m.name as mentor_name
-                FROM Request r
-                LEFT JOIN Student s ON r.student_id = s.student_id
-                LEFT JOIN Mentor m ON r.mentor_id = m.mentor_id
-                ORDER BY r.created_at DESC
-                LIMIT 5
-            """)
-            recent_requests = cur.fetchall()
-            
-            # Get registration status - Using notification_type column
-            cur.execute("""
-                SELECT message FROM Notification 
-                WHERE notification_type = 'registration_status' 
-                ORDER BY date_sent DESC LIMIT 1
-            """)
-            notification = cur.fetchone()
-            
-            if notification and ('closed' in notification['message'].lower() or 'not open' in notification['message'].lower()):
-                registration_status = 'closed'
-            
-            cur.close()
-        except Exception as e:
-            print(f"Admin dashboard stats error: {e}")
-        finally:
-            conn.close()
+    try:
+        # Counters (kept current by triggers) and recent requests in one query
+        stats, recent_requests = dashboard.summary(get_cursor())
+
+    except Exception as e:
+        print(f"Admin dashboard stats error: {e}")
     
     return render_template(
         'admin_dashboard.html', 
@@ -1832,12 +1717,10 @@ def admin_notifications():
         title = request.form.get('title')
         message = request.form.get('message')
         # Save to DB and/or queue for sending
-        conn = get_db_connection()
-        cur = conn.cursor()
+        conn = get_db()
+        cur = get_cursor()
         cur.execute("INSERT INTO Notifications (title, message, created_at) VALUES (%s, %s, CURRENT_TIMESTAMP)", (title, message))
         conn.commit()
-        cur.close()
-        conn.close()
         flash("Notification created.", "success")
         return redirect('/admin/notifications')
 
@@ -1859,22 +1742,21 @@ def admin_add_mentor():
         password = request.form.get('password') or 'changeme123'
         profile_image = request.form.get('profile_image')  # ← image URL here
 
-        conn = get_db_connection()
-        cur = conn.cursor()
+        conn = get_db()
+        cur = get_cursor()
+
         try:
             cur.execute("""
                 INSERT INTO Mentor (name, surname, email, phone, subject_speciality, password, bio, profile_image, join_date, status)
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, CURRENT_DATE, 'active')
-            """, (name, surname, email, phone, subject_speciality, password, bio, profile_image))
+            """, (name, surname, email, phone, subject_speciality, passwords.hash_password(password),
+                  bio, profile_image))
 
             conn.commit()
             flash("Mentor account created successfully.", "success")
         except Exception as e:
             conn.rollback()
             flash(f"Error creating mentor: {e}", "error")
-        finally:
-            cur.close()
-            conn.close()
 
         return redirect('/admin/mentors')
 
@@ -1884,13 +1766,37 @@ def admin_add_mentor():
 @app.route('/admin/mentors')
 @admin_required
 def admin_view_mentors():
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT mentor_id, name, surname, email, subject_speciality, status, join_date FROM Mentor ORDER BY join_date DESC")
-    mentors = cur.fetchall()
-    cur.close()
-    conn.close()
-    return render_template('admin_view_mentors.html', mentors=mentors)
+    return render_template('admin_view_mentors.html', **mentor_list(request.args))
+
+
+@app.route('/admin/mentors.json')
+@admin_required
+def admin_view_mentors_json():
+    return jsonify(mentor_list(request.args)['page'])
+
+
+MENTOR_SORTS = {
+    'newest': pagination.Sort('Newest', ["COALESCE(m.join_date, DATE '1970-01-01')", 'm.mentor_id'], descending=True),
+    'name': pagination.Sort('Name', ['m.name', 'm.surname', 'm.mentor_id']),
+}
+
+
+def mentor_list(args):
+    cur = get_cursor(RealDictCursor)
+    page = pagination.page(cur, args, """
+        SELECT m.mentor_id, m.name, m.surname, m.email, m.phone, m.subject_speciality,
+               m.bio, m.profile_image, m.status, m.join_date
+        FROM Mentor m
+    """, MENTOR_SORTS)
+
+    cur.execute("""
+        SELECT COUNT(*) AS total,
+               COUNT(*) FILTER (WHERE status = 'active') AS active,
+               COUNT(*) FILTER (WHERE subject_speciality = 'Mathematics') AS mathematics,
+               COUNT(*) FILTER (WHERE subject_speciality = 'Physical Science') AS physical_science
+        FROM Mentor
+    """)
+    return {'mentors': page['rows'], 'page': page, 'stats': cur.fetchone()}
 
 
 @app.route("/admin/toggle-registration", methods=["POST"])
@@ -1901,10 +1807,13 @@ def toggle_registration():
     data = request.get_json()
     status = data.get('status', 'open')
     message = data.get('message', '')
+
+    if status not in ['open', 'closed']:
+        return jsonify({'error': 'Invalid status', 'success': False}), 400
     
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
+    conn = get_db()
+    cur = get_cursor()
+
     try:
         # Insert notification about registration status
         if not message:
@@ -1915,9 +1824,12 @@ def toggle_registration():
             INSERT INTO Notification (message, notification_type, date_sent)
             VALUES (%s, 'registration_status', CURRENT_TIMESTAMP)
         """, (message,))
-        
+
+        # Tell every worker (NOTIFY is delivered on commit), then update our own cache
+        registration_state.publish(cur, status, message)
         conn.commit()
-        
+        registration_state.set(status, message)
+
         return jsonify({
             'success': True,
             'message': f'Registration has been {status} successfully.',
@@ -1928,16 +1840,13 @@ def toggle_registration():
         conn.rollback()
         print(f"Error toggling registration: {e}")
         return jsonify({'error': 'Failed to update registration status', 'success': False}), 500
-    finally:
-        cur.close()
-        conn.close()
 
 
 @app.route('/admin/mentors/edit/<int:mentor_id>', methods=['GET', 'POST'])
 @admin_required
 def admin_edit_mentor(mentor_id):
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    conn = get_db()
+    cur = get_cursor(RealDictCursor)
 
     # Get current mentor
     cur.execute("SELECT * FROM Mentor WHERE mentor_id = %s", (mentor_id,))
@@ -1960,14 +1869,15 @@ def admin_edit_mentor(mentor_id):
         image_path = mentor['profile_image']  # Keep old image
 
         if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-
-            os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-
-            file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+            try:
+                stored = uploads.store(cur, file, uploads.IMAGE_TYPES, uploads.MAX_IMAGE_BYTES)
+            except uploads.UploadError as e:
+                flash(str(e), "error")
+                return redirect(request.url)
 
-            # Store ONLY the file name
-            image_path = filename
+            # Store ONLY the name under static/uploads
+            image_path = stored.name
+            images.schedule(stored.name)
 
         # Update record
         cur.execute("""
@@ -1979,26 +1889,20 @@ def admin_edit_mentor(mentor_id):
               bio, status, image_path, mentor_id))
 
         conn.commit()
-        cur.close()
-        conn.close()
 
         flash("Mentor updated successfully.", "success")
         return redirect('/admin/mentors')
 
-    cur.close()
-    conn.close()
     return render_template('admin_edit_mentor.html', mentor=mentor)
 
 # --- Delete mentor ---
 @app.route('/admin/mentors/delete/<int:mentor_id>', methods=['GET'])
 @admin_required
 def admin_delete_mentor(mentor_id):
-    conn = get_db_connection()
-    cur = conn.cursor()
+    conn = get_db()
+    cur = get_cursor()
     cur.execute("DELETE FROM Mentor WHERE mentor_id=%s", (mentor_id,))
     conn.commit()
-    cur.close()
-    conn.close()
     flash("Mentor deleted successfully.", "success")
     return redirect('/admin/mentors')
 
@@ -2022,27 +1926,18 @@ def add_enrollment_days():
         flash("Invalid number of days.", "error")
         return redirect('/admin/enrollments')
 
-    conn = get_db_connection()
-    if conn:
-        try:
-            cur = conn.cursor()
-            # Update enrollment days and remaining days
-            cur.execute("""
-                UPDATE Enrollment
-                SET enrollment_days = enrollment_days + %s,
-                    days_remaining = days_remaining + %s,
-                    last_updated = CURRENT_TIMESTAMP,
-                    status = 'active'
-                WHERE enrollment_id = %s
-            """, (additional_days, additional_days, enrollment_id))
-            conn.commit()
-            cur.close()
-            flash(f"Successfully added {additional_days} days to enrollment.", "success")
-        except Exception as e:
-            flash(f"Error updating enrollment: {e}", "error")
-            print(f"Add enrollment days error: {e}")
-        finally:
-            conn.close()
+    conn = get_db()
+    try:
+        cur = get_cursor()
+        # Push expires_at out (from today if it already lapsed)
+        student_id = enrollments.extend(cur, enrollment_id, additional_days)
+        if student_id:
+            student_contexts.invalidate(cur, student_id)
+        conn.commit()
+        flash(f"Successfully added {additional_days} days to enrollment.", "success")
+    except Exception as e:
+        flash(f"Error updating enrollment: {e}", "error")
+        print(f"Add enrollment days error: {e}")
 
     return redirect('/admin/enrollments')
 
@@ -2051,30 +1946,79 @@ def add_enrollment_days():
 @app.route('/admin/enrollments')
 @admin_required
 def admin_view_enrollments():
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("""
-        SELECT e.enrollment_id, e.student_id, s.name, s.surname, e.enrollment_days, e.days_remaining, e.status, e.enrollment_date, e.last_updated
+    return render_template('admin_view_enrollments.html', **enrollment_list(request.args))
+
+
+@app.route('/admin/enrollments.json')
+@admin_required
+def admin_view_enrollments_json():
+    return jsonify(enrollment_list(request.args)['page'])
+
+
+ENROLLMENT_SORTS = {
+    'updated': pagination.Sort('Recently updated',
+                               ["COALESCE(e.last_updated, TIMESTAMP '1970-01-01')", 'e.enrollment_id'],
+                               descending=True),
+    'expiring': pagination.Sort('Expiring soonest',
+                                ["COALESCE(e.expires_at, TIMESTAMP '9999-12-31')", 'e.enrollment_id']),
+}
+
+
+def enrollment_list(args):
+    cur = get_cursor(RealDictCursor)
+    days_remaining = enrollments.days_remaining_sql('e')
+    page = pagination.page(cur, args, f"""
+        SELECT e.enrollment_id, e.student_id, s.name, s.surname, e.enrollment_days,
+               {days_remaining} AS days_remaining,
+               e.status, e.enrollment_date, e.last_updated, e.expires_at
         FROM Enrollment e
         LEFT JOIN Student s ON s.student_id = e.student_id
-        ORDER BY e.last_updated DESC
+    """, ENROLLMENT_SORTS)
+
+    cur.execute(f"""
+        SELECT COUNT(*) AS total,
+               COUNT(*) FILTER (WHERE e.status = 'active') AS active,
+               COUNT(*) FILTER (WHERE {days_remaining} < 7) AS expiring,
+               COUNT(*) FILTER (WHERE e.status = 'expired') AS expired
+        FROM Enrollment e
     """)
-    enrollments = cur.fetchall()
-    cur.close()
-    conn.close()
-    return render_template('admin_view_enrollments.html', enrollments=enrollments)
+    return {'enrollments': page['rows'], 'page': page, 'stats': cur.fetchone()}
 
 
 @app.route('/admin/students')
 @admin_required
 def admin_view_students():
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT student_id, name, surname, phone, email, grade, status FROM Student ORDER BY name")
-    students = cur.fetchall()
-    cur.close()
-    conn.close()
-    return render_template('admin_view_students.html', students=students)
+    return render_template('admin_view_students.html', **student_list(request.args))
+
+
+@app.route('/admin/students.json')
+@admin_required
+def admin_view_students_json():
+    return jsonify(student_list(request.args)['page'])
+
+
+STUDENT_SORTS = {
+    'name': pagination.Sort('Name', ['s.name', 's.surname', 's.student_id']),
+    'newest': pagination.Sort('Newest', ['s.student_id'], descending=True),
+    'grade': pagination.Sort('Grade', ['s.grade', 's.name', 's.surname', 's.student_id']),
+}
+
+
+def student_list(args):
+    cur = get_cursor(RealDictCursor)
+    page = pagination.page(cur, args, """
+        SELECT s.student_id, s.name, s.surname, s.phone, s.email, s.grade, s.status
+        FROM Student s
+    """, STUDENT_SORTS)
+
+    cur.execute("""
+        SELECT COUNT(*) AS total,
+               COUNT(*) FILTER (WHERE grade = '10') AS grade_10,
+               COUNT(*) FILTER (WHERE grade = '11') AS grade_11,
+               COUNT(*) FILTER (WHERE grade = '12') AS grade_12
+        FROM Student
+    """)
+    return {'students': page['rows'], 'page': page, 'stats': cur.fetchone()}
 
 
 # ===========================================================
@@ -2087,57 +2031,31 @@ def admin_requests():
     if 'user_role' not in session or session.get('user_role') != 'admin':
         flash("Please login as administrator.", "warning")
         return redirect("/login")
-    
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    
+
     try:
-        # Get all student requests with details - Now includes updated_at
-        cur.execute("""
-            SELECT r.request_id, r.topic, r.message, r.request_type, r.status, 
-                   r.created_at, r.updated_at, r.pdf_url,
-                   s.name as student_name, s.surname as student_surname, 
-                   s.phone as student_phone, s.email as student_email,
-                   m.name as mentor_name, m.surname as mentor_surname,
-                   m.phone as mentor_phone, m.email as mentor_email
-            FROM Request r
-            LEFT JOIN Student s ON r.student_id = s.student_id
-            LEFT JOIN Mentor m ON r.mentor_id = m.mentor_id
-            ORDER BY r.created_at DESC
-        """)
-        requests = cur.fetchall()
-        
-        # Get stats for filters
-        cur.execute("SELECT COUNT(*) as total FROM Request")
-        total = cur.fetchone()['total']
-        
-        cur.execute("SELECT COUNT(*) as pending FROM Request WHERE status = 'pending'")
-        pending = cur.fetchone()['pending']
-        
-        cur.execute("SELECT COUNT(*) as completed FROM Request WHERE status = 'completed'")
-        completed = cur.fetchone()['completed']
-        
-        cur.execute("SELECT COUNT(*) as in_progress FROM Request WHERE status = 'in-progress'")
-        in_progress = cur.fetchone()['in_progress']
-        
-        return render_template("admin_requests.html",
-                             requests=requests,
-                             stats={
-                                 'total': total,
-                                 'pending': pending,
-                                 'completed': completed,
-                                 'in_progress': in_progress
-                             })
-                             
+        # One page of requests (keyset on created_at, request_id) plus facet counts
+        page = request_board.board(request.args)
+        return render_template("admin_requests.html", **page)
+
     except Exception as e:
         print(f"Error loading admin requests: {e}")
         flash("Failed to load student requests.", "danger")
-        return render_template("admin_requests.html",
-                             requests=[],
-                             stats={'total': 0, 'pending': 0, 'completed': 0, 'in_progress': 0})
-    finally:
-        cur.close()
-        conn.close()
+        return render_template("admin_requests.html", **request_board.empty_board(request.args))
+
+
+@app.route("/admin/requests.json")
+def admin_requests_json():
+    # Same page as /admin/requests, for "load more" and facet refreshes
+    if 'user_role' not in session or session.get('user_role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    page = request_board.board(request.args)
+    return jsonify({
+        'requests': page['requests'],
+        'next_cursor': page['next_cursor'],
+        'filters': page['filters'],
+        'facets': page['facets'],
+    })
 
 
 @app.route("/admin/classes/upcoming")
@@ -2146,10 +2064,9 @@ def admin_upcoming_classes():
     if 'user_role' not in session or session.get('user_role') != 'admin':
         flash("Please login as administrator.", "warning")
         return redirect("/login")
-    
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    
+
+    cur = get_cursor(RealDictCursor)
+
     try:
         # Get upcoming classes with details - Now includes subject and start_date
         cur.execute("""
@@ -2202,9 +2119,6 @@ def admin_upcoming_classes():
                              subjects=[],
                              topics=[],
                              grades=[])
-    finally:
-        cur.close()
-        conn.close()
 
 
 # ===========================================================
@@ -2212,63 +2126,70 @@ def admin_upcoming_classes():
 # ===========================================================
 
 @app.route("/check-registration-status")
+@rate_limited(ip=Rate(30, 60), methods=('GET', 'HEAD'))
 def check_registration_status():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    try:
-        # Get latest registration status - Using notification_type column
-        cur.execute("""
-            SELECT message FROM Notification 
-            WHERE notification_type = 'registration_status' 
-            ORDER BY date_sent DESC LIMIT 1
-        """)
-        notification = cur.fetchone()
-        
-        if notification and ('closed' in notification[0].lower() or 'not open' in notification[0].lower()):
-            return jsonify({
-                'status': 'closed',
-                'message': notification[0]
-            })
-        else:
-            return jsonify({
-                'status': 'open',
-                'message': 'Registration is open. You can sign up now.'
-            })
-            
-    except Exception as e:
-        print(f"Error checking registration status: {e}")
-        return jsonify({'status': 'open', 'message': 'Registration is open.'})
-    finally:
-        cur.close()
-        conn.close()
+    state = registration_state.current()
+
+    if state['status'] == 'closed':
+        response = jsonify({
+            'status': 'closed',
+            'message': state['message']
+        })
+    else:
+        response = jsonify({
+            'status': 'open',
+            'message': DEFAULT_OPEN_MESSAGE
+        })
+
+    # Polling clients revalidate with If-None-Match and get a bodiless 304
+    response.set_etag(state['version'])
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+@app.route("/registration-status/stream")
+def registration_status_stream():
+    """
+    Server-Sent Events: push one event when registration status changes.
+    Streams are fed from this worker's single LISTEN connection and end after
+    REGISTRATION_STREAM_LIFETIME seconds (the browser reconnects on its own).
+    """
+    if not registration_state.acquire_stream():
+        # 204 tells EventSource not to reconnect; the page falls back to polling
+        return '', 204
+
+    state = registration_state.current()
+
+    def events(state):
+        yield "retry: 5000\n\n"
+        yield f"event: status\ndata: {json.dumps(state)}\n\n"
+        deadline = time.monotonic() + STREAM_LIFETIME
+        while time.monotonic() < deadline:
+            new_state = registration_state.wait_for_change(state['version'], STREAM_KEEPALIVE)
+            if new_state is None:
+                yield ": keep-alive\n\n"
+                continue
+            state = new_state
+            yield f"event: status\ndata: {json.dumps(state)}\n\n"
+
+    response = Response(events(state), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Runs even if the client disconnects before the first event is sent
+    response.call_on_close(registration_state.release_stream)
+    return response
 
 
 @app.route("/registration-closed")
+@cached_page(registration_version)
 def registration_closed():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    try:
-        # Get the registration closed message - Using notification_type column
-        cur.execute("""
-            SELECT message FROM Notification 
-            WHERE notification_type = 'registration_status' 
-            ORDER BY date_sent DESC LIMIT 1
-        """)
-        notification = cur.fetchone()
-        
-        message = "Registration is currently closed. We will open registrations at the beginning of the next term."
-        if notification and ('closed' in notification[0].lower() or 'not open' in notification[0].lower()):
-            message = notification[0]
-            
-    except Exception as e:
-        print(f"Error fetching registration message: {e}")
-        message = "Registration is currently closed. We will open registrations at the beginning of the next term."
-    finally:
-        cur.close()
-        conn.close()
-    
+    state = registration_state.current()
+
+    message = DEFAULT_CLOSED_MESSAGE
+    if state['status'] == 'closed' and state['message']:
+        message = state['message']
+
     return render_template("registration_closed.html", message=message)
 
 
@@ -0,0 +1,85 @@
+# ===========================================================
+# ADMIN DASHBOARD SUMMARY
+# ===========================================================
+"""
+Counters shown on the admin dashboard, kept in the dashboard_counters table.
+
+Row triggers (schema migration 3) adjust a counter whenever a write moves a
+row in or out of it, so reading the dashboard costs one small query no
+matter how large Student or Enrollment grow. Upcoming classes and current
+enrollments also change as the date rolls over, and writes that bypass the
+triggers (TRUNCATE, restores) are not counted, so reconcile() recounts
+everything from the base tables on a schedule and reports any drift.
+"""
+import enrollments
+
+
+# counter name -> SQL that counts it from the base tables
+COUNTERS = {
+    'students': "SELECT COUNT(*) FROM Student",
+    'mentors': "SELECT COUNT(*) FROM Mentor",
+    'classes': "SELECT COUNT(*) FROM Class WHERE start_date >= CURRENT_DATE",
+    'active_enrollments': f"SELECT COUNT(*) FROM Enrollment WHERE {enrollments.is_current_sql()}",
+}
+
+RECENT_REQUESTS = 5
+
+
+def summary(cur):
+    """
+    Return (stats, recent_requests) in a single round trip, using a plain
+    (tuple) cursor. Falls back to a reconcile() if the counters have never
+    been filled in.
+    """
+    cur.execute("""
+        SELECT (SELECT json_object_agg(name, value) FROM dashboard_counters) AS counters,
+               COALESCE((
+                   SELECT json_agg(recent ORDER BY recent.created_at DESC)
+                   FROM (
+                       SELECT r.request_id, r.message, r.status, r.created_at, r.updated_at,
+                              s.name as student_name, s.surname as student_surname, s.phone as student_phone,
+                              m.name as mentor_name
+                       FROM Request r
+                       LEFT JOIN Student s ON r.student_id = s.student_id
+                       LEFT JOIN Mentor m ON r.mentor_id = m.mentor_id
+                       ORDER BY r.created_at DESC
+                       LIMIT %s
+                   ) recent
+               ), '[]') AS recent_requests
+    """, (RECENT_REQUESTS,))
+    row = cur.fetchone()
+    counters, recent = row[0], row[1]
+
+    if not counters or set(COUNTERS) - set(counters):
+        counters = reconcile(cur)
+        cur.connection.commit()
+
+    return {name: counters.get(name, 0) for name in COUNTERS}, recent
+
+
+def reconcile(cur):
+    """
+    Recount every counter from the base tables in one statement and store
+    the result. Returns the recounted values; logs counters that had drifted.
+    """
+    # Lock the counters first: writers in flight hold the row until they commit,
+    # so the recount below (a fresh snapshot) already includes their rows
+    cur.execute("SELECT name, value FROM dashboard_counters ORDER BY name FOR UPDATE")
+    stored = dict(cur.fetchall())
+
+    columns = ",\n".join(f"({sql}) AS {name}" for name, sql in COUNTERS.items())
+    cur.execute(f"SELECT {columns}")
+    actual = dict(zip(COUNTERS, cur.fetchone()))
+
+    for name, value in actual.items():
+        if name in stored and stored[name] != value:
+            print(f"⚠️ Dashboard counter {name} drifted: stored {stored[name]}, actual {value}")
+
+    cur.execute("""
+        INSERT INTO dashboard_counters (name, value, reconciled_at)
+        SELECT name, value, CURRENT_TIMESTAMP
+        FROM unnest(%s::text[], %s::bigint[]) AS c(name, value)
+        ON CONFLICT (name) DO UPDATE
+        SET value = EXCLUDED.value, reconciled_at = EXCLUDED.reconciled_at
+    """, (list(actual), list(actual.values())))
+    return actual
@@ -0,0 +1,661 @@
+# ===========================================================
+# POOLED DATABASE CONNECTIONS
+# ===========================================================
+"""
+Per-worker PostgreSQL connection pool.
+
+Every gunicorn worker keeps its own bounded pool (it is rebuilt after a fork).
+A Flask request borrows one connection through get_db() and gives it back on
+teardown_appcontext, together with every cursor opened through get_cursor(),
+so routes never close cursors or connections by hand.
+
+Cursors from get_cursor(), and plain conn.cursor() on pooled connections,
+time every execute. The request's totals are kept on g (db_queries, db_time,
+db_checkout_time) for metrics.py, and each statement is passed to
+querylog.py for the slow-query log and N+1 detector.
+"""
+import os
+import select
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.extras import RealDictCursor
+from flask import g, has_app_context
+
+import querylog
+
+
+# ===========================================================
+# CONNECTION SETTINGS (LOCAL OR RAILWAY)
+# ===========================================================
+LOCAL_DB = {
+    'host': 'localhost',
+    'database': 'eduboostup',
+    'user': 'postgres',
+    'password': 'Admin2023',
+    'port': '5432'
+}
+
+POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+POOL_MAX = int(os.getenv("DB_POOL_MAX", "5"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))          # seconds to wait for a free connection
+POOL_MAX_USES = int(os.getenv("DB_POOL_MAX_USES", "500"))        # recycle after N checkouts
+POOL_MAX_AGE = float(os.getenv("DB_POOL_MAX_AGE", "1800"))       # recycle after N seconds
+POOL_CHECK_IDLE = float(os.getenv("DB_POOL_CHECK_IDLE", "30"))   # ping connections idle longer than this
+CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))       # seconds; 0 waits forever
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))  # 0 leaves the server default
+
+BREAKER_WINDOW = float(os.getenv("DB_BREAKER_WINDOW", "30"))       # seconds of outcomes considered
+BREAKER_MIN_CALLS = int(os.getenv("DB_BREAKER_MIN_CALLS", "5"))
+BREAKER_FAILURE_RATE = float(os.getenv("DB_BREAKER_FAILURE_RATE", "0.5"))  # failed or slow share that trips it
+BREAKER_SLOW_SECONDS = float(os.getenv("DB_BREAKER_SLOW_SECONDS", "2"))    # checkout slower than this counts as slow
+BREAKER_PROBE_INTERVAL = float(os.getenv("DB_BREAKER_PROBE_INTERVAL", "5"))
+
+
+def connect_kwargs():
+    """
+    Connection arguments for Railway PostgreSQL if DATABASE_URL exists,
+    otherwise for the local PostgreSQL database.
+    """
+    DATABASE_URL = os.getenv("DATABASE_URL")
+
+    if DATABASE_URL:
+        result = urlparse(DATABASE_URL)
+        kwargs = {
+            'database': result.path[1:],  # remove "/" at the start
+            'user': result.username,
+            'password': result.password,
+            'host': result.hostname,
+            'port': result.port
+        }
+    else:
+        kwargs = dict(LOCAL_DB)
+
+    # Bound how long a worker thread can hang on an unreachable or stuck server
+    if CONNECT_TIMEOUT:
+        kwargs['connect_timeout'] = CONNECT_TIMEOUT
+    if STATEMENT_TIMEOUT_MS:
+        kwargs['options'] = f"-c statement_timeout={STATEMENT_TIMEOUT_MS}"
+    return kwargs
+
+
+class DatabaseUnavailable(Exception):
+    """Raised when the pool cannot hand out a working connection."""
+
+
+# ===========================================================
+# CIRCUIT BREAKER
+# ===========================================================
+class CircuitBreaker:
+    """
+    Stops requests from queueing on a database that is down or very slow.
+
+    Every checkout reports an outcome: success, failure (could not connect,
+    pool timeout, connection lost) or slow (waited over
+    BREAKER_SLOW_SECONDS). Once at least BREAKER_MIN_CALLS outcomes in the
+    last BREAKER_WINDOW seconds are mostly failed or slow, the breaker
+    opens. While it is open, checkouts fail at once with
+    DatabaseUnavailable instead of waiting. A background thread probes the
+    server every BREAKER_PROBE_INTERVAL seconds and closes the breaker on
+    the first successful probe; user requests never serve as probes.
+    """
+
+    def __init__(self, window=BREAKER_WINDOW, min_calls=BREAKER_MIN_CALLS,
+                 failure_rate=BREAKER_FAILURE_RATE, probe_interval=BREAKER_PROBE_INTERVAL):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.probe_interval = probe_interval
+        self._lock = threading.Lock()
+        self._outcomes = deque()   # (time, bad)
+        self._opened_at = None
+        self._probe_thread = None
+        self._stats = {'opened': 0, 'rejected': 0, 'probes': 0, 'last_error': None}
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def allow(self):
+        if self._opened_at is None:
+            return True
+        with self._lock:
+            self._stats['rejected'] += 1
+        return False
+
+    def record(self, ok, slow=False, error=None):
+        now = time.monotonic()
+        with self._lock:
+            self._outcomes.append((now, not ok or slow))
+            while self._outcomes and self._outcomes[0][0] < now - self.window:
+                self._outcomes.popleft()
+            if error is not None:
+                self._stats['last_error'] = str(error)[:200]
+            bad = sum(1 for _, b in self._outcomes if b)
+            trip = (self._opened_at is None and len(self._outcomes) >= self.min_calls
+                    and bad / len(self._outcomes) >= self.failure_rate)
+            if trip:
+                self._opened_at = now
+                self._stats['opened'] += 1
+        if trip:
+            print(f"⚡ Database circuit OPEN ({bad}/{len(self._outcomes)} recent checkouts failed or slow)")
+            self._start_probe()
+
+    def _start_probe(self):
+        with self._lock:
+            if self._probe_thread is not None and self._probe_thread.is_alive():
+                return
+            self._probe_thread = threading.Thread(target=self._probe, name="db-breaker-probe", daemon=True)
+            self._probe_thread.start()
+
+    def _probe(self):
+        while self._opened_at is not None:
+            time.sleep(self.probe_interval)
+            with self._lock:
+                self._stats['probes'] += 1
+            try:
+                conn = psycopg2.connect(**connect_kwargs())
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT 1")
+                finally:
+                    conn.close()
+            except Exception as e:
+                with self._lock:
+                    self._stats['last_error'] = str(e)[:200]
+                continue
+            self.reset()
+            print("✅ Database circuit CLOSED (probe succeeded)")
+
+    def reset(self):
+        with self._lock:
+            self._opened_at = None
+            self._outcomes.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'state': 'open' if self._opened_at is not None else 'closed',
+                'open_for': round(time.monotonic() - self._opened_at, 1) if self._opened_at else 0,
+                'recent_checkouts': len(self._outcomes),
+                'recent_bad': sum(1 for _, b in self._outcomes if b),
+            })
+        return stats
+
+
+class _Entry:
+    """A pooled connection plus the bookkeeping used for recycling."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+
+
+# ===========================================================
+# CONNECTION POOL
+# ===========================================================
+class ConnectionPool:
+    """
+    Thread-safe bounded pool.
+
+    Connections are health-checked on checkout when they have been idle for a
+    while, and closed instead of returned once they exceed max_uses or max_age.
+    """
+
+    def __init__(self, minconn=POOL_MIN, maxconn=POOL_MAX, timeout=POOL_TIMEOUT,
+                 max_uses=POOL_MAX_USES, max_age=POOL_MAX_AGE, check_idle=POOL_CHECK_IDLE):
+        self.minconn = max(0, min(minconn, maxconn))
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.check_idle = check_idle
+
+        self._cond = threading.Condition()
+        self._idle = []        # LIFO so hot connections stay hot
+        self._checked_out = {}  # id(conn) -> _Entry
+        self._size = 0          # idle + checked out + being opened
+        self._waiting = 0
+        self._warmed = False
+        self.breaker = CircuitBreaker()
+
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'timeouts': 0,
+            'connects': 0,
+            'connect_errors': 0,
+            'recycled': 0,
+            'discarded': 0,
+        }
+
+    # ---------- internals ----------
+    def _open(self):
+        try:
+            conn = psycopg2.connect(**connect_kwargs())
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._stats['connect_errors'] += 1
+                self._cond.notify()
+            raise
+        conn.cursor_factory = _timed_cursor(None)  # conn.cursor() outside get_cursor() is observed too
+        with self._cond:
+            self._stats['connects'] += 1
+        return _Entry(conn)
+
+    def _close(self, entry, reason):
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._stats[reason] += 1
+            self._cond.notify()
+
+    def _healthy(self, entry):
+        conn = entry.conn
+        if conn.closed:
+            return False
+        if time.monotonic() - entry.last_used < self.check_idle:
+            return True
+        try:
+            with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _expired(self, entry):
+        return (entry.uses >= self.max_uses or
+                time.monotonic() - entry.created_at >= self.max_age)
+
+    def _warm(self):
+        """Open minconn connections the first time the pool is used."""
+        with self._cond:
+            if self._warmed:
+                return
+            self._warmed = True
+            missing = max(0, self.minconn - self._size)
+            self._size += missing
+        for _ in range(missing):
+            try:
+                entry = self._open()
+            except Exception as e:
+                print(f"❌ DATABASE CONNECTION ERROR: {e}")
+                continue
+            with self._cond:
+                self._idle.append(entry)
+                self._cond.notify()
+
+    # ---------- public API ----------
+    def getconn(self):
+        """Borrow a connection, waiting up to `timeout` seconds for one to free up."""
+        if not self.breaker.allow():
+            raise DatabaseUnavailable("Database circuit is open; failing fast until it recovers")
+        try:
+            conn, wait_time = self._checkout()
+        except DatabaseUnavailable as e:
+            self.breaker.record(False, error=e)
+            raise
+        self.breaker.record(True, slow=wait_time > BREAKER_SLOW_SECONDS)
+        return conn
+
+    def _checkout(self):
+        if not self._warmed:
+            self._warm()
+
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+
+        while True:
+            entry = None
+            with self._cond:
+                while True:
+                    if self._idle:
+                        entry = self._idle.pop()
+                        break
+                    if self._size < self.maxconn:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise DatabaseUnavailable(
+                            f"No database connection free after {self.timeout}s "
+                            f"({self.maxconn} in use)")
+                    waited = True
+                    self._waiting += 1
+                    self._cond.wait(remaining)
+                    self._waiting -= 1
+
+            if entry is None:
+                try:
+                    entry = self._open()
+                except Exception as e:
+                    raise DatabaseUnavailable(f"Could not connect to the database: {e}") from e
+            elif not self._healthy(entry):
+                self._close(entry, 'discarded')
+                continue
+
+            entry.uses += 1
+            entry.last_used = time.monotonic()
+            wait_time = entry.last_used - started
+            with self._cond:
+                self._checked_out[id(entry.conn)] = entry
+                self._stats['checkouts'] += 1
+                if waited:
+                    self._stats['waits'] += 1
+                self._stats['wait_time_total'] += wait_time
+                self._stats['wait_time_max'] = max(self._stats['wait_time_max'], wait_time)
+            return entry.conn, wait_time
+
+    def putconn(self, conn):
+        """Return a borrowed connection; unfinished transactions are rolled back."""
+        with self._cond:
+            entry = self._checked_out.pop(id(conn), None)
+        if entry is None:
+            return
+        if conn.closed:
+            self.breaker.record(False, error="connection lost during request")
+
+        if not conn.closed and conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+
+        if conn.closed or conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            self._close(entry, 'discarded')
+        elif self._expired(entry):
+            self._close(entry, 'recycled')
+        else:
+            entry.last_used = time.monotonic()
+            with self._cond:
+                self._idle.append(entry)
+                self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for entry in idle:
+            self._close(entry, 'recycled')
+
+    def stats(self):
+        """Snapshot of pool size, saturation and wait-time counters."""
+        with self._cond:
+            in_use = len(self._checked_out)
+            stats = dict(self._stats)
+            stats.update({
+                'pid': os.getpid(),
+                'min': self.minconn,
+                'max': self.maxconn,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': in_use,
+                'waiting': self._waiting,
+                'saturation': round(in_use / self.maxconn, 3) if self.maxconn else 0,
+            })
+        stats['breaker'] = self.breaker.stats()
+        checkouts = stats['checkouts']
+        stats['wait_time_avg'] = round(stats['wait_time_total'] / checkouts, 6) if checkouts else 0.0
+        stats['wait_time_total'] = round(stats['wait_time_total'], 6)
+        stats['wait_time_max'] = round(stats['wait_time_max'], 6)
+        return stats
+
+
+# ===========================================================
+# PER-WORKER POOL
+# ===========================================================
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return this process's pool, building a fresh one after a fork."""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ConnectionPool()
+                _pool_pid = pid
+    return _pool
+
+
+def pool_stats():
+    return get_pool().stats()
+
+
+def breaker_open():
+    """True while this worker's circuit breaker is failing database calls fast."""
+    return get_pool().breaker.is_open
+
+
+@contextmanager
+def pooled_connection():
+    """Borrow a connection outside the request cycle (background threads, jobs)."""
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
+
+
+# ===========================================================
+# LISTEN / NOTIFY (ONE CONNECTION PER WORKER)
+# ===========================================================
+class Listener:
+    """
+    Background thread holding this worker's single LISTEN connection and
+    dispatching notifications to the callbacks subscribed per channel.
+
+    Notifications sent while the connection was down are lost, so every
+    on_reconnect hook runs after (re)connecting; caches use it to drop
+    whatever they hold.
+    """
+
+    POLL_INTERVAL = 5       # seconds between checks for newly subscribed channels
+    KEEPALIVE_INTERVAL = 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._handlers = {}         # channel -> [callback(payload)]
+        self._reconnect_hooks = []
+        self._thread = None
+        self._pid = None
+        self.healthy = False
+
+    def subscribe(self, channel, callback, on_reconnect=None):
+        with self._lock:
+            self._handlers.setdefault(channel, []).append(callback)
+            if on_reconnect is not None:
+                self._reconnect_hooks.append(on_reconnect)
+
+    def ensure_started(self):
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = pid
+            self.healthy = False
+            self._thread = threading.Thread(target=self._run, name="db-listener", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        backoff = 1
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(**connect_kwargs())
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                listened = set()
+                self.healthy = True
+                backoff = 1
+                for hook in list(self._reconnect_hooks):
+                    hook()
+
+                last_ping = time.monotonic()
+                while True:
+                    with self._lock:
+                        channels = set(self._handlers) - listened
+                    for channel in channels:
+                        with conn.cursor() as cur:
+                            cur.execute(f'LISTEN "{channel}"')
+                        listened.add(channel)
+
+                    if select.select([conn], [], [], self.POLL_INTERVAL) == ([], [], []):
+                        if time.monotonic() - last_ping > self.KEEPALIVE_INTERVAL:
+                            # Idle: make sure the socket is still alive
+                            with conn.cursor() as cur:
+                                cur.execute("SELECT 1")
+                            last_ping = time.monotonic()
+                        continue
+
+                    conn.poll()
+                    while conn.notifies:
+                        note = conn.notifies.pop(0)
+                        with self._lock:
+                            callbacks = list(self._handlers.get(note.channel, []))
+                        for callback in callbacks:
+                            try:
+                                callback(note.payload)
+                            except Exception as e:
+                                print(f"❌ Error handling {note.channel} notification: {e}")
+            except Exception as e:
+                self.healthy = False
+                print(f"❌ Database listener error: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+
+listener = Listener()
+
+
+def notify(cur, channel, payload):
+    """Queue a NOTIFY on the cursor's transaction; it is delivered on commit."""
+    cur.execute("SELECT pg_notify(%s, %s)", (channel, payload))
+
+
+# ===========================================================
+# REQUEST-SCOPED ACCESS
+# ===========================================================
+def get_db():
+    """Return the pooled connection bound to the current app context."""
+    if 'db_conn' not in g:
+        started = time.perf_counter()
+        try:
+            g.db_conn = get_pool().getconn()
+        except DatabaseUnavailable:
+            g.db_unavailable = True  # lets serve-stale views notice a failure the route swallowed
+            raise
+        finally:
+            g.db_checkout_time = time.perf_counter() - started
+        g.db_cursors = []
+        g.db_queries = 0
+        g.db_time = 0.0
+    return g.db_conn
+
+
+_timed_cursors = {}  # cursor class -> timed subclass
+
+
+def _timed_cursor(factory):
+    """A subclass of the cursor class `factory` that reports each execute's duration."""
+    factory = factory or psycopg2.extensions.cursor
+    timed = _timed_cursors.get(factory)
+    if timed is None:
+        class timed(factory):
+            def execute(self, query, vars=None):
+                started = time.perf_counter()
+                try:
+                    return super().execute(query, vars)
+                finally:
+                    _record_query(self, query, vars, time.perf_counter() - started)
+
+            def executemany(self, query, vars_list):
+                started = time.perf_counter()
+                try:
+                    return super().executemany(query, vars_list)
+                finally:
+                    _record_query(self, query, vars_list, time.perf_counter() - started, many=True)
+
+        timed.__name__ = timed.__qualname__ = f"Timed{factory.__name__}"
+        _timed_cursors[factory] = timed
+    return timed
+
+
+def _record_query(cur, query, params, seconds, many=False):
+    if has_app_context() and 'db_queries' in g:
+        g.db_queries += 1
+        g.db_time += seconds
+    querylog.observe(cur, query, params, seconds, many)
+
+
+def get_cursor(cursor_factory=None):
+    """Open a cursor on the request connection; it is closed on teardown."""
+    cur = get_db().cursor(cursor_factory=_timed_cursor(cursor_factory))
+    g.db_cursors.append(cur)
+    return cur
+
+
+def load_children(query, parent_ids, key, cursor_factory=RealDictCursor):
+    """
+    Load the child rows for a whole page of parents in one query.
+
+    `query` must select `key` and filter with `= ANY(%(ids)s)`; rows come back
+    grouped as {parent_id: [row, ...]} (in query order), with an empty list for
+    parents that have no children.
+    """
+    parent_ids = list(dict.fromkeys(parent_ids))
+    children = {parent_id: [] for parent_id in parent_ids}
+    if not parent_ids:
+        return children
+
+    cur = get_cursor(cursor_factory)
+    cur.execute(query, {'ids': parent_ids})
+    for row in cur.fetchall():
+        children.setdefault(row[key], []).append(row)
+    return children
+
+
+def release_db(exc=None):
+    """teardown_appcontext hook: close cursors and return the connection."""
+    conn = g.pop('db_conn', None)
+    cursors = g.pop('db_cursors', [])
+    for cur in cursors:
+        try:
+            cur.close()
+        except Exception:
+            pass
+    if conn is not None:
+        if isinstance(exc, psycopg2.OperationalError):
+            get_pool().breaker.record(False, error=exc)
+        get_pool().putconn(conn)
+
+
+def init_app(app):
+    app.teardown_appcontext(release_db)
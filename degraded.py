@@ -0,0 +1,102 @@
+# ===========================================================
+# DEGRADED MODE (SERVE STALE WHILE THE DATABASE IS DOWN)
+# ===========================================================
+"""
+Keeps read-only pages up while the database is unreachable.
+
+Views decorated with @serve_stale save their last good render per user,
+for each path and query string. The renders are held in a byte-bounded
+LRU (STALE_PAGES_MAX_BYTES), each kept for at most STALE_PAGES_TTL.
+
+When the database circuit breaker (db.CircuitBreaker) is open, the saved
+copy is returned straight away, without touching the pool. It carries a
+banner saying it may be out of date. The same happens when a render fails
+with DatabaseUnavailable, or when the route swallowed that error itself
+(it is flagged on g by db.get_db). With no saved copy, the usual 503 page
+is shown. The breaker's background probe closes the circuit once the
+database answers again, and the next request renders fresh.
+"""
+import os
+import re
+import time
+from functools import wraps
+
+from flask import g, make_response, request, session
+
+from db import DatabaseUnavailable, breaker_open
+from page_cache import PageCache
+
+
+STALE_MAX_BYTES = int(os.getenv("STALE_PAGES_MAX_BYTES", str(16 * 1024 * 1024)))
+STALE_TTL = float(os.getenv("STALE_PAGES_TTL", str(6 * 3600)))
+
+stale_pages = PageCache(max_bytes=STALE_MAX_BYTES, ttl=STALE_TTL)
+
+BANNER = (
+    '<div role="status" style="position:sticky;top:0;z-index:10000;padding:0.75rem 1rem;'
+    'background:#fff3cd;color:#664d03;border-bottom:1px solid #ffe69c;text-align:center;'
+    'font-family:sans-serif;font-size:0.95rem;">'
+    '⚠️ We are having trouble reaching our database. This is a saved copy of the page '
+    'from {age} ago, and changes you make right now may not be saved.</div>'
+)
+_BODY_TAG = re.compile(rb'<body[^>]*>', re.I)
+
+
+def _key():
+    return (session.get('user_role'), session.get('user_id'), request.full_path)
+
+
+def _age(saved_at):
+    seconds = int(time.monotonic() - saved_at)
+    if seconds < 120:
+        return f"{seconds} seconds"
+    if seconds < 7200:
+        return f"{seconds // 60} minutes"
+    return f"{seconds // 3600} hours"
+
+
+def _stale_response(key):
+    entry = stale_pages.get(key)
+    if entry is None:
+        return None
+    expires_at, body, mimetype, _ = entry
+    banner = BANNER.format(age=_age(expires_at - stale_pages.ttl)).encode('utf-8')
+    match = _BODY_TAG.search(body)
+    body = body[:match.end()] + banner + body[match.end():] if match else banner + body
+
+    response = make_response(body)
+    response.mimetype = mimetype
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Degraded'] = 'stale'
+    print(f"⚠️ Serving stale {request.path} (database unavailable)")
+    return response
+
+
+def serve_stale(view):
+    """Remember the view's last good render and fall back to it while the database is down."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'GET':
+            return view(*args, **kwargs)
+
+        key = _key()
+        if breaker_open():
+            stale = _stale_response(key)
+            if stale is not None:
+                return stale
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except DatabaseUnavailable:
+            stale = _stale_response(key)
+            if stale is None:
+                raise
+            return stale
+
+        if g.get('db_unavailable'):
+            return _stale_response(key) or response
+
+        if response.status_code == 200 and response.mimetype == 'text/html' and not response.is_streamed:
+            stale_pages.put(key, response.get_data(), response.mimetype)
+        return response
+    return wrapper
@@ -0,0 +1,120 @@
+# ===========================================================
+# PROTECTED FILE DOWNLOADS
+# ===========================================================
+"""
+Access-checked downloads for course PDFs and request attachments.
+
+PDFs under static/uploads are no longer served by the static view (see
+uploads.is_private); they go through /downloads/..., which checks who is
+asking before sending anything:
+- Course content: staff, or a student in the content's grade with a
+  current enrollment.
+- Request attachments: staff, or the student who made the request.
+
+Files are sent with werkzeug's conditional send_file, so Range, If-Range,
+If-None-Match and If-Modified-Since all work. Mobile PDF viewers can fetch
+pages on demand, and a dropped download resumes instead of restarting.
+Content-addressed files use their SHA-256 as a strong ETag.
+
+To hand the transfer to the front-end server instead of a worker thread:
+- DOWNLOAD_ACCEL_PREFIX (e.g. "/protected/uploads/") answers with an
+  X-Accel-Redirect to an nginx `internal` location aliased to
+  static/uploads.
+- USE_X_SENDFILE=1 sets Flask's X-Sendfile (Apache / lighttpd).
+Otherwise gunicorn streams the file itself, using sendfile(2) for whole-file
+responses.
+"""
+import os
+from urllib.parse import quote
+
+from flask import abort, current_app, make_response, send_file, session
+from werkzeug.security import safe_join
+
+from enrollments import is_current_sql
+from uploads import UPLOAD_ROOT
+
+
+ACCEL_PREFIX = os.getenv("DOWNLOAD_ACCEL_PREFIX")
+STAFF_ROLES = ('mentor', 'admin', 'superadmin')
+DOWNLOAD_MAX_AGE = 3600  # private: browsers may reuse a copy, shared caches may not
+
+
+def is_staff():
+    return session.get('user_role') in STAFF_ROLES
+
+
+def _upload_name(stored):
+    """
+    The name under static/uploads for any stored form: 'static/uploads/x.pdf'
+    (Content.pdf_file), 'uploads/x.pdf' (Request.pdf_url) or a bare name.
+    """
+    name = (stored or '').replace('\\', '/').lstrip('/')
+    for prefix in ('static/', 'uploads/'):
+        if name.startswith(prefix):
+            name = name[len(prefix):]
+    return name
+
+
+# ===========================================================
+# ACCESS CHECKS
+# ===========================================================
+def content_file(cur, content_id):
+    """(stored path, download name) of a content PDF the current user may read, or None."""
+    if is_staff():
+        cur.execute("SELECT pdf_file, file_name FROM Content WHERE content_id = %s", (content_id,))
+    elif session.get('user_role') == 'student' and 'user_id' in session:
+        cur.execute(f"""
+            SELECT C.pdf_file, C.file_name
+            FROM Content C
+            JOIN Student S ON S.grade = C.grade AND S.status = 'active'
+            WHERE C.content_id = %s AND S.student_id = %s
+              AND EXISTS (SELECT 1 FROM Enrollment E
+                          WHERE E.student_id = S.student_id AND {is_current_sql('E')})
+        """, (content_id, session['user_id']))
+    else:
+        return None
+    row = cur.fetchone()
+    return (row[0], row[1]) if row and row[0] else None
+
+
+def request_file(cur, request_id):
+    """(stored path, download name) of a request attachment the current user may read, or None."""
+    if is_staff():
+        cur.execute("SELECT pdf_url, topic FROM Request WHERE request_id = %s", (request_id,))
+    elif session.get('user_role') == 'student' and 'user_id' in session:
+        cur.execute("SELECT pdf_url, topic FROM Request WHERE request_id = %s AND student_id = %s",
+                    (request_id, session['user_id']))
+    else:
+        return None
+    row = cur.fetchone()
+    return (row[0], f"{row[1] or 'request'}.pdf") if row and row[0] else None
+
+
+# ===========================================================
+# SENDING
+# ===========================================================
+def send(stored, download_name):
+    """Send a file under static/uploads with full conditional / range support."""
+    name = _upload_name(stored)
+    download_name = download_name or os.path.basename(name)
+    root = os.path.join(current_app.root_path, UPLOAD_ROOT)
+    path = safe_join(root, name)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    # Content-addressed names carry their own hash; legacy names get werkzeug's mtime/size ETag
+    stem = os.path.splitext(os.path.basename(name))[0]
+    etag = stem if len(stem) == 64 else True
+
+    if ACCEL_PREFIX:
+        response = make_response('')
+        response.headers['X-Accel-Redirect'] = f"{ACCEL_PREFIX.rstrip('/')}/{name}"
+        response.headers['Content-Type'] = 'application/pdf'
+        response.headers['Content-Disposition'] = f"inline; filename*=UTF-8''{quote(download_name)}"
+    else:
+        response = send_file(path, mimetype='application/pdf', download_name=download_name,
+                             conditional=True, etag=etag)
+        response.headers['Accept-Ranges'] = 'bytes'  # tell viewers they may fetch pieces / resume
+
+    response.headers['Cache-Control'] = f"private, max-age={DOWNLOAD_MAX_AGE}"
+    return response
@@ -0,0 +1,71 @@
+# ===========================================================
+# ENROLLMENT EXPIRY
+# ===========================================================
+"""
+Enrollments are modelled by an expires_at timestamp (midnight of the day
+access ends). days_remaining is derived when it is read, extending an
+enrollment is a single-row update, and the nightly job only touches rows
+that have actually lapsed.
+
+The legacy days_remaining column is no longer kept in step; read it through
+days_remaining_sql() instead.
+"""
+
+
+def days_remaining_sql(alias=None):
+    """SQL expression for the whole days left on an enrollment row."""
+    prefix = f"{alias}." if alias else ""
+    return f"GREATEST(0, COALESCE({prefix}expires_at::date - CURRENT_DATE, 0))"
+
+
+def is_current_sql(alias=None):
+    """SQL predicate for an enrollment that is active and not yet lapsed."""
+    prefix = f"{alias}." if alias else ""
+    return f"({prefix}status = 'active' AND {prefix}expires_at > CURRENT_DATE)"
+
+
+def insert_for_sql(source):
+    """
+    INSERT of a fresh, zero-day enrollment for every student_id produced by
+    `source` (a CTE name), so it can share a statement with the Student insert.
+    """
+    return f"""
+        INSERT INTO Enrollment (student_id, enrollment_days, days_remaining, status, expires_at)
+        SELECT student_id, 0, 0, 'active', CURRENT_DATE FROM {source}
+        RETURNING enrollment_id
+    """
+
+
+def extend(cur, enrollment_id, days):
+    """
+    Add days to an enrollment, counting from today if it has already lapsed.
+    Returns the student_id, or None if the enrollment does not exist.
+    """
+    cur.execute("""
+        UPDATE Enrollment
+        SET enrollment_days = enrollment_days + %s,
+            expires_at = GREATEST(COALESCE(expires_at, CURRENT_DATE), CURRENT_DATE) + %s * INTERVAL '1 day',
+            last_updated = CURRENT_TIMESTAMP,
+            status = 'active'
+        WHERE enrollment_id = %s
+        RETURNING student_id
+    """, (days, days, enrollment_id))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def expire_lapsed(cur):
+    """
+    Flag active enrollments whose expires_at has passed, using the partial
+    index on (expires_at). Returns the affected student_ids. Runs that were
+    missed are caught up automatically because the cut-off is a date.
+    """
+    cur.execute("""
+        UPDATE Enrollment
+        SET status = 'expired',
+            days_remaining = 0
+        WHERE status = 'active'
+          AND expires_at <= CURRENT_DATE
+        RETURNING student_id
+    """)
+    return [row[0] for row in cur.fetchall()]
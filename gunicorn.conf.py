@@ -0,0 +1,28 @@
+# ===========================================================
+# GUNICORN SETTINGS (READ AUTOMATICALLY FROM THE WORKING DIRECTORY)
+# ===========================================================
+"""
+Prepares the shared Prometheus directory that metrics.py writes to.
+
+The master sets PROMETHEUS_MULTIPROC_DIR before any worker forks, so every
+worker inherits it. The directory is emptied once at startup so counters from
+a previous run are not carried over. When a worker exits, its live gauges
+are dropped. Its counters and histograms are kept, so totals do not go
+backwards.
+"""
+import os
+import shutil
+
+
+METRICS_DIR = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join("/tmp", f"eduboost-metrics-{os.getpid()}"))
+
+
+def on_starting(server):
+    shutil.rmtree(METRICS_DIR, ignore_errors=True)
+    os.makedirs(METRICS_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,205 @@
+# ===========================================================
+# RESPONSIVE IMAGE DERIVATIVES
+# ===========================================================
+"""
+Smaller copies of uploaded profile photos, for avatars and mentor cards.
+
+For each image under static/uploads, generate() writes one WebP and one
+JPEG per width in WIDTHS next to the original:
+
+    ab/<sha256>.jpg  ->  ab/<sha256>.w160.webp, ab/<sha256>.w160.jpg, ...
+
+Upload routes call schedule() so the work runs on a background thread and
+the request does not wait for it. Templates call variants() (registered as
+the Jinja global `image_variants`, used by templates/responsive_image.html)
+to get srcset strings. Until the derivatives exist, variants() serves the
+original and queues generation, so older uploads catch up on first view.
+`python images.py backfill` generates them for everything up front.
+
+Needs Pillow; without it the originals are served unchanged.
+"""
+import os
+import re
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+from uploads import FILE_MODE, UPLOAD_ROOT
+
+
+WIDTHS = (160, 320, 640)
+MAX_ASPECT = 2  # crop portraits taller than 1:2 before resizing
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif')
+_DERIVATIVE = re.compile(r'\.w\d+\.(webp|jpg)$')
+
+# derivative extension -> (Pillow format, save options)
+FORMATS = {
+    'webp': ('WEBP', {'quality': 78, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='images')
+_lock = threading.Lock()
+_pending = set()
+_ready = set()
+
+
+# ===========================================================
+# NAMES
+# ===========================================================
+def normalise(path):
+    """
+    Reduce the stored forms ('ab/x.jpg', 'uploads/ab/x.jpg',
+    '/static/uploads/ab/x.jpg') to the name under static/uploads.
+    """
+    name = (path or '').lstrip('/')
+    for prefix in ('static/', 'uploads/'):
+        if name.startswith(prefix):
+            name = name[len(prefix):]
+    return name
+
+
+def derivative_name(name, width, ext):
+    return f"{os.path.splitext(name)[0]}.w{width}.{ext}"
+
+
+def _is_image(name):
+    return name.lower().endswith(IMAGE_EXTENSIONS) and not _DERIVATIVE.search(name)
+
+
+def _all_exist(name):
+    return all(os.path.exists(os.path.join(UPLOAD_ROOT, derivative_name(name, width, ext)))
+               for width in WIDTHS for ext in FORMATS)
+
+
+# ===========================================================
+# GENERATION
+# ===========================================================
+def _save(image, path, fmt, options):
+    # Write to a temp file and rename, so readers (and other workers) never see half a file
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.derive-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            image.save(out, fmt, **options)
+        os.chmod(temp_path, FILE_MODE)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def generate(name):
+    """Write every missing derivative of static/uploads/<name>. Returns how many were written."""
+    if Image is None or not _is_image(name):
+        return 0
+    source = os.path.join(UPLOAD_ROOT, name)
+    if not os.path.exists(source):
+        return 0
+
+    written = 0
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original).convert('RGB')
+
+    if image.height > image.width * MAX_ASPECT:
+        top = (image.height - image.width * MAX_ASPECT) // 2
+        image = image.crop((0, top, image.width, top + image.width * MAX_ASPECT))
+
+    for width in WIDTHS:
+        size = (min(width, image.width), max(1, round(image.height * min(width, image.width) / image.width)))
+        resized = image if size == image.size else image.resize(size, Image.LANCZOS)
+        for ext, (fmt, options) in FORMATS.items():
+            path = os.path.join(UPLOAD_ROOT, derivative_name(name, width, ext))
+            if not os.path.exists(path):
+                _save(resized, path, fmt, options)
+                written += 1
+    return written
+
+
+def _run(name):
+    try:
+        generate(name)
+    except Exception as e:
+        print(f"❌ Image derivatives failed for {name}: {e}")
+    finally:
+        with _lock:
+            _pending.discard(name)
+
+
+def schedule(name):
+    """Queue derivative generation for an uploaded image on the background thread."""
+    name = normalise(name)
+    if Image is None or not _is_image(name):
+        return
+    with _lock:
+        if name in _pending or name in _ready:
+            return
+        _pending.add(name)
+    _executor.submit(_run, name)
+
+
+# ===========================================================
+# TEMPLATE HELPER
+# ===========================================================
+def _url(name):
+    return f"/static/uploads/{name}"
+
+
+def variants(path):
+    """
+    URLs for rendering `path` responsively: {'src', 'webp', 'jpg'}, the
+    last two being srcset strings. They are empty until the derivatives
+    exist, so the template falls back to the original.
+    """
+    if not path or '://' in path:
+        return {'src': path or '', 'webp': '', 'jpg': ''}
+
+    name = normalise(path)
+    result = {'src': _url(name), 'webp': '', 'jpg': ''}
+    if not _is_image(name):
+        return result
+
+    if name not in _ready:
+        if not _all_exist(name):
+            schedule(name)
+            return result
+        with _lock:
+            _ready.add(name)
+
+    for ext in FORMATS:
+        result[ext] = ", ".join(
+            f"{_url(derivative_name(name, width, ext))} {width}w" for width in WIDTHS)
+    result['src'] = _url(derivative_name(name, WIDTHS[1], 'jpg'))
+    return result
+
+
+# ===========================================================
+# CLI
+# ===========================================================
+def backfill():
+    """Generate derivatives for every image already under static/uploads."""
+    total = 0
+    for directory, _, files in os.walk(UPLOAD_ROOT):
+        for filename in files:
+            name = os.path.relpath(os.path.join(directory, filename), UPLOAD_ROOT).replace(os.sep, '/')
+            if _is_image(name) and not filename.startswith('.'):
+                written = generate(name)
+                if written:
+                    print(f"🖼️  {name}: {written} derivatives")
+                total += written
+    print(f"✅ Wrote {total} derivatives")
+
+
+if __name__ == '__main__':
+    if Image is None:
+        sys.exit("Pillow is not installed")
+    if sys.argv[1:] == ['backfill']:
+        backfill()
+    else:
+        sys.exit("usage: python images.py backfill")
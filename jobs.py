@@ -0,0 +1,130 @@
+# ===========================================================
+# SCHEDULED JOBS (ONE RUNNER ACROSS ALL WORKERS)
+# ===========================================================
+"""
+Every gunicorn worker (and every dyno) starts its own APScheduler, so each
+cron trigger fires once per process. run() makes sure a job body executes
+only once per period anyway:
+
+* the runner takes a transaction-level Postgres advisory lock named after
+  the job, and the other processes skip instead of waiting;
+* while it holds the lock it checks scheduled_job_runs, so a process that
+  fires late still skips a period that has already succeeded;
+* the run record (start, duration, rows touched, status) is written in the
+  same transaction. The lock is released when it commits, or automatically
+  if the process dies.
+
+catch_up() runs on a short interval and starts any job whose current period
+has no successful run yet, so runs missed while nothing was up happen once
+the app is back rather than being skipped.
+"""
+import os
+import time
+
+import metrics
+from db import pooled_connection
+
+
+CATCH_UP_MINUTES = int(os.getenv("JOB_CATCH_UP_MINUTES", "15"))
+
+_jobs = {}  # name -> (func, period)
+
+
+def register(name, func, period='day'):
+    """
+    Register a job body. `func` takes no arguments and returns the number of
+    rows it touched; `period` is a date_trunc() unit ('hour', 'day', 'week').
+    """
+    _jobs[name] = (func, period)
+
+
+def run(name, force=False):
+    """
+    Run a registered job if no other process is running it and it has not
+    already succeeded this period (unless `force`). Returns the rows touched,
+    or None if the run was skipped.
+    """
+    func, period = _jobs[name]
+
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s))", (f"job:{name}",))
+            if not cur.fetchone()[0]:
+                conn.rollback()
+                print(f"⏭️ Job {name} is running in another process")
+                return None
+
+            if not force:
+                cur.execute("""
+                    SELECT 1 FROM scheduled_job_runs
+                    WHERE job_name = %s AND status = 'success'
+                      AND started_at >= date_trunc(%s, CURRENT_TIMESTAMP)
+                    LIMIT 1
+                """, (name, period))
+                if cur.fetchone():
+                    conn.rollback()
+                    print(f"⏭️ Job {name} already ran this {period}")
+                    return None
+
+            print(f"▶️ Running job {name}")
+            started = time.monotonic()
+            rows, status, error = None, 'success', None
+            try:
+                rows = func()
+            except Exception as e:
+                status, error = 'failed', str(e)
+                print(f"❌ Job {name} failed: {e}")
+            duration = time.monotonic() - started
+            duration_ms = int(duration * 1000)
+            metrics.observe_job(name, duration, status)
+
+            # CURRENT_TIMESTAMP is the start of this transaction, i.e. when the lock was taken
+            cur.execute("""
+                INSERT INTO scheduled_job_runs
+                    (job_name, started_at, finished_at, duration_ms, rows_affected, status, error)
+                VALUES (%s, CURRENT_TIMESTAMP, clock_timestamp(), %s, %s, %s, %s)
+            """, (name, duration_ms, rows, status, error))
+        conn.commit()
+
+    if status == 'success':
+        print(f"✅ Job {name} finished in {duration_ms} ms, rows: {rows}")
+    return rows
+
+
+def catch_up():
+    """Run every job whose current period has no successful run yet."""
+    for name in list(_jobs):
+        try:
+            run(name)
+        except Exception as e:
+            print(f"❌ Catch-up for job {name} failed: {e}")
+
+
+def status():
+    """Last run and last success of every registered job."""
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT job_name,
+                       MAX(started_at) AS last_run,
+                       MAX(started_at) FILTER (WHERE status = 'success') AS last_success,
+                       (ARRAY_AGG(status ORDER BY started_at DESC))[1] AS last_status,
+                       (ARRAY_AGG(duration_ms ORDER BY started_at DESC))[1] AS last_duration_ms,
+                       (ARRAY_AGG(rows_affected ORDER BY started_at DESC))[1] AS last_rows_affected
+                FROM scheduled_job_runs
+                WHERE job_name = ANY(%s)
+                GROUP BY job_name
+            """, (list(_jobs),))
+            columns = [c[0] for c in cur.description]
+            rows = {row[0]: dict(zip(columns, row)) for row in cur.fetchall()}
+        conn.rollback()
+
+    result = {}
+    for name, (_, period) in _jobs.items():
+        entry = rows.get(name, {'job_name': name, 'last_run': None, 'last_success': None})
+        entry['period'] = period
+        for key in ('last_run', 'last_success'):
+            if entry.get(key) is not None:
+                entry[key] = entry[key].isoformat()
+        result[name] = entry
+    return result
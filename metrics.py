@@ -0,0 +1,167 @@
+# ===========================================================
+# PROMETHEUS METRICS
+# ===========================================================
+"""
+Request, database, template, upload, job and pool metrics at /metrics.
+
+Recorded per request (labelled by Flask endpoint, so cardinality stays
+bounded):
+- eduboost_request_duration_seconds: wall time, by method and status;
+- eduboost_request_db_queries / eduboost_request_db_seconds: how many
+  statements the request ran through get_cursor() and how long they took;
+- eduboost_db_checkout_seconds: time spent getting a pooled connection,
+  including connection setup when the pool had to open one.
+Elsewhere:
+- eduboost_template_render_seconds, by template (Flask render signals);
+- eduboost_upload_bytes_total / eduboost_uploads_total, by file type;
+- eduboost_job_duration_seconds / eduboost_job_runs_total (jobs.run);
+- eduboost_db_pool_* gauges, refreshed by each worker after requests.
+
+Under gunicorn, gunicorn.conf.py points PROMETHEUS_MULTIPROC_DIR at a fresh
+directory before the workers fork. Each worker then writes its samples
+there, and /metrics merges every worker's files: histograms and counters
+are summed, and pool gauges are summed over live workers. Without the
+variable (flask run, python app.py) the in-process registry is served.
+
+Scrapers authenticate with `Authorization: Bearer $METRICS_TOKEN`; admins
+can also open /metrics in the browser.
+"""
+import os
+import time
+
+from flask import Response, before_render_template, g, request, session, template_rendered
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter,
+                               Gauge, Histogram, generate_latest, multiprocess)
+
+import db
+
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+POOL_GAUGE_INTERVAL = 1.0  # seconds between pool gauge refreshes per worker
+
+if MULTIPROC_DIR:
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+
+REQUEST_SECONDS = Histogram(
+    'eduboost_request_duration_seconds', 'Request wall time',
+    ['endpoint', 'method', 'status'])
+REQUEST_DB_QUERIES = Histogram(
+    'eduboost_request_db_queries', 'Statements executed per request',
+    ['endpoint'], buckets=QUERY_BUCKETS)
+REQUEST_DB_SECONDS = Histogram(
+    'eduboost_request_db_seconds', 'Time spent executing statements per request',
+    ['endpoint'])
+DB_CHECKOUT_SECONDS = Histogram(
+    'eduboost_db_checkout_seconds', 'Time to get a pooled connection (waiting and connecting)',
+    ['endpoint'])
+TEMPLATE_SECONDS = Histogram(
+    'eduboost_template_render_seconds', 'Jinja render time', ['template'])
+UPLOAD_BYTES = Counter('eduboost_upload_bytes_total', 'Bytes received in accepted uploads', ['type'])
+UPLOADS = Counter('eduboost_uploads_total', 'Accepted uploads', ['type'])
+JOB_SECONDS = Histogram(
+    'eduboost_job_duration_seconds', 'Scheduled job run time', ['job'],
+    buckets=(0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600))
+JOB_RUNS = Counter('eduboost_job_runs_total', 'Scheduled job runs', ['job', 'status'])
+
+POOL_CONNECTIONS = Gauge(
+    'eduboost_db_pool_connections', 'Pooled connections by state',
+    ['state'], multiprocess_mode='livesum')
+POOL_MAX = Gauge('eduboost_db_pool_max', 'Pool size limit', multiprocess_mode='livesum')
+POOL_WAITING = Gauge(
+    'eduboost_db_pool_waiting', 'Threads waiting for a connection', multiprocess_mode='livesum')
+BREAKER_OPEN = Gauge(
+    'eduboost_db_breaker_open', '1 while a worker\'s circuit breaker is open',
+    multiprocess_mode='livemax')
+
+_pool_gauges_at = 0.0
+
+
+# ===========================================================
+# RECORDING
+# ===========================================================
+def observe_upload(file_type, size):
+    UPLOADS.labels(file_type).inc()
+    UPLOAD_BYTES.labels(file_type).inc(size)
+
+
+def observe_job(name, seconds, status):
+    JOB_SECONDS.labels(name).observe(seconds)
+    JOB_RUNS.labels(name, status).inc()
+
+
+def _update_pool_gauges(force=False):
+    global _pool_gauges_at
+    now = time.monotonic()
+    if not force and now - _pool_gauges_at < POOL_GAUGE_INTERVAL:
+        return
+    _pool_gauges_at = now
+    stats = db.pool_stats()
+    POOL_CONNECTIONS.labels('in_use').set(stats['in_use'])
+    POOL_CONNECTIONS.labels('idle').set(stats['idle'])
+    POOL_MAX.set(stats['max'])
+    POOL_WAITING.set(stats['waiting'])
+    BREAKER_OPEN.set(1 if stats['breaker']['state'] == 'open' else 0)
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+
+
+def _finish_request(response):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return response
+    endpoint = request.endpoint or 'unmatched'
+    REQUEST_SECONDS.labels(endpoint, request.method, response.status_code).observe(
+        time.perf_counter() - started)
+    if 'db_checkout_time' in g:
+        DB_CHECKOUT_SECONDS.labels(endpoint).observe(g.db_checkout_time)
+    REQUEST_DB_QUERIES.labels(endpoint).observe(g.get('db_queries', 0))
+    REQUEST_DB_SECONDS.labels(endpoint).observe(g.get('db_time', 0.0))
+    _update_pool_gauges()
+    return response
+
+
+def _render_started(sender, template, context, **extra):
+    g.setdefault('metrics_renders', []).append(time.perf_counter())
+
+
+def _render_finished(sender, template, context, **extra):
+    renders = g.get('metrics_renders')
+    if renders:
+        TEMPLATE_SECONDS.labels(template.name or 'string').observe(time.perf_counter() - renders.pop())
+
+
+# ===========================================================
+# /metrics
+# ===========================================================
+def _authorized():
+    if METRICS_TOKEN and request.headers.get('Authorization') == f"Bearer {METRICS_TOKEN}":
+        return True
+    return session.get('user_role') in ['admin', 'superadmin']
+
+
+def metrics_view():
+    if not _authorized():
+        return Response('Unauthorized', 401, {'WWW-Authenticate': 'Bearer'})
+    _update_pool_gauges(force=True)
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), headers={
+        'Content-Type': CONTENT_TYPE_LATEST,
+        'Cache-Control': 'no-store',
+    })
+
+
+def init_app(app):
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    before_render_template.connect(_render_started, app)
+    template_rendered.connect(_render_finished, app)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
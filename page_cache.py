@@ -0,0 +1,149 @@
+# ===========================================================
+# FULL-PAGE CACHE (ANONYMOUS GETs)
+# ===========================================================
+"""
+Per-worker cache of whole rendered pages for visitors who are not logged in.
+
+Views opt in with @cached_page. A request is served from the cache only
+when it is a GET/HEAD with no session state: no login and no flashed
+messages waiting to be shown. Logged-in users always get a fresh render.
+
+Entries are keyed on path, query string and a version. The version is a
+callable that describes whatever state the page depends on, e.g. the
+registration status, so flipping that state moves every page onto fresh
+keys without an explicit purge.
+
+Only plain 200 responses without cookies are stored. Each entry keeps its
+body and a strong ETag (a hash of the body). Clients revalidate with
+If-None-Match and get a bodiless 304 while nothing has changed.
+
+Memory is bounded by PAGE_CACHE_MAX_BYTES, evicting least recently used
+entries first; PAGE_CACHE_TTL caps how long any page is reused.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, request, session
+
+
+MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+TTL = float(os.getenv("PAGE_CACHE_TTL", "300"))
+MAX_ENTRY_BYTES = MAX_BYTES // 8  # one huge page must not flush everything else
+
+
+class PageCache:
+    def __init__(self, max_bytes=MAX_BYTES, ttl=TTL):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, body, mimetype, etag)
+        self._bytes = 0
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body, mimetype):
+        if len(body) > MAX_ENTRY_BYTES:
+            return None
+        entry = (time.monotonic() + self.ttl, body, mimetype, hashlib.sha1(body).hexdigest())
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return entry
+
+    def _remove(self, key):
+        self._bytes -= len(self._entries.pop(key)[1])
+
+    def count_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'evictions': self.evictions,
+            }
+
+
+page_cache = PageCache()
+
+
+def _anonymous():
+    return request.method in ('GET', 'HEAD') and not session
+
+
+def _respond(entry, status):
+    _, body, mimetype, etag = entry
+    response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'  # always revalidate; a match costs a 304
+    response.headers['X-Page-Cache'] = status
+    response.vary.add('Cookie')
+    response.make_conditional(request)
+    if response.status_code == 304:
+        page_cache.count_not_modified()
+    return response
+
+
+def cached_page(version=None):
+    """
+    Serve the decorated view from the page cache for anonymous GETs.
+    `version` is an optional callable returning the state the page depends on.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not _anonymous():
+                return view(*args, **kwargs)
+
+            key = (request.path, request.query_string, version() if version else None)
+            entry = page_cache.get(key)
+            if entry is not None:
+                return _respond(entry, 'hit')
+
+            response = view(*args, **kwargs)
+            if isinstance(response, str):
+                response = Response(response)
+            cacheable = (isinstance(response, Response) and response.status_code == 200
+                         and not response.is_streamed and 'Set-Cookie' not in response.headers
+                         and not session.modified)
+            if not cacheable:
+                return response
+
+            entry = page_cache.put(key, response.get_data(), response.mimetype)
+            return _respond(entry, 'miss') if entry else response
+        return wrapper
+    return decorator
@@ -0,0 +1,157 @@
+# ===========================================================
+# KEYSET PAGINATION
+# ===========================================================
+"""
+Cursor-based paging shared by the admin list views.
+
+A Sort names the columns a list is ordered by. The last column must be
+unique (the primary key) so the order is stable, and every column must be
+NOT NULL (wrap nullable ones in COALESCE) because rows are compared as a
+tuple. A page is the first `limit` rows after the cursor:
+
+    WHERE (k1, k2, id) > (%s, %s, %s) ORDER BY k1, k2, id LIMIT n
+
+This costs one index range scan (see the matching indexes in schema.py),
+however deep the page is, unlike OFFSET. The cursor is an opaque token
+holding the sort values of the last row shown.
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class Sort:
+    def __init__(self, label, keys, descending=False):
+        self.label = label
+        self.keys = keys
+        self.descending = descending
+
+    def order_by(self):
+        direction = " DESC" if self.descending else ""
+        return ", ".join(f"{key}{direction}" for key in self.keys)
+
+    def after(self):
+        """Row comparison selecting everything past the cursor."""
+        placeholders = ", ".join(["%s"] * len(self.keys))
+        return f"({', '.join(self.keys)}) {'<' if self.descending else '>'} ({placeholders})"
+
+
+# ===========================================================
+# CURSORS
+# ===========================================================
+def _dump(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'n': str(value)}
+    return value
+
+
+def _load(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        if 'n' in value:
+            return Decimal(value['n'])
+        raise ValueError("unknown cursor value")
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_dump(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, sort):
+    """Return the sort values in `token`, or None if it is missing or does not fit `sort`."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = [_load(v) for v in json.loads(base64.urlsafe_b64decode(padded))]
+    except (ValueError, TypeError, UnicodeDecodeError):
+        return None
+    return values if len(values) == len(sort.keys) else None
+
+
+# ===========================================================
+# QUERY STRING
+# ===========================================================
+def page_size(args, default=PAGE_SIZE):
+    try:
+        size = int(args.get('limit', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def choose_sort(args, sorts):
+    """Pick the Sort named by ?sort=, falling back to the first one."""
+    name = args.get('sort')
+    return (name, sorts[name]) if name in sorts else next(iter(sorts.items()))
+
+
+# ===========================================================
+# PAGING
+# ===========================================================
+def paginate(cur, select, sort, where=(), params=(), after=None, limit=PAGE_SIZE):
+    """
+    Run `select` ("SELECT ... FROM ... JOIN ...", no WHERE / ORDER BY) for
+    one page with a RealDictCursor. `where` is a list of SQL conditions with
+    `params` for their placeholders. Returns (rows, next_cursor);
+    next_cursor is None on the last page.
+    """
+    clauses, values = list(where), list(params)
+    if after:
+        clauses.append(sort.after())
+        values.extend(after)
+    where_sql = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    # The sort keys ride along as extra columns so the cursor can be built from the last row
+    key_names = [f"_page_key_{i}" for i in range(len(sort.keys))]
+    keys = ", ".join(f"{key} AS {name}" for key, name in zip(sort.keys, key_names))
+    select = select.strip()
+    cur.execute(f"""
+        SELECT {keys}, {select[len('SELECT'):]}
+        {where_sql}
+        ORDER BY {sort.order_by()}
+        LIMIT %s
+    """, values + [limit + 1])
+    rows = cur.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1][name] for name in key_names])
+    for row in rows:
+        for name in key_names:
+            del row[name]
+    return rows, next_cursor
+
+
+def page(cur, args, select, sorts, where=(), params=()):
+    """
+    One page of a list view for the query string in `args` (?sort=, ?limit=,
+    ?after=). Returns the template / JSON context:
+    {'rows', 'next_cursor', 'sort', 'sorts', 'limit'}.
+    """
+    sort_name, sort = choose_sort(args, sorts)
+    limit = page_size(args)
+    rows, next_cursor = paginate(cur, select, sort, where, params,
+                                 decode_cursor(args.get('after'), sort), limit)
+    return {
+        'rows': rows,
+        'next_cursor': next_cursor,
+        'sort': sort_name,
+        'sorts': {name: s.label for name, s in sorts.items()},
+        'limit': limit,
+    }
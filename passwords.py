@@ -0,0 +1,188 @@
+# ===========================================================
+# PASSWORD HASHING AND LOGIN LOOKUP
+# ===========================================================
+"""
+Password hashing for every account type, and the single login lookup.
+
+Hashes use werkzeug's PBKDF2-SHA256 format, so the cost is stored with
+each hash. The iteration count is set by PASSWORD_HASH_ITERATIONS, or, if
+that is unset, calibrated when the worker starts so that one verification
+costs about PASSWORD_HASH_BUDGET_MS of CPU. Pin the variable in production
+so every host hashes at the same cost.
+
+Accounts still holding a plaintext password (from before hashing) or a
+hash much weaker than the current cost are rehashed on their next
+successful login. Lookups that find no account still spend one
+verification, so response time does not reveal which emails exist.
+
+The principals view (schema migration 8) unions Student, Mentor and Admin
+by email, so a login costs one indexed query whatever the role.
+"""
+import hmac
+import os
+import threading
+import time
+from collections import deque
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+BUDGET_MS = float(os.getenv("PASSWORD_HASH_BUDGET_MS", "150"))
+MIN_ITERATIONS = 100_000
+MAX_ITERATIONS = 1_200_000
+REHASH_BELOW = 0.5  # rehash when a stored hash costs less than half the current target
+HASH_PREFIX = 'pbkdf2:'
+_SAMPLES = 512
+
+
+# ===========================================================
+# COST CALIBRATION
+# ===========================================================
+def _calibrate():
+    pinned = os.getenv("PASSWORD_HASH_ITERATIONS")
+    if pinned:
+        return int(pinned)
+
+    # Time a small run, then scale linearly to the budget
+    probe = 20_000
+    started = time.perf_counter()
+    generate_password_hash('calibration', method=f"pbkdf2:sha256:{probe}")
+    per_iteration = (time.perf_counter() - started) / probe
+    iterations = int((BUDGET_MS / 1000.0) / per_iteration) if per_iteration else MAX_ITERATIONS
+    return max(MIN_ITERATIONS, min(iterations, MAX_ITERATIONS))
+
+
+class _Hasher:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._iterations = None
+        self._dummy = None
+        self._timings = deque(maxlen=_SAMPLES)
+
+    @property
+    def iterations(self):
+        if self._iterations is None:
+            with self._lock:
+                if self._iterations is None:
+                    self._iterations = _calibrate()
+                    print(f"🔐 Password hashing at {self._iterations} PBKDF2 iterations")
+        return self._iterations
+
+    @property
+    def method(self):
+        return f"pbkdf2:sha256:{self.iterations}"
+
+    @property
+    def dummy(self):
+        # Verified against when no account matches, to keep timing uniform
+        if self._dummy is None:
+            self._dummy = generate_password_hash(os.urandom(16).hex(), method=self.method)
+        return self._dummy
+
+    def record(self, seconds):
+        self._timings.append(seconds * 1000.0)
+
+    def stats(self):
+        timings = sorted(self._timings)
+
+        def pct(p):
+            return round(timings[min(len(timings) - 1, int(p * len(timings)))], 1) if timings else None
+
+        return {
+            'iterations': self.iterations,
+            'budget_ms': BUDGET_MS,
+            'samples': len(timings),
+            'p50_ms': pct(0.50),
+            'p99_ms': pct(0.99),
+        }
+
+
+_hasher = _Hasher()
+
+
+# ===========================================================
+# PUBLIC API
+# ===========================================================
+def hash_password(password):
+    return generate_password_hash(password, method=_hasher.method)
+
+
+def is_hashed(stored):
+    return bool(stored) and stored.startswith(HASH_PREFIX) and stored.count('$') == 2
+
+
+def _iterations_of(stored):
+    try:
+        return int(stored.split('$', 1)[0].split(':')[2])
+    except (IndexError, ValueError):
+        return 0
+
+
+def verify(stored, password):
+    """
+    Check `password` against a stored hash or legacy plaintext value.
+    Returns (ok, needs_rehash).
+    """
+    started = time.perf_counter()
+    try:
+        if not stored or password is None:
+            check_password_hash(_hasher.dummy, password or '')
+            return False, False
+
+        if is_hashed(stored):
+            ok = check_password_hash(stored, password)
+            weak = _iterations_of(stored) < _hasher.iterations * REHASH_BELOW
+            return ok, ok and weak
+
+        # Legacy plaintext: spend the same time, then compare in constant time
+        check_password_hash(_hasher.dummy, password)
+        ok = hmac.compare_digest(stored.encode('utf-8'), password.encode('utf-8'))
+        return ok, ok
+    finally:
+        _hasher.record(time.perf_counter() - started)
+
+
+def stats():
+    """Current hash cost and recent verification timings for this worker."""
+    return _hasher.stats()
+
+
+# ===========================================================
+# LOGIN LOOKUP
+# ===========================================================
+# principal role -> (table, id column) used to write back a rehashed password
+_TABLES = {
+    'student': ('Student', 'student_id'),
+    'mentor': ('Mentor', 'mentor_id'),
+    'admin': ('Admin', 'admin_id'),
+}
+
+
+def authenticate(cur, email, password):
+    """
+    Find the account for `email` across all roles in one query (students
+    first, then mentors, then admins, as before) and verify the password.
+    Rehashes the stored password when needed; the caller commits.
+    Returns the principals row (a dict) or None.
+    """
+    cur.execute("""
+        SELECT role, principal_id, email, password, name, surname, grade, admin_role
+        FROM principals
+        WHERE email = %s AND active
+        ORDER BY priority
+    """, (email,))
+    candidates = cur.fetchall()
+
+    if not candidates:
+        verify(None, password)
+        return None
+
+    for principal in candidates:
+        ok, needs_rehash = verify(principal['password'], password)
+        if ok:
+            if needs_rehash:
+                table, id_column = _TABLES[principal['role']]
+                cur.execute(f"UPDATE {table} SET password = %s WHERE {id_column}::text = %s",
+                            (hash_password(password), principal['principal_id']))
+            return principal
+    return None
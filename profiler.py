@@ -0,0 +1,342 @@
+# ===========================================================
+# ON-DEMAND REQUEST PROFILER (ADMIN ONLY)
+# ===========================================================
+"""
+Profiles single production requests so admins can see where the time goes.
+
+A request is profiled when one of these is true:
+- it carries a profile token, in the X-Profile header or the `_profile`
+  query flag. Tokens are signed with the app's secret key and issued to
+  admins at /check-db/profiles/token. They expire after PROFILE_TOKEN_MAX_AGE
+  and can be limited to one endpoint. An admin can send a token to a user
+  as a link, so the page gets profiled as that user sees it;
+- an admin adds `?_profile=1` to a URL in their own session;
+- random sampling picks it, at PROFILE_SAMPLE_RATE (0 by default).
+
+Two modes:
+- "sample": a background thread reads the request thread's stack every
+  PROFILE_SAMPLE_INTERVAL seconds. It is cheap enough for random sampling,
+  and its output is collapsed stacks ("a;b;c 42") for flamegraph.pl or
+  speedscope.
+- "cprofile": exact call counts and times, downloadable as a .pstats file
+  (snakeviz, pstats) or as a text summary. Only one can run per worker at a
+  time; on Python 3.12 it also sees calls from the worker's other threads.
+  When one is already running, the request falls back to the sampler.
+Tokens can also ask for memory (`mem`). tracemalloc then runs for the
+request, and the lines that grew the most are stored with the profile.
+tracemalloc traces the whole process, so busy neighbours add noise.
+
+Results are written per worker under PROFILE_DIR/<pid>/, keeping the newest
+PROFILE_KEEP. Any worker can list and serve every worker's results.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from flask import current_app, g, request, send_file, session
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "eduboost-profiles"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))               # per worker
+SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+TOKEN_MAX_AGE = int(os.getenv("PROFILE_TOKEN_MAX_AGE", "3600"))
+MEMORY_TOP = 25
+MODES = ('sample', 'cprofile')
+ADMIN_ROLES = ['admin', 'superadmin']
+
+FORMATS = {
+    'json': ('.json', 'application/json'),
+    'collapsed': ('.collapsed', 'text/plain'),
+    'pstats': ('.pstats', 'application/octet-stream'),
+    'txt': ('.txt', 'text/plain'),
+}
+_PROFILE_ID = re.compile(r'^(\d+)-\d+-\d+$')
+
+_cprofile_lock = threading.Lock()   # one cProfile per process
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_seq_lock = threading.Lock()
+_seq = 0
+
+
+def is_admin():
+    return session.get('user_role') in ADMIN_ROLES
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.secret_key, salt='eduboost-profile')
+
+
+# ===========================================================
+# STACK SAMPLER
+# ===========================================================
+class StackSampler:
+    """Counts the stacks of one thread, read every `interval` seconds from another."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+# ===========================================================
+# TRACEMALLOC (SHARED BY OVERLAPPING REQUESTS)
+# ===========================================================
+def _tracemalloc_acquire():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+        _tracemalloc_users += 1
+    return tracemalloc.take_snapshot()
+
+
+def _tracemalloc_release(before):
+    global _tracemalloc_users
+    after = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0:
+            tracemalloc.stop()
+    growth = after.compare_to(before, 'lineno')[:MEMORY_TOP]
+    return {
+        'traced_bytes': current,
+        'traced_peak_bytes': peak,
+        'top_growth': [str(stat) for stat in growth],
+    }
+
+
+# ===========================================================
+# TRIGGERS
+# ===========================================================
+def issue_token(mode='cprofile', memory=False, endpoint=None):
+    """A signed token that profiles matching requests until it expires."""
+    payload = {'mode': mode if mode in MODES else 'cprofile', 'mem': bool(memory), 'endpoint': endpoint,
+               'by': session.get('user_id')}
+    return _serializer().dumps(payload)
+
+
+def _requested():
+    """The (mode, memory) this request should be profiled with, or None."""
+    flag = request.headers.get('X-Profile') or request.args.get('_profile')
+    if flag == '1' and is_admin():
+        return request.args.get('_profile_mode', 'cprofile'), request.args.get('_profile_mem') == '1'
+    if flag and flag != '1':
+        try:
+            payload = _serializer().loads(flag, max_age=TOKEN_MAX_AGE)
+        except BadSignature:
+            return None
+        if payload.get('endpoint') and payload['endpoint'] != request.endpoint:
+            return None
+        return payload.get('mode', 'cprofile'), bool(payload.get('mem'))
+    if SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE:
+        return 'sample', False
+    return None
+
+
+# ===========================================================
+# REQUEST HOOKS
+# ===========================================================
+def _start():
+    requested = _requested()
+    if requested is None:
+        return
+    mode, memory = requested
+    state = {'mode': mode, 'started': time.perf_counter(), 'started_at': time.time()}
+
+    if mode == 'cprofile' and _cprofile_lock.acquire(blocking=False):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            state['cprofile'] = profile
+        except ValueError:  # another profiling tool owns the hook
+            _cprofile_lock.release()
+    if 'cprofile' not in state:
+        state['mode'] = 'sample'
+        state['sampler'] = StackSampler(threading.get_ident())
+        state['sampler'].start()
+
+    if memory:
+        state['snapshot'] = _tracemalloc_acquire()
+    g.profile = state
+
+
+def _stop(state):
+    """Stop collecting; returns the state with its results attached."""
+    state['duration'] = time.perf_counter() - state['started']
+    if 'cprofile' in state:
+        state['cprofile'].disable()
+        _cprofile_lock.release()
+    if 'sampler' in state:
+        state['sampler'].stop()
+    if 'snapshot' in state:
+        state['memory'] = _tracemalloc_release(state.pop('snapshot'))
+    return state
+
+
+def _finish(response):
+    state = g.pop('profile', None)
+    if state is None:
+        return response
+    _stop(state)
+    try:
+        profile_id = _save(state, response.status_code)
+        response.headers['X-Profile-Id'] = profile_id
+        print(f"🔬 Profiled {request.method} {request.path} as {profile_id} "
+              f"({state['mode']}, {state['duration'] * 1000:.0f} ms)")
+    except OSError as e:
+        print(f"⚠️ Could not save profile: {e}")
+    return response
+
+
+def _abandon(exc=None):
+    # after_request did not run (the request failed before a response existed)
+    state = g.pop('profile', None)
+    if state is not None:
+        _stop(state)
+
+
+# ===========================================================
+# STORAGE (PROFILE_DIR/<pid>/<id>.*)
+# ===========================================================
+def _worker_dir():
+    path = os.path.join(PROFILE_DIR, str(os.getpid()))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _save(state, status):
+    global _seq
+    with _seq_lock:
+        _seq += 1
+        profile_id = f"{os.getpid()}-{int(state['started_at'] * 1000)}-{_seq}"
+    base = os.path.join(_worker_dir(), profile_id)
+
+    meta = {
+        'id': profile_id,
+        'pid': os.getpid(),
+        'mode': state['mode'],
+        'endpoint': request.endpoint,
+        'method': request.method,
+        'path': request.path,
+        'status': status,
+        'user_role': session.get('user_role'),
+        'user_id': session.get('user_id'),
+        'started_at': state['started_at'],
+        'duration_ms': round(state['duration'] * 1000, 1),
+        'formats': ['json'],
+    }
+    if 'cprofile' in state:
+        state['cprofile'].dump_stats(base + '.pstats')
+        summary = io.StringIO()
+        pstats.Stats(state['cprofile'], stream=summary).sort_stats('cumulative').print_stats(60)
+        with open(base + '.txt', 'w', encoding='utf-8') as f:
+            f.write(summary.getvalue())
+        meta['formats'] += ['pstats', 'txt']
+    if 'sampler' in state:
+        with open(base + '.collapsed', 'w', encoding='utf-8') as f:
+            f.write(state['sampler'].collapsed())
+        meta['samples'] = state['sampler'].samples
+        meta['formats'].append('collapsed')
+    if 'memory' in state:
+        meta['memory'] = state['memory']
+
+    with open(base + '.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    _prune()
+    return profile_id
+
+
+def _prune():
+    directory = _worker_dir()
+    ids = sorted((name[:-5] for name in os.listdir(directory) if name.endswith('.json')),
+                 key=lambda i: tuple(int(part) for part in i.split('-')[1:]))
+    for old in ids[:-PROFILE_KEEP]:
+        for suffix, _ in FORMATS.values():
+            try:
+                os.remove(os.path.join(directory, old + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles():
+    """Metadata of every stored profile across workers, newest first."""
+    profiles = []
+    if not os.path.isdir(PROFILE_DIR):
+        return profiles
+    for worker in os.listdir(PROFILE_DIR):
+        directory = os.path.join(PROFILE_DIR, worker)
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, name), encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue  # pruned or half-written
+            meta.pop('memory', None)
+            profiles.append(meta)
+    profiles.sort(key=lambda meta: meta['started_at'], reverse=True)
+    return profiles
+
+
+def send_profile(profile_id, fmt):
+    """A download response for one stored profile, or None if it does not exist."""
+    match = _PROFILE_ID.match(profile_id)
+    if not match or fmt not in FORMATS:
+        return None
+    suffix, mimetype = FORMATS[fmt]
+    path = os.path.join(PROFILE_DIR, match.group(1), profile_id + suffix)
+    if not os.path.isfile(path):
+        return None
+    response = send_file(path, mimetype=mimetype, as_attachment=fmt != 'json',
+                         download_name=f"profile-{profile_id}{suffix}")
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def init_app(app):
+    app.before_request(_start)
+    app.after_request(_finish)
+    app.teardown_request(_abandon)
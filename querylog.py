@@ -0,0 +1,175 @@
+# ===========================================================
+# SLOW-QUERY LOG AND N+1 DETECTOR
+# ===========================================================
+"""
+Watches every statement run through a pooled connection.
+
+db.py hands out timed cursor classes, both through get_cursor() and as each
+pooled connection's default cursor_factory. Every execute then reports here
+with its duration:
+
+- Statements slower than DB_SLOW_QUERY_MS are logged in normalized form
+  (literals and placeholders become ?, long IN lists collapse). Bound
+  parameters are logged by shape only, e.g. (int, str, list[25]), so no
+  personal data reaches the logs.
+- With DB_EXPLAIN_SAMPLE_RATE > 0, that share of slow SELECTs are re-run
+  once as EXPLAIN (ANALYZE, BUFFERS) and the plan is logged. This happens at
+  most once per statement every DB_EXPLAIN_INTERVAL seconds, inside a
+  savepoint so a failure cannot poison the caller's transaction.
+- In debug and test runs (or with DB_REPEAT_CHECK=1) each request counts
+  its normalized statements. Any statement run more than DB_REPEAT_THRESHOLD
+  times, the classic per-row loop, is reported when the request ends, and
+  the response carries an X-Query-Repeats header.
+"""
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+
+import psycopg2
+import psycopg2.extensions
+from flask import current_app, g, has_request_context, request
+
+
+SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "500"))        # 0 turns the slow log off
+EXPLAIN_SAMPLE_RATE = float(os.getenv("DB_EXPLAIN_SAMPLE_RATE", "0"))
+EXPLAIN_INTERVAL = float(os.getenv("DB_EXPLAIN_INTERVAL", "600"))
+REPEAT_THRESHOLD = int(os.getenv("DB_REPEAT_THRESHOLD", "10"))
+REPEAT_CHECK = os.getenv("DB_REPEAT_CHECK") == "1"
+MAX_LOGGED_SQL = 400
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_VALUES = re.compile(r"'(?:[^']|'')*'|%\(\w+\)s|%s|\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+_explained_lock = threading.Lock()
+_explained = {}  # normalized statement -> monotonic time of its last EXPLAIN
+
+
+# ===========================================================
+# NORMALIZING
+# ===========================================================
+@lru_cache(maxsize=1024)
+def normalize(query):
+    """SQL with comments dropped, values replaced by ? and whitespace collapsed."""
+    sql = _COMMENTS.sub(' ', query)
+    sql = _VALUES.sub('?', sql)
+    sql = _LISTS.sub('(?, ...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def _type_name(value):
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def param_shape(params):
+    """Types (and list lengths) of the bound parameters, never their values."""
+    if params is None:
+        return '()'
+    if isinstance(params, dict):
+        return '{' + ', '.join(f"{k}: {_type_name(v)}" for k, v in params.items()) + '}'
+    return '(' + ', '.join(_type_name(v) for v in params) + ')'
+
+
+def _where():
+    return f"{request.method} {request.path}" if has_request_context() else "background"
+
+
+def _sql_text(query):
+    if isinstance(query, bytes):
+        return query.decode('utf-8', 'replace')
+    return query if isinstance(query, str) else str(query)
+
+
+# ===========================================================
+# OBSERVING
+# ===========================================================
+def _repeat_check_enabled():
+    return has_request_context() and (REPEAT_CHECK or current_app.debug or current_app.testing)
+
+
+def observe(cur, query, params, seconds, many=False):
+    """Called by db.py's timed cursors after every execute / executemany."""
+    sql = normalize(_sql_text(query))
+
+    if _repeat_check_enabled():
+        counts = g.get('querylog_counts')
+        if counts is None:
+            counts = g.querylog_counts = Counter()
+        counts[sql] += 1
+
+    if not SLOW_QUERY_MS or seconds * 1000 < SLOW_QUERY_MS:
+        return
+
+    if not many:
+        shape = param_shape(params)
+    elif isinstance(params, (list, tuple)) and params:
+        shape = f"{len(params)} x {param_shape(params[0])}"
+    else:
+        shape = "(many)"
+    print(f"🐢 Slow query {seconds * 1000:.0f} ms [{_where()}] {sql[:MAX_LOGGED_SQL]} params={shape}")
+
+    if not many and isinstance(query, str) and _should_explain(sql):
+        _explain(cur, query, params, sql)
+
+
+def _should_explain(sql):
+    if EXPLAIN_SAMPLE_RATE <= 0 or sql[:6].lower() != 'select':
+        return False  # ANALYZE runs the statement again, so only plain SELECTs
+    if random.random() >= EXPLAIN_SAMPLE_RATE:
+        return False
+    now = time.monotonic()
+    with _explained_lock:
+        if now - _explained.get(sql, -EXPLAIN_INTERVAL) < EXPLAIN_INTERVAL:
+            return False
+        _explained[sql] = now
+    return True
+
+
+def _explain(cur, query, params, sql):
+    conn = cur.connection
+    status = conn.get_transaction_status()
+    if status == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+        return
+    in_transaction = status == psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+
+    # A plain cursor class, so the EXPLAIN itself is not observed
+    with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as plan_cur:
+        try:
+            if in_transaction:
+                plan_cur.execute("SAVEPOINT querylog_explain")
+            plan_cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + query, params)
+            plan = "\n".join(f"    {row[0]}" for row in plan_cur.fetchall())
+            if in_transaction:
+                plan_cur.execute("RELEASE SAVEPOINT querylog_explain")
+        except psycopg2.Error as e:
+            if in_transaction:
+                plan_cur.execute("ROLLBACK TO SAVEPOINT querylog_explain")
+            print(f"⚠️ Could not EXPLAIN slow query: {e}")
+            return
+    print(f"🔍 Plan for {sql[:MAX_LOGGED_SQL]}\n{plan}")
+
+
+# ===========================================================
+# PER-REQUEST REPEAT REPORT
+# ===========================================================
+def _report_repeats(response):
+    counts = g.pop('querylog_counts', None)
+    if not counts:
+        return response
+    repeated = [(sql, n) for sql, n in counts.most_common() if n > REPEAT_THRESHOLD]
+    if repeated:
+        response.headers['X-Query-Repeats'] = str(repeated[0][1])
+        for sql, n in repeated:
+            print(f"⚠️ N+1 suspect [{_where()}] ran {n} times: {sql[:MAX_LOGGED_SQL]}")
+    return response
+
+
+def init_app(app):
+    app.after_request(_report_repeats)
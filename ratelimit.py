@@ -0,0 +1,228 @@
+# ===========================================================
+# RATE LIMITING AND LOAD SHEDDING (PUBLIC ENDPOINTS)
+# ===========================================================
+"""
+Token buckets and a concurrency cap for the unauthenticated endpoints.
+
+Views opt in with @rate_limited, listed below @app.route so it runs before
+the page cache and before any database work. For each guarded request:
+- the client IP takes a token from its bucket;
+- optionally, the account named in a form field (e.g. the email being
+  logged into) takes one from a second bucket. This stops credential
+  stuffing that rotates IPs, and is not set off by a whole school sharing
+  one NAT address;
+- it then needs a free slot out of PUBLIC_MAX_CONCURRENT, shared by every
+  guarded endpoint in this worker. This keeps gunicorn threads free for
+  logged-in users during a storm.
+An empty bucket gets a 429 and a full cap gets a 503. Both carry Retry-After
+and are answered without touching the pool.
+
+Buckets live in this worker's memory by default: one OrderedDict behind a
+lock, shared by all its threads and bounded to RATE_LIMIT_MAX_KEYS (least
+recently used first). Set RATE_LIMIT_REDIS_URL (and `pip install redis`) to
+share the buckets across workers and hosts. Each take is then a single
+atomic Lua script keyed on the Redis clock. If Redis stops answering, the
+local buckets take over until it is back.
+
+The client IP is read from X-Forwarded-For, counting TRUSTED_PROXY_HOPS
+proxies in from the right (the platform router by default). Set it to 0
+when the app is reached directly.
+"""
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import wraps
+
+from flask import make_response, request
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+ENABLED = os.getenv("RATE_LIMITS", "1") != "0"
+REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "50000"))
+MAX_CONCURRENT = int(os.getenv("PUBLIC_MAX_CONCURRENT", "4"))  # of the worker's 8 threads
+SHED_RETRY_AFTER = 5
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+REDIS_RETRY_INTERVAL = 30  # seconds on local buckets after a Redis error
+
+
+class Rate(namedtuple('Rate', 'capacity period')):
+    """`capacity` requests in a burst, refilled evenly over `period` seconds."""
+
+    @property
+    def refill(self):
+        return self.capacity / self.period
+
+
+# ===========================================================
+# BUCKET STORES
+# ===========================================================
+class LocalBuckets:
+    def __init__(self, max_keys=MAX_KEYS):
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self.max_keys = max_keys
+
+    def take(self, key, rate):
+        """Take one token; return 0 if granted, else the seconds until one is free."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (rate.capacity, now))
+            tokens = min(rate.capacity, tokens + (now - updated) * rate.refill)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / rate.refill
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# Same arithmetic as LocalBuckets.take, atomic on the server and timed by its clock
+_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * refill)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / refill
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / refill * 1000))
+return tostring(wait)
+"""
+
+
+class RedisBuckets:
+    def __init__(self, url, fallback):
+        self._client = redis.Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25)
+        self._take = self._client.register_script(_TAKE_SCRIPT)
+        self._fallback = fallback
+        self._down_until = 0
+        self.errors = 0
+
+    def take(self, key, rate):
+        if time.monotonic() < self._down_until:
+            return self._fallback.take(key, rate)
+        try:
+            return float(self._take(keys=[f"ratelimit:{key}"], args=[rate.capacity, rate.refill]))
+        except redis.RedisError as e:
+            self.errors += 1
+            self._down_until = time.monotonic() + REDIS_RETRY_INTERVAL
+            print(f"⚠️ Rate limit store unavailable, using local buckets: {e}")
+            return self._fallback.take(key, rate)
+
+    def __len__(self):
+        return len(self._fallback)
+
+
+local_buckets = LocalBuckets()
+if REDIS_URL and redis is not None:
+    buckets = RedisBuckets(REDIS_URL, local_buckets)
+else:
+    if REDIS_URL:
+        print("⚠️ RATE_LIMIT_REDIS_URL is set but the redis package is missing; using local buckets")
+    buckets = local_buckets
+
+
+# ===========================================================
+# LIMITS
+# ===========================================================
+_slots = threading.BoundedSemaphore(MAX_CONCURRENT)
+_stats_lock = threading.Lock()
+_stats = {}  # endpoint -> {'allowed', 'limited', 'shed'}
+
+
+def _count(endpoint, outcome):
+    with _stats_lock:
+        counts = _stats.setdefault(endpoint, {'allowed': 0, 'limited': 0, 'shed': 0})
+        counts[outcome] += 1
+
+
+def client_ip():
+    forwarded = [a.strip() for a in request.headers.get('X-Forwarded-For', '').split(',') if a.strip()]
+    if TRUSTED_PROXY_HOPS and len(forwarded) >= TRUSTED_PROXY_HOPS:
+        return forwarded[-TRUSTED_PROXY_HOPS]
+    return request.remote_addr or 'unknown'
+
+
+def _account_key(value):
+    # Hashed so the store never holds the email addresses themselves
+    return hashlib.sha1(value.strip().lower().encode('utf-8')).hexdigest()
+
+
+def _reject(status, retry_after, message):
+    response = make_response(message, status)
+    response.headers['Retry-After'] = str(retry_after)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def rate_limited(ip, account=None, account_field='email', methods=('POST',)):
+    """
+    Guard the decorated view with an IP bucket (`ip`, a Rate) and optionally an
+    account bucket (`account`) keyed on the form field `account_field`.
+    Only requests using one of `methods` are counted.
+    """
+    def decorator(view):
+        scope = view.__name__
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not ENABLED or request.method not in methods:
+                return view(*args, **kwargs)
+
+            wait = buckets.take(f"{scope}:ip:{client_ip()}", ip)
+            if not wait and account is not None:
+                value = request.form.get(account_field)
+                if value and value.strip():
+                    wait = buckets.take(f"{scope}:account:{_account_key(value)}", account)
+            if wait:
+                _count(scope, 'limited')
+                return _reject(429, math.ceil(wait),
+                               "❌ Too many attempts. Please wait a moment and try again.")
+
+            if not _slots.acquire(blocking=False):
+                _count(scope, 'shed')
+                print(f"⚠️ Shedding {request.method} {request.path}: {MAX_CONCURRENT} public requests in flight")
+                return _reject(503, SHED_RETRY_AFTER,
+                               "❌ We are very busy right now. Please try again in a few seconds.")
+            try:
+                _count(scope, 'allowed')
+                return view(*args, **kwargs)
+            finally:
+                _slots.release()
+        return wrapper
+    return decorator
+
+
+def stats():
+    with _stats_lock:
+        endpoints = {name: dict(counts) for name, counts in _stats.items()}
+    return {
+        'enabled': ENABLED,
+        'backend': 'redis' if isinstance(buckets, RedisBuckets) else 'local',
+        'backend_errors': getattr(buckets, 'errors', 0),
+        'local_keys': len(local_buckets),
+        'max_concurrent': MAX_CONCURRENT,
+        'endpoints': endpoints,
+    }
@@ -0,0 +1,155 @@
+# ===========================================================
+# REGISTRATION STATUS (CACHED PER WORKER)
+# ===========================================================
+"""
+In-memory registration open/closed state.
+
+Each worker keeps the latest 'registration_status' Notification in memory.
+toggle_registration publishes the new state on a Postgres NOTIFY channel so
+every worker (and every dyno) picks it up as soon as the transaction commits.
+The worker's shared db.listener applies those notifications; if it is down,
+or a notification is missed, the cached value still expires after a TTL and
+is reloaded from the database.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from db import listener, notify, pooled_connection
+
+
+CHANNEL = "registration_status"
+CACHE_TTL = float(os.getenv("REGISTRATION_CACHE_TTL", "300"))               # while LISTEN is healthy
+CACHE_TTL_UNLISTENED = float(os.getenv("REGISTRATION_CACHE_TTL_FALLBACK", "30"))  # while it is not
+
+# Server-sent event streams each hold a gunicorn thread, so cap them per worker;
+# clients that do not get a slot fall back to ETag-conditional polling
+STREAM_LIMIT = int(os.getenv("REGISTRATION_STREAM_LIMIT", "4"))
+STREAM_LIFETIME = float(os.getenv("REGISTRATION_STREAM_LIFETIME", "55"))
+STREAM_KEEPALIVE = 15
+
+DEFAULT_OPEN_MESSAGE = "Registration is open. You can sign up now."
+DEFAULT_CLOSED_MESSAGE = ("Registration is currently closed. We will open registrations "
+                          "at the beginning of the next term.")
+
+
+def classify(message):
+    """Map a stored notification message onto 'open' / 'closed'."""
+    text = (message or '').lower()
+    return 'closed' if ('closed' in text or 'not open' in text) else 'open'
+
+
+def _version(status, message):
+    # Derived from content so every worker computes the same value
+    return hashlib.sha1(f"{status}:{message}".encode('utf-8')).hexdigest()[:16]
+
+
+class RegistrationState:
+    """Thread-safe holder for the current registration state of this worker."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._status = None
+        self._message = None
+        self._version = None
+        self._loaded_at = 0.0
+        self._streams = 0
+        listener.subscribe(CHANNEL, self._on_notify, on_reconnect=self.expire)
+
+    # ---------- loading ----------
+    def _load_from_db(self):
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT message FROM Notification
+                    WHERE notification_type = 'registration_status'
+                    ORDER BY date_sent DESC LIMIT 1
+                """)
+                row = cur.fetchone()
+            conn.rollback()
+        message = row[0] if row else None
+        return classify(message), message
+
+    def _stale(self):
+        ttl = CACHE_TTL if listener.healthy else CACHE_TTL_UNLISTENED
+        return self._status is None or time.monotonic() - self._loaded_at > ttl
+
+    def _on_notify(self, payload):
+        try:
+            data = json.loads(payload)
+            self.set(data['status'], data['message'])
+        except (ValueError, KeyError):
+            self.expire()
+
+    # ---------- public API ----------
+    def expire(self):
+        """Force the next read to reload from the database."""
+        with self._cond:
+            self._loaded_at = 0.0
+
+    def set(self, status, message):
+        """Apply a new state locally and wake anyone waiting for a change."""
+        with self._cond:
+            changed = (status, message) != (self._status, self._message)
+            self._status = status
+            self._message = message
+            self._version = _version(status, message)
+            self._loaded_at = time.monotonic()
+            if changed:
+                self._cond.notify_all()
+
+    def current(self):
+        """Return {'status', 'message', 'version'}, reloading only when stale."""
+        listener.ensure_started()
+        if self._stale():
+            try:
+                status, message = self._load_from_db()
+                self.set(status, message)
+            except Exception as e:
+                print(f"Error checking registration status: {e}")
+                if self._status is None:
+                    # Same default the routes used when the lookup failed
+                    return {'status': 'open', 'message': None, 'version': _version('open', None)}
+        with self._cond:
+            return {'status': self._status, 'message': self._message, 'version': self._version}
+
+    def is_closed(self):
+        return self.current()['status'] == 'closed'
+
+    def wait_for_change(self, version, timeout):
+        """
+        Block until the state no longer matches `version` or `timeout` passes.
+        Returns the new state, or None on timeout. All waiters in a worker share
+        the single LISTEN connection, so no client costs a query.
+        """
+        with self._cond:
+            changed = self._cond.wait_for(lambda: self._version != version, timeout)
+        if not changed:
+            # Lets the TTL fallback kick in when the listener is down
+            state = self.current()
+            return state if state['version'] != version else None
+        return self.current()
+
+    # ---------- server-push slots ----------
+    def acquire_stream(self):
+        with self._cond:
+            if self._streams >= STREAM_LIMIT:
+                return False
+            self._streams += 1
+            return True
+
+    def release_stream(self):
+        with self._cond:
+            self._streams -= 1
+
+    def publish(self, cur, status, message):
+        """
+        Queue a NOTIFY on the caller's transaction; other workers receive it on
+        commit. Call set() after the commit to update this worker immediately.
+        """
+        notify(cur, CHANNEL, json.dumps({'status': status, 'message': message}))
+
+
+registration_state = RegistrationState()
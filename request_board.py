@@ -0,0 +1,171 @@
+# ===========================================================
+# REQUEST BOARD (KEYSET PAGINATION + FACETS)
+# ===========================================================
+"""
+Paged, filtered view of the Request table for the admin and employee boards.
+
+Pages are keyset-paginated (see pagination.py) on (created_at, request_id),
+newest first.
+
+Facet counts (per status, per request type, per mentor) come from a single
+GROUPING SETS pass. They apply the mentor and type filters but not the
+status filter, so the status cards keep showing the full breakdown.
+"""
+from psycopg2.extras import RealDictCursor
+
+import pagination
+from db import get_cursor
+
+
+STATUSES = ('pending', 'in-progress', 'completed')
+PAGE_SIZE = 25
+NEWEST = pagination.Sort('Newest', ['r.created_at', 'r.request_id'], descending=True)
+UNASSIGNED = 'none'
+
+# Columns each board shows; both read Request r LEFT JOIN Student s / Mentor m
+ADMIN_COLUMNS = """
+    r.request_id, r.topic, r.message, r.request_type, r.status,
+    r.created_at, r.updated_at, r.pdf_url,
+    s.name as student_name, s.surname as student_surname,
+    s.phone as student_phone, s.email as student_email,
+    m.name as mentor_name, m.surname as mentor_surname,
+    m.phone as mentor_phone, m.email as mentor_email
+"""
+EMPLOYEE_COLUMNS = """
+    r.request_id, r.topic, r.message, r.request_type, r.status, r.created_at, r.pdf_url,
+    s.name AS student_name, s.surname AS student_surname,
+    s.phone AS student_phone, s.email AS student_email
+"""
+
+
+# ===========================================================
+# FILTERS
+# ===========================================================
+def parse_filters(args):
+    """Read status / mentor / type filters from the query string, dropping invalid values."""
+    filters = {}
+    status = (args.get('status') or '').strip().lower()
+    if status in STATUSES:
+        filters['status'] = status
+
+    mentor = (args.get('mentor') or '').strip().lower()
+    if mentor == UNASSIGNED:
+        filters['mentor'] = UNASSIGNED
+    elif mentor.isdigit():
+        filters['mentor'] = int(mentor)
+
+    request_type = (args.get('type') or '').strip()
+    if request_type:
+        filters['type'] = request_type[:50]
+    return filters
+
+
+def _where(filters, include_status=True):
+    clauses, params = [], []
+    if include_status and 'status' in filters:
+        clauses.append("r.status = %s")
+        params.append(filters['status'])
+    if filters.get('mentor') == UNASSIGNED:
+        clauses.append("r.mentor_id IS NULL")
+    elif 'mentor' in filters:
+        clauses.append("r.mentor_id = %s")
+        params.append(filters['mentor'])
+    if 'type' in filters:
+        clauses.append("r.request_type = %s")
+        params.append(filters['type'])
+    return clauses, params
+
+
+# ===========================================================
+# QUERIES
+# ===========================================================
+def fetch_page(cur, filters, after=None, limit=PAGE_SIZE, columns=ADMIN_COLUMNS):
+    """
+    Return (rows, next_cursor) for one page, newest first. next_cursor is
+    None on the last page.
+    """
+    clauses, params = _where(filters)
+    return pagination.paginate(cur, f"""
+        SELECT {columns}
+        FROM Request r
+        LEFT JOIN Student s ON r.student_id = s.student_id
+        LEFT JOIN Mentor m ON r.mentor_id = m.mentor_id
+    """, NEWEST, clauses, params, after, limit)
+
+
+def facets(cur, filters):
+    """
+    Counts per status, per request type and per mentor in one pass:
+    {'total', 'status': {...}, 'type': {...}, 'mentor': [{'id', 'name', 'count'}]}
+    """
+    clauses, params = _where(filters, include_status=False)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    cur.execute(f"""
+        SELECT GROUPING(r.status) = 0 AS by_status,
+               GROUPING(r.request_type) = 0 AS by_type,
+               r.status, r.request_type, r.mentor_id,
+               MAX(m.name) AS mentor_name, MAX(m.surname) AS mentor_surname,
+               COUNT(*) AS count
+        FROM Request r
+        LEFT JOIN Mentor m ON r.mentor_id = m.mentor_id
+        {where}
+        GROUP BY GROUPING SETS ((r.status), (r.request_type), (r.mentor_id))
+    """, params)
+
+    result = {'total': 0, 'status': {status: 0 for status in STATUSES}, 'type': {}, 'mentor': []}
+    for row in cur.fetchall():
+        if row['by_status']:
+            result['status'][row['status']] = row['count']
+            result['total'] += row['count']
+        elif row['by_type']:
+            if row['request_type'] is not None:
+                result['type'][row['request_type']] = row['count']
+        else:
+            name = f"{row['mentor_name'] or ''} {row['mentor_surname'] or ''}".strip()
+            result['mentor'].append({
+                'id': row['mentor_id'] if row['mentor_id'] is not None else UNASSIGNED,
+                'name': name or 'Unassigned',
+                'count': row['count'],
+            })
+    result['mentor'].sort(key=lambda m: -m['count'])
+    return result
+
+
+def stats(facet_counts):
+    """The stat-card numbers the request templates expect."""
+    return {
+        'total': facet_counts['total'],
+        'pending': facet_counts['status']['pending'],
+        'completed': facet_counts['status']['completed'],
+        'in_progress': facet_counts['status']['in-progress'],
+        'material': facet_counts['type'].get('material', 0),
+    }
+
+
+def empty_board(args):
+    """Template context for a board whose queries failed."""
+    facet_counts = {'total': 0, 'status': {status: 0 for status in STATUSES}, 'type': {}, 'mentor': []}
+    return {
+        'requests': [],
+        'next_cursor': None,
+        'filters': parse_filters(args),
+        'facets': facet_counts,
+        'stats': stats(facet_counts),
+    }
+
+
+def board(args, columns=ADMIN_COLUMNS):
+    """Everything a request board page needs for the given query string."""
+    cur = get_cursor(RealDictCursor)
+    filters = parse_filters(args)
+    rows, next_cursor = fetch_page(cur, filters, pagination.decode_cursor(args.get('after'), NEWEST),
+                                   pagination.page_size(args, PAGE_SIZE), columns)
+    facet_counts = facets(cur, filters)
+    return {
+        'requests': rows,
+        'next_cursor': next_cursor,
+        'filters': filters,
+        'facets': facet_counts,
+        'stats': stats(facet_counts),
+    }
@@ -0,0 +1,579 @@
+# ===========================================================
+# SCHEMA MIGRATIONS
+# ===========================================================
+"""
+Versioned, idempotent schema changes.
+
+Migration 0 holds the baseline DDL for every table the app uses; later
+migrations add to it, including an index for each hot query in app.py.
+Each migration runs once, in its own transaction, and is recorded in the
+schema_migrations table. Every statement is written so that re-running it
+against a database that already has the change is harmless; databases that
+predate this module simply pick up migration 0 as a no-op.
+
+    python schema.py upgrade     # apply pending migrations
+    python schema.py status      # list applied / pending migrations
+    python schema.py check       # report missing indexes and seq-scanning hot queries
+"""
+import json
+import re
+import sys
+
+import psycopg2
+
+from db import connect_kwargs
+
+
+MIGRATIONS = [
+    (0, "baseline tables", """
+        CREATE TABLE IF NOT EXISTS Admin (
+            admin_id    SERIAL PRIMARY KEY,
+            name        VARCHAR(100) NOT NULL,
+            surname     VARCHAR(100),
+            email       VARCHAR(255) NOT NULL,
+            password    VARCHAR(255) NOT NULL,
+            role        VARCHAR(50) NOT NULL DEFAULT 'admin'
+        );
+
+        CREATE TABLE IF NOT EXISTS Student (
+            student_id     VARCHAR(20) PRIMARY KEY,     -- SA ID number
+            name           VARCHAR(100) NOT NULL,
+            surname        VARCHAR(100) NOT NULL,
+            email          VARCHAR(255) NOT NULL,
+            password       VARCHAR(255) NOT NULL,
+            grade          VARCHAR(5) NOT NULL,
+            phone          VARCHAR(20),
+            profile_image  TEXT,
+            status         VARCHAR(20) NOT NULL DEFAULT 'active'
+        );
+
+        CREATE TABLE IF NOT EXISTS Mentor (
+            mentor_id           SERIAL PRIMARY KEY,
+            name                VARCHAR(100) NOT NULL,
+            surname             VARCHAR(100) NOT NULL,
+            email               VARCHAR(255) NOT NULL,
+            phone               VARCHAR(20),
+            subject_speciality  VARCHAR(100),
+            password            VARCHAR(255) NOT NULL,
+            bio                 TEXT,
+            profile_image       TEXT,
+            join_date           DATE DEFAULT CURRENT_DATE,
+            status              VARCHAR(20) NOT NULL DEFAULT 'active'
+        );
+
+        CREATE TABLE IF NOT EXISTS Enrollment (
+            enrollment_id    SERIAL PRIMARY KEY,
+            student_id       VARCHAR(20) NOT NULL REFERENCES Student (student_id) ON DELETE CASCADE,
+            enrollment_days  INTEGER NOT NULL DEFAULT 0,
+            days_remaining   INTEGER NOT NULL DEFAULT 0,
+            status           VARCHAR(20) NOT NULL DEFAULT 'active',
+            enrollment_date  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_updated     TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS Content (
+            content_id    SERIAL PRIMARY KEY,
+            mentor_id     INTEGER REFERENCES Mentor (mentor_id) ON DELETE SET NULL,
+            title         VARCHAR(255) NOT NULL,
+            description   TEXT,
+            subject       VARCHAR(100) NOT NULL,
+            grade         VARCHAR(5) NOT NULL,
+            type          VARCHAR(50),
+            pdf_file      TEXT,
+            file_name     VARCHAR(255),
+            file_size_mb  NUMERIC(10, 2),
+            file_url      TEXT,
+            upload_date   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS ContentRecord (
+            record_id    SERIAL PRIMARY KEY,
+            content_id   INTEGER NOT NULL REFERENCES Content (content_id) ON DELETE CASCADE,
+            file_link    TEXT NOT NULL,
+            upload_date  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS Class (
+            class_id     SERIAL PRIMARY KEY,
+            mentor_id    INTEGER REFERENCES Mentor (mentor_id) ON DELETE SET NULL,
+            title        VARCHAR(255) NOT NULL,
+            topic        VARCHAR(255),
+            type         VARCHAR(50),
+            subject      VARCHAR(100),
+            grade        VARCHAR(5),
+            link         TEXT,
+            start_date   DATE,
+            start_time   TIME,
+            duration     INTEGER,
+            upload_date  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS Request (
+            request_id    SERIAL PRIMARY KEY,
+            student_id    VARCHAR(20) REFERENCES Student (student_id) ON DELETE CASCADE,
+            mentor_id     INTEGER REFERENCES Mentor (mentor_id) ON DELETE SET NULL,
+            topic         VARCHAR(255),
+            message       TEXT,
+            request_type  VARCHAR(50),
+            pdf_url       TEXT,
+            status        VARCHAR(20) NOT NULL DEFAULT 'pending',
+            created_at    TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at    TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS Notification (
+            notification_id    SERIAL PRIMARY KEY,
+            message            TEXT,
+            notification_type  VARCHAR(50) NOT NULL,
+            date_sent          TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS Notifications (
+            id          SERIAL PRIMARY KEY,
+            title       VARCHAR(255),
+            message     TEXT,
+            created_at  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+
+        -- update_request_status relies on this to move updated_at
+        CREATE OR REPLACE FUNCTION request_touch_updated_at() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at := CURRENT_TIMESTAMP;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS request_updated_at ON Request;
+        CREATE TRIGGER request_updated_at BEFORE UPDATE ON Request
+            FOR EACH ROW EXECUTE PROCEDURE request_touch_updated_at();
+    """),
+    (1, "enrollment expires_at", """
+        ALTER TABLE Enrollment ADD COLUMN IF NOT EXISTS expires_at TIMESTAMP;
+
+        -- days_remaining counted down once per midnight, so an enrollment with
+        -- N days left today lapses at the start of the Nth day from now
+        UPDATE Enrollment
+        SET expires_at = CURRENT_DATE + GREATEST(days_remaining, 0)
+        WHERE expires_at IS NULL;
+
+        CREATE INDEX IF NOT EXISTS enrollment_active_expires_idx
+            ON Enrollment (expires_at) WHERE status = 'active';
+    """),
+    (2, "scheduled job runs", """
+        CREATE TABLE IF NOT EXISTS scheduled_job_runs (
+            run_id         BIGSERIAL PRIMARY KEY,
+            job_name       TEXT NOT NULL,
+            started_at     TIMESTAMPTZ NOT NULL,
+            finished_at    TIMESTAMPTZ,
+            duration_ms    INTEGER,
+            rows_affected  INTEGER,
+            status         TEXT NOT NULL,
+            error          TEXT
+        );
+
+        CREATE INDEX IF NOT EXISTS scheduled_job_runs_name_started_idx
+            ON scheduled_job_runs (job_name, started_at DESC);
+    """),
+    (3, "dashboard counters", """
+        CREATE TABLE IF NOT EXISTS dashboard_counters (
+            name           TEXT PRIMARY KEY,
+            value          BIGINT NOT NULL DEFAULT 0,
+            reconciled_at  TIMESTAMPTZ
+        );
+
+        -- TG_ARGV[0] is the counter; a row counts if it matches that
+        -- counter's predicate (see dashboard.COUNTERS)
+        CREATE OR REPLACE FUNCTION dashboard_counter_trigger() RETURNS trigger AS $$
+        DECLARE
+            was_counted BOOLEAN := FALSE;
+            is_counted  BOOLEAN := FALSE;
+        BEGIN
+            IF TG_TABLE_NAME = 'class' THEN
+                IF TG_OP <> 'INSERT' THEN
+                    was_counted := COALESCE(OLD.start_date >= CURRENT_DATE, FALSE);
+                END IF;
+                IF TG_OP <> 'DELETE' THEN
+                    is_counted := COALESCE(NEW.start_date >= CURRENT_DATE, FALSE);
+                END IF;
+            ELSIF TG_TABLE_NAME = 'enrollment' THEN
+                IF TG_OP <> 'INSERT' THEN
+                    was_counted := COALESCE(OLD.status = 'active' AND OLD.expires_at > CURRENT_DATE, FALSE);
+                END IF;
+                IF TG_OP <> 'DELETE' THEN
+                    is_counted := COALESCE(NEW.status = 'active' AND NEW.expires_at > CURRENT_DATE, FALSE);
+                END IF;
+            ELSE
+                was_counted := TG_OP <> 'INSERT';
+                is_counted := TG_OP <> 'DELETE';
+            END IF;
+
+            IF was_counted <> is_counted THEN
+                UPDATE dashboard_counters
+                SET value = value + CASE WHEN is_counted THEN 1 ELSE -1 END
+                WHERE name = TG_ARGV[0];
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS dashboard_students ON Student;
+        CREATE TRIGGER dashboard_students AFTER INSERT OR DELETE ON Student
+            FOR EACH ROW EXECUTE PROCEDURE dashboard_counter_trigger('students');
+
+        DROP TRIGGER IF EXISTS dashboard_mentors ON Mentor;
+        CREATE TRIGGER dashboard_mentors AFTER INSERT OR DELETE ON Mentor
+            FOR EACH ROW EXECUTE PROCEDURE dashboard_counter_trigger('mentors');
+
+        DROP TRIGGER IF EXISTS dashboard_classes ON Class;
+        CREATE TRIGGER dashboard_classes AFTER INSERT OR DELETE OR UPDATE OF start_date ON Class
+            FOR EACH ROW EXECUTE PROCEDURE dashboard_counter_trigger('classes');
+
+        DROP TRIGGER IF EXISTS dashboard_enrollments ON Enrollment;
+        CREATE TRIGGER dashboard_enrollments AFTER INSERT OR DELETE OR UPDATE OF status, expires_at ON Enrollment
+            FOR EACH ROW EXECUTE PROCEDURE dashboard_counter_trigger('active_enrollments');
+    """),
+    (4, "request board keyset indexes", """
+        -- Newest-first pages, optionally filtered by status or mentor (request_board.py)
+        CREATE INDEX IF NOT EXISTS request_created_idx
+            ON Request (created_at DESC, request_id DESC);
+        CREATE INDEX IF NOT EXISTS request_status_created_idx
+            ON Request (status, created_at DESC, request_id DESC);
+        CREATE INDEX IF NOT EXISTS request_mentor_created_idx
+            ON Request (mentor_id, created_at DESC, request_id DESC);
+    """),
+    (5, "admin list keyset indexes", """
+        -- One per sort order in app.py STUDENT_SORTS / MENTOR_SORTS / ENROLLMENT_SORTS;
+        -- expressions must match the sort keys exactly
+        CREATE INDEX IF NOT EXISTS student_name_idx
+            ON Student (name, surname, student_id);
+        CREATE INDEX IF NOT EXISTS student_grade_name_idx
+            ON Student (grade, name, surname, student_id);
+
+        CREATE INDEX IF NOT EXISTS mentor_join_date_idx
+            ON Mentor ((COALESCE(join_date, DATE '1970-01-01')) DESC, mentor_id DESC);
+        CREATE INDEX IF NOT EXISTS mentor_name_idx
+            ON Mentor (name, surname, mentor_id);
+
+        CREATE INDEX IF NOT EXISTS enrollment_last_updated_idx
+            ON Enrollment ((COALESCE(last_updated, TIMESTAMP '1970-01-01')) DESC, enrollment_id DESC);
+        CREATE INDEX IF NOT EXISTS enrollment_expires_idx
+            ON Enrollment ((COALESCE(expires_at, TIMESTAMP '9999-12-31')), enrollment_id);
+    """),
+    (6, "content search", """
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+        ALTER TABLE Content ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+        CREATE OR REPLACE FUNCTION content_search_vector(
+            p_title TEXT, p_subject TEXT, p_description TEXT, p_mentor_id INTEGER
+        ) RETURNS tsvector AS $$
+            SELECT setweight(to_tsvector('english', COALESCE(p_title, '')), 'A')
+                || setweight(to_tsvector('english', COALESCE(p_subject, '')), 'B')
+                || setweight(to_tsvector('english', COALESCE(p_description, '')), 'C')
+                || setweight(to_tsvector('simple', COALESCE(
+                       (SELECT name || ' ' || surname FROM Mentor WHERE mentor_id = p_mentor_id), '')), 'D')
+        $$ LANGUAGE sql STABLE;
+
+        CREATE OR REPLACE FUNCTION content_search_trigger() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := content_search_vector(NEW.title, NEW.subject, NEW.description, NEW.mentor_id);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS content_search ON Content;
+        CREATE TRIGGER content_search
+            BEFORE INSERT OR UPDATE OF title, subject, description, mentor_id ON Content
+            FOR EACH ROW EXECUTE PROCEDURE content_search_trigger();
+
+        -- Renaming a mentor re-indexes their content
+        CREATE OR REPLACE FUNCTION content_search_mentor_trigger() RETURNS trigger AS $$
+        BEGIN
+            UPDATE Content
+            SET search_vector = content_search_vector(title, subject, description, mentor_id)
+            WHERE mentor_id = NEW.mentor_id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS content_search_mentor ON Mentor;
+        CREATE TRIGGER content_search_mentor
+            AFTER UPDATE OF name, surname ON Mentor
+            FOR EACH ROW
+            WHEN (OLD.name IS DISTINCT FROM NEW.name OR OLD.surname IS DISTINCT FROM NEW.surname)
+            EXECUTE PROCEDURE content_search_mentor_trigger();
+
+        UPDATE Content
+        SET search_vector = content_search_vector(title, subject, description, mentor_id)
+        WHERE search_vector IS NULL;
+
+        CREATE INDEX IF NOT EXISTS content_search_idx ON Content USING GIN (search_vector);
+        CREATE INDEX IF NOT EXISTS content_title_trgm_idx ON Content USING GIN (title gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS content_grade_subject_idx ON Content (grade, subject, upload_date DESC);
+    """),
+    (7, "hot query indexes", """
+        -- Student context: latest (active) enrollment per student
+        CREATE INDEX IF NOT EXISTS enrollment_student_idx
+            ON Enrollment (student_id, enrollment_id DESC);
+        CREATE INDEX IF NOT EXISTS enrollment_student_active_idx
+            ON Enrollment (student_id, enrollment_id DESC) WHERE status = 'active';
+
+        -- Course pages and link lists
+        CREATE INDEX IF NOT EXISTS content_mentor_idx
+            ON Content (mentor_id, upload_date DESC);
+        CREATE INDEX IF NOT EXISTS contentrecord_content_idx
+            ON ContentRecord (content_id, upload_date DESC);
+
+        -- Classes by grade (students), by mentor, and upcoming (admin)
+        CREATE INDEX IF NOT EXISTS class_grade_idx
+            ON Class (grade, upload_date DESC);
+        CREATE INDEX IF NOT EXISTS class_mentor_idx
+            ON Class (mentor_id, start_date DESC, start_time DESC);
+        CREATE INDEX IF NOT EXISTS class_start_idx
+            ON Class (start_date, start_time);
+
+        -- A student's own requests
+        CREATE INDEX IF NOT EXISTS request_student_idx
+            ON Request (student_id, created_at DESC);
+
+        -- Latest registration status
+        CREATE INDEX IF NOT EXISTS notification_type_sent_idx
+            ON Notification (notification_type, date_sent DESC);
+
+        -- Login lookups by email (Student gets a unique index in migration 9)
+        CREATE INDEX IF NOT EXISTS student_email_idx ON Student (email);
+        CREATE INDEX IF NOT EXISTS mentor_email_idx ON Mentor (email);
+        CREATE INDEX IF NOT EXISTS admin_email_idx ON Admin (email);
+    """),
+    (8, "principals view", """
+        -- Room for PBKDF2 hashes where password columns were created narrower
+        -- (must run before the view below depends on the columns)
+        DO $$
+        DECLARE
+            t TEXT;
+        BEGIN
+            FOREACH t IN ARRAY ARRAY['student', 'mentor', 'admin'] LOOP
+                IF EXISTS (
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_schema = current_schema() AND table_name = t
+                      AND column_name = 'password' AND character_maximum_length < 255
+                ) THEN
+                    EXECUTE format('ALTER TABLE %I ALTER COLUMN password TYPE VARCHAR(255)', t);
+                END IF;
+            END LOOP;
+        END;
+        $$;
+
+        -- One login lookup across roles; each branch uses its table's email index
+        CREATE OR REPLACE VIEW principals AS
+            SELECT 1 AS priority, 'student' AS role, student_id::text AS principal_id,
+                   email, password, name, surname, grade, NULL::text AS admin_role,
+                   status = 'active' AS active
+            FROM Student
+            UNION ALL
+            SELECT 2, 'mentor', mentor_id::text,
+                   email, password, name, surname, NULL, NULL,
+                   status = 'active'
+            FROM Mentor
+            UNION ALL
+            SELECT 3, 'admin', admin_id::text,
+                   email, password, name, surname, NULL, role,
+                   TRUE
+            FROM Admin;
+    """),
+    (9, "unique student email", """
+        -- signup relies on this constraint (and the primary key) to reject
+        -- duplicates atomically; fails if duplicate emails already exist
+        CREATE UNIQUE INDEX IF NOT EXISTS student_email_key ON Student (email);
+        DROP INDEX IF EXISTS student_email_idx;
+    """),
+    (10, "uploads", """
+        -- One row per stored blob (uploads.py); files live at static/uploads/<storage_path>
+        CREATE TABLE IF NOT EXISTS uploads (
+            sha256         CHAR(64) PRIMARY KEY,
+            size_bytes     BIGINT NOT NULL,
+            mime_type      VARCHAR(100) NOT NULL,
+            storage_path   TEXT NOT NULL,
+            original_name  VARCHAR(255),
+            created_at     TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+    """),
+]
+
+# Representative hot queries (with sample parameters) that `check` runs through
+# EXPLAIN; a sequential scan on a table larger than SEQ_SCAN_ROWS is reported
+HOT_QUERIES = [
+    ("student context: latest enrollment",
+     "SELECT enrollment_id FROM Enrollment WHERE student_id = %s ORDER BY enrollment_id DESC LIMIT 1",
+     ('0000000000000',)),
+    ("student context: active enrollment",
+     "SELECT enrollment_id FROM Enrollment WHERE student_id = %s AND status = 'active' "
+     "ORDER BY enrollment_id DESC LIMIT 1",
+     ('0000000000000',)),
+    ("course contents by grade and subject",
+     "SELECT content_id FROM Content WHERE subject = %s AND grade = %s ORDER BY upload_date DESC",
+     ('Mathematics', '12')),
+    ("content links for a page",
+     "SELECT content_id, file_link FROM ContentRecord WHERE content_id = ANY(%s) ORDER BY upload_date DESC",
+     ([1, 2, 3],)),
+    ("request board first page",
+     "SELECT request_id FROM Request ORDER BY created_at DESC, request_id DESC LIMIT 26",
+     ()),
+    ("classes for a grade",
+     "SELECT class_id FROM Class WHERE grade = %s ORDER BY upload_date DESC",
+     ('12',)),
+    ("classes for a mentor",
+     "SELECT class_id FROM Class WHERE mentor_id = %s ORDER BY start_date DESC, start_time DESC",
+     (1,)),
+    ("latest registration status",
+     "SELECT message FROM Notification WHERE notification_type = 'registration_status' "
+     "ORDER BY date_sent DESC LIMIT 1",
+     ()),
+    ("login by email",
+     "SELECT role, password FROM principals WHERE email = %s AND active ORDER BY priority",
+     ('someone@example.com',)),
+    ("expired enrollment sweep",
+     "SELECT enrollment_id FROM Enrollment WHERE status = 'active' AND expires_at <= CURRENT_DATE",
+     ()),
+]
+SEQ_SCAN_ROWS = 1000
+
+_CREATE_INDEX = re.compile(
+    r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?IF\s+NOT\s+EXISTS\s+(\w+)\s+ON\s+(\w+)",
+    re.IGNORECASE)
+_DROP_INDEX = re.compile(r"DROP\s+INDEX\s+(?:CONCURRENTLY\s+)?(?:IF\s+EXISTS\s+)?(\w+)", re.IGNORECASE)
+
+
+def _connect():
+    return psycopg2.connect(**connect_kwargs())
+
+
+def _applied(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version     INTEGER PRIMARY KEY,
+            name        TEXT NOT NULL,
+            applied_at  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+
+def upgrade():
+    conn = _connect()
+    try:
+        with conn.cursor() as cur:
+            applied = _applied(cur)
+        conn.commit()
+
+        for version, name, sql in sorted(MIGRATIONS):
+            if version in applied:
+                continue
+            print(f"🔄 Applying migration {version}: {name}")
+            with conn.cursor() as cur:
+                cur.execute(sql)
+                cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                            (version, name))
+            conn.commit()
+        print("✅ Schema is up to date")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def status():
+    conn = _connect()
+    try:
+        with conn.cursor() as cur:
+            applied = _applied(cur)
+        conn.commit()
+        for version, name, _ in sorted(MIGRATIONS):
+            print(f"{'✅' if version in applied else '⏳'} {version:04d} {name}")
+    finally:
+        conn.close()
+
+
+def expected_indexes():
+    """{index name: (table, migration version)} for every index the migrations leave in place."""
+    expected = {}
+    for version, _, sql in sorted(MIGRATIONS):
+        for name, table in _CREATE_INDEX.findall(sql):
+            expected[name.lower()] = (table.lower(), version)
+        for name in _DROP_INDEX.findall(sql):
+            expected.pop(name.lower(), None)
+    return expected
+
+
+def _seq_scans(plan, found):
+    if plan.get('Node Type') == 'Seq Scan':
+        found.append((plan.get('Relation Name'), plan.get('Plan Rows', 0)))
+    for child in plan.get('Plans', []):
+        _seq_scans(child, found)
+    return found
+
+
+def check():
+    """
+    Report indexes the migrations define but the database lacks (or has
+    marked invalid), and hot queries whose plan sequentially scans a large
+    table. Exits non-zero if anything is missing.
+    """
+    conn = _connect()
+    problems = 0
+    try:
+        with conn.cursor() as cur:
+            applied = _applied(cur)
+            pending = [v for v, _, _ in MIGRATIONS if v not in applied]
+            if pending:
+                print(f"⏳ Pending migrations: {', '.join(str(v) for v in sorted(pending))}")
+
+            cur.execute("""
+                SELECT c.relname, i.indisvalid
+                FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = current_schema()
+            """)
+            present = {name: valid for name, valid in cur.fetchall()}
+
+            for name, (table, version) in sorted(expected_indexes().items()):
+                if name not in present:
+                    problems += 1
+                    print(f"❌ Missing index {name} on {table} (migration {version})")
+                elif not present[name]:
+                    problems += 1
+                    print(f"❌ Invalid index {name} on {table}; drop and re-run migration {version}")
+
+            for label, sql, params in HOT_QUERIES:
+                try:
+                    cur.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                except psycopg2.Error as e:
+                    conn.rollback()
+                    print(f"⚠️ Could not plan '{label}': {e.pgerror or e}".strip())
+                    continue
+                plan = cur.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                for table, rows in _seq_scans(plan[0]['Plan'], []):
+                    if rows >= SEQ_SCAN_ROWS:
+                        problems += 1
+                        print(f"❌ '{label}' scans {table} sequentially (~{rows} rows)")
+        conn.rollback()
+    finally:
+        conn.close()
+
+    if problems:
+        print(f"⚠️ {problems} problem(s) found; run `python schema.py upgrade`")
+        sys.exit(1)
+    print("✅ All expected indexes are present")
+
+
+if __name__ == '__main__':
+    commands = {'upgrade': upgrade, 'status': status, 'check': check}
+    if len(sys.argv) != 2 or sys.argv[1] not in commands:
+        print(f"Usage: python schema.py [{'|'.join(commands)}]")
+        sys.exit(2)
+    commands[sys.argv[1]]()
@@ -0,0 +1,93 @@
+# ===========================================================
+# CONTENT SEARCH
+# ===========================================================
+"""
+Full-text and typeahead search over the Content catalog, scoped to a grade.
+
+Content.search_vector is kept current by triggers (schema migration 6).
+It weights title (A), subject (B), description (C) and mentor name (D), and
+renaming a mentor refreshes that mentor's rows. search() matches it with a
+GIN index and ranks the hits with ts_rank_cd. suggest() serves the search
+box: it matches titles on substrings with a pg_trgm GIN index and puts
+prefix matches first.
+"""
+import re
+
+from psycopg2.extras import RealDictCursor
+
+from db import get_cursor
+
+
+SEARCH_LIMIT = 20
+SUGGEST_LIMIT = 8
+MIN_SUGGEST_LENGTH = 2
+MAX_QUERY_LENGTH = 100
+
+
+def normalise(query):
+    """Collapse whitespace and cap the length of a user-supplied query."""
+    return re.sub(r'\s+', ' ', query or '').strip()[:MAX_QUERY_LENGTH]
+
+
+def _like_escape(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search(grade, query, limit=SEARCH_LIMIT):
+    """
+    Ranked full-text matches for `query` within a grade. Accepts web-search
+    syntax ("quoted phrases", -exclusions); the last word also matches as a
+    prefix so "quadratic equ" finds "quadratic equations" while typing.
+    """
+    query = normalise(query)
+    words = re.findall(r'\w+', query)
+    if not words:
+        return []
+
+    cur = get_cursor(RealDictCursor)
+    cur.execute("""
+        WITH q AS (
+            SELECT websearch_to_tsquery('english', %(query)s)
+                   || (plainto_tsquery('english', %(head)s) && to_tsquery('simple', %(prefix)s)) AS query
+        )
+        SELECT C.content_id, C.title, C.description, C.subject, C.type, C.upload_date,
+               M.name AS mentor_name, M.surname AS mentor_surname,
+               ts_rank_cd(C.search_vector, q.query) AS rank
+        FROM Content C
+        CROSS JOIN q
+        LEFT JOIN Mentor M ON C.mentor_id = M.mentor_id
+        WHERE C.grade = %(grade)s AND C.search_vector @@ q.query
+        ORDER BY rank DESC, C.upload_date DESC
+        LIMIT %(limit)s
+    """, {
+        'query': query,
+        'head': ' '.join(words[:-1]),
+        'prefix': f"{words[-1]}:*",
+        'grade': grade,
+        'limit': limit,
+    })
+    return cur.fetchall()
+
+
+def suggest(grade, query, limit=SUGGEST_LIMIT):
+    """Titles containing `query` within a grade, prefix matches first."""
+    query = normalise(query)
+    if len(query) < MIN_SUGGEST_LENGTH:
+        return []
+
+    escaped = _like_escape(query)
+    cur = get_cursor(RealDictCursor)
+    cur.execute("""
+        SELECT content_id, title, subject
+        FROM Content
+        WHERE grade = %(grade)s AND title ILIKE %(contains)s
+        ORDER BY title ILIKE %(prefix)s DESC, similarity(title, %(query)s) DESC, title
+        LIMIT %(limit)s
+    """, {
+        'grade': grade,
+        'contains': f"%{escaped}%",
+        'prefix': f"{escaped}%",
+        'query': query,
+        'limit': limit,
+    })
+    return cur.fetchall()
@@ -0,0 +1,209 @@
+# ===========================================================
+# FINGERPRINTED, PRECOMPRESSED STATIC FILES
+# ===========================================================
+"""
+Long-lived caching for everything under static/.
+
+At boot, build() hashes every file under static/ except uploads/ and maps
+it to a fingerprinted name:
+
+    images/favicon-32x32.png  ->  images/favicon-32x32.3f9c2a71d0be.png
+
+Compressible files (icons, manifest, XML, CSS, JS) also get .gz siblings,
+and .br siblings when the brotli module is installed. These are written
+only when missing or older than the source, so
+`python static_assets.py build` can create them at deploy time. The same
+siblings work with nginx's gzip_static.
+
+init_app() hooks url_for('static', filename=...) so templates pick up the
+fingerprinted name without changing. It also replaces the static view:
+- Fingerprinted URLs are served with `Cache-Control: immutable` for a
+  year, a strong ETag (the content hash) and the best precompressed
+  encoding the client accepts.
+- Content-addressed uploads (named by their SHA-256, see uploads.py) and
+  their image derivatives are immutable too.
+- Uploaded PDFs are not served here at all; see downloads.py.
+- Everything else falls back to Flask's normal static handling.
+In debug mode the URLs are left alone so edited files show up at once.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import sys
+import tempfile
+from collections import namedtuple
+
+from flask import abort, current_app, request, send_file, send_from_directory
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from uploads import FILE_MODE, is_private
+
+
+STATIC_ROOT = "static"
+SKIP_DIRS = ('uploads',)  # written at runtime; new uploads are already content-addressed
+FINGERPRINT_LENGTH = 12
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE = ('.css', '.js', '.json', '.xml', '.svg', '.ico', '.txt', '.webmanifest')
+MIN_SAVING = 0.1  # keep a compressed copy only if it is at least 10% smaller
+
+# (Content-Encoding, file suffix), best first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_CONTENT_ADDRESSED = re.compile(r'^uploads/[0-9a-f]{2}/[0-9a-f]{64}(\.w\d+)?\.\w+$')
+
+Asset = namedtuple('Asset', 'name digest url_name encodings')
+
+_assets = {}     # original name -> Asset
+_by_url = {}     # fingerprinted name -> Asset
+
+
+# ===========================================================
+# BUILD
+# ===========================================================
+def _digest(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _fingerprinted(name, digest):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{digest[:FINGERPRINT_LENGTH]}{ext}"
+
+
+def _write_atomic(path, data):
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.compress-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            out.write(data)
+        os.chmod(temp_path, FILE_MODE)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _compress(path):
+    """Write missing or stale compressed siblings of `path`; return {encoding: path}."""
+    if not path.lower().endswith(COMPRESSIBLE):
+        return {}
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    mtime = os.path.getmtime(path)
+    compressors = {'gzip': lambda d: gzip.compress(d, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressors['br'] = lambda d: brotli.compress(d, quality=11)
+
+    found = {}
+    for encoding, suffix in ENCODINGS:
+        if encoding not in compressors:
+            continue
+        target = path + suffix
+        if not os.path.exists(target) or os.path.getmtime(target) < mtime:
+            compressed = compressors[encoding](data)
+            if len(compressed) > len(data) * (1 - MIN_SAVING):
+                continue
+            _write_atomic(target, compressed)
+        found[encoding] = target
+    return found
+
+
+def build(root=STATIC_ROOT):
+    """Hash and precompress every static file; returns the number of assets."""
+    assets = {}
+    for directory, dirs, files in os.walk(root):
+        if os.path.samefile(directory, root):
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        for filename in files:
+            if filename.startswith('.') or filename.endswith(tuple(s for _, s in ENCODINGS)):
+                continue
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            digest = _digest(path)
+            assets[name] = Asset(name, digest, _fingerprinted(name, digest), _compress(path))
+
+    _assets.clear()
+    _assets.update(assets)
+    _by_url.clear()
+    _by_url.update({asset.url_name: asset for asset in assets.values()})
+    return len(assets)
+
+
+# ===========================================================
+# SERVING
+# ===========================================================
+def _immutable(response):
+    response.headers['Cache-Control'] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    return response
+
+
+def _serve_asset(asset):
+    mimetype = mimetypes.guess_type(asset.name)[0] or 'application/octet-stream'
+
+    for encoding, _ in ENCODINGS:
+        if encoding in asset.encodings and request.accept_encodings[encoding]:
+            response = send_file(asset.encodings[encoding], mimetype=mimetype,
+                                 download_name=os.path.basename(asset.name),
+                                 etag=f"{asset.digest}-{encoding}", conditional=True)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_file(os.path.join(current_app.root_path, STATIC_ROOT, asset.name),
+                             mimetype=mimetype, etag=asset.digest, conditional=True)
+
+    if asset.encodings:
+        response.vary.add('Accept-Encoding')
+    return _immutable(response)
+
+
+def serve(filename):
+    """Replacement for Flask's static view."""
+    asset = _by_url.get(filename)
+    if asset is not None:
+        return _serve_asset(asset)
+
+    if filename.startswith('uploads/') and is_private(filename):
+        abort(404)  # served by downloads.py after an access check
+
+    static_folder = os.path.join(current_app.root_path, STATIC_ROOT)
+    response = send_from_directory(static_folder, filename)
+    if _CONTENT_ADDRESSED.match(filename):
+        _immutable(response)
+    return response
+
+
+def fingerprint(endpoint, values):
+    """url_defaults hook: point url_for('static', ...) at the fingerprinted name."""
+    if endpoint != 'static' or current_app.debug:
+        return
+    asset = _assets.get(values.get('filename'))
+    if asset is not None:
+        values['filename'] = asset.url_name
+
+
+def init_app(app):
+    try:
+        count = build(os.path.join(app.root_path, STATIC_ROOT))
+        print(f"📦 Fingerprinted {count} static files")
+    except OSError as e:
+        print(f"❌ Static asset build failed, serving plain files: {e}")
+    app.url_defaults(fingerprint)
+    app.view_functions['static'] = serve
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] != ['build']:
+        sys.exit("usage: python static_assets.py build")
+    count = build()
+    compressed = sum(1 for asset in _assets.values() if asset.encodings)
+    print(f"✅ {count} static files, {compressed} precompressed")
@@ -0,0 +1,145 @@
+# ===========================================================
+# STUDENT CONTEXT CACHE
+# ===========================================================
+"""
+Short-lived cache of what every student page needs: the Student row plus
+the latest active and latest overall Enrollment.
+
+It is loaded with one query and kept per worker for STUDENT_CONTEXT_TTL
+seconds. Writes that change it call invalidate(); the invalidation is also
+broadcast over NOTIFY so other workers drop their copy on commit.
+"""
+import os
+import threading
+import time
+
+from flask import g
+from psycopg2.extras import RealDictCursor
+
+from db import get_cursor, listener, notify
+from enrollments import days_remaining_sql
+
+
+CHANNEL = "student_context"
+CONTEXT_TTL = float(os.getenv("STUDENT_CONTEXT_TTL", "60"))
+MAX_ENTRIES = int(os.getenv("STUDENT_CONTEXT_MAX_ENTRIES", "5000"))
+ALL = '*'
+DAYS_REMAINING = days_remaining_sql()
+
+# Enrollment columns are prefixed so they can be split back out of the Student row
+_ACTIVE_PREFIX = '_active_'
+_LATEST_PREFIX = '_latest_'
+
+
+class StudentContextCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # student_id -> (expires_at, context)
+        listener.subscribe(CHANNEL, self._on_notify, on_reconnect=self.clear)
+
+    def _on_notify(self, payload):
+        if payload == ALL:
+            self.clear()
+        else:
+            self._drop(payload)
+
+    def _drop(self, student_id):
+        with self._lock:
+            self._entries.pop(str(student_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _load(self, student_id):
+        cur = get_cursor(RealDictCursor)
+        cur.execute(f"""
+            SELECT s.*,
+                   a.enrollment_id   AS _active_enrollment_id,
+                   a.days_remaining  AS _active_days_remaining,
+                   a.status          AS _active_status,
+                   a.last_updated    AS _active_last_updated,
+                   l.enrollment_id   AS _latest_enrollment_id,
+                   l.days_remaining  AS _latest_days_remaining,
+                   l.status          AS _latest_status,
+                   l.last_updated    AS _latest_last_updated
+            FROM Student s
+            LEFT JOIN LATERAL (
+                SELECT enrollment_id, {DAYS_REMAINING} AS days_remaining, status, last_updated
+                FROM Enrollment
+                WHERE student_id = s.student_id AND status = 'active'
+                ORDER BY enrollment_id DESC LIMIT 1
+            ) a ON TRUE
+            LEFT JOIN LATERAL (
+                SELECT enrollment_id, {DAYS_REMAINING} AS days_remaining, status, last_updated
+                FROM Enrollment
+                WHERE student_id = s.student_id
+                ORDER BY enrollment_id DESC LIMIT 1
+            ) l ON TRUE
+            WHERE s.student_id = %s
+        """, (student_id,))
+        row = cur.fetchone()
+        if not row:
+            return None
+
+        student, active, latest = {}, {}, {}
+        for column, value in row.items():
+            if column.startswith(_ACTIVE_PREFIX):
+                active[column[len(_ACTIVE_PREFIX):]] = value
+            elif column.startswith(_LATEST_PREFIX):
+                latest[column[len(_LATEST_PREFIX):]] = value
+            else:
+                student[column] = value
+
+        active = active if active['enrollment_id'] is not None else None
+        latest = latest if latest['enrollment_id'] is not None else None
+        return {
+            'student': student,
+            'active_enrollment': active,
+            'latest_enrollment': latest,
+            'days_remaining': active['days_remaining'] if active else 0,
+        }
+
+    def get(self, student_id):
+        """
+        Return the context for a student, or None if the student does not exist.
+        Memoised on `g` for the rest of the request.
+        """
+        key = str(student_id)
+        memo = g.setdefault('student_contexts', {})
+        if key in memo:
+            return memo[key]
+
+        listener.ensure_started()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and entry[0] > now:
+            context = entry[1]
+        else:
+            context = self._load(student_id)
+            if context is not None:
+                with self._lock:
+                    if len(self._entries) >= MAX_ENTRIES:
+                        # Drop the entry closest to expiry
+                        oldest = min(self._entries, key=lambda k: self._entries[k][0])
+                        self._entries.pop(oldest, None)
+                    self._entries[key] = (now + CONTEXT_TTL, context)
+
+        memo[key] = context
+        return context
+
+    def invalidate(self, cur, student_id=ALL):
+        """
+        Drop a student's context (or everyone's) here and, once the cursor's
+        transaction commits, in every other worker.
+        """
+        if student_id == ALL:
+            self.clear()
+        else:
+            self._drop(student_id)
+        g.pop('student_contexts', None)
+        notify(cur, CHANNEL, str(student_id))
+
+
+student_contexts = StudentContextCache()
@@ -0,0 +1,338 @@
+# ===========================================================
+# STYLESHEET BUNDLES
+# ===========================================================
+"""
+Builds the cached stylesheets the templates link to.
+
+Each page's CSS is kept, readable, in styles/<template>.css. It used to be
+an inline <style> block, downloaded again on every page view.
+`python stylesheets.py build` turns the sources into minified files under
+static/css/, which static_assets.py then fingerprints, precompresses and
+serves as immutable:
+- Shared bundles (static/css/shared/<id>.css) hold rules that appear,
+  byte for byte once minified, in at least SHARED_MIN_PAGES pages. Rules
+  are grouped by the exact set of pages that use them, so a page never
+  links a bundle containing rules it did not have. One download then
+  serves every page in the group.
+- Page files (static/css/pages/<template>.css) hold the rest.
+
+A shared rule is only taken out of a page when moving it ahead of that
+page's own rules cannot change the cascade: no earlier rule in the page
+may set the same property through a selector of equal specificity that
+could match the same element. Rules that fail the check stay in the page
+file too, and the duplicate is harmless.
+
+The build also writes templates/styles/<template>.html, the <link> tags
+each page includes where its <style> block used to be. Edit the sources,
+then rerun the build; `python stylesheets.py check` fails if the outputs
+are out of date.
+"""
+import glob
+import hashlib
+import os
+import re
+import sys
+from collections import namedtuple, defaultdict
+
+
+SOURCE_DIR = "styles"
+CSS_DIR = os.path.join("static", "css")
+LINKS_DIR = os.path.join("templates", "styles")
+SHARED_MIN_PAGES = 3
+SHARED_MIN_BYTES = 384  # smaller groups are not worth an extra request
+
+Rule = namedtuple('Rule', 'text kind name selectors properties')
+
+
+# ===========================================================
+# PARSING AND MINIFYING
+# ===========================================================
+_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_STRING = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''')
+
+
+def _squeeze(text):
+    """Collapse whitespace outside strings."""
+    parts = _STRING.split(text)
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r'\s+', ' ', parts[i])
+    return ''.join(parts).strip()
+
+
+def _minify_selector(prelude):
+    prelude = _squeeze(prelude)
+    prelude = re.sub(r'\s*,\s*', ',', prelude)
+    return re.sub(r'\s*>\s*', '>', prelude)
+
+
+def _minify_declarations(body):
+    declarations = []
+    for declaration in _split_top(body, ';'):
+        name, sep, value = declaration.partition(':')
+        if sep and name.strip():
+            declarations.append(f"{name.strip().lower()}:{_squeeze(value)}")
+    return ';'.join(declarations)
+
+
+def _split_top(text, separator):
+    """Split on `separator` outside strings and parentheses."""
+    parts, depth, start, quote = [], 0, 0, None
+    for i, ch in enumerate(text):
+        if quote:
+            if ch == quote and text[i - 1] != '\\':
+                quote = None
+        elif ch in '"\'':
+            quote = ch
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == separator and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [part for part in parts if part.strip()]
+
+
+def _blocks(css):
+    """Top-level (prelude, body) pairs of a stylesheet."""
+    blocks, depth, start, open_at, quote = [], 0, 0, None, None
+    for i, ch in enumerate(css):
+        if quote:
+            if ch == quote and css[i - 1] != '\\':
+                quote = None
+        elif ch in '"\'':
+            quote = ch
+        elif ch == '{':
+            if depth == 0:
+                open_at = i
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                blocks.append((css[start:open_at], css[open_at + 1:i]))
+                start = i + 1
+    if css[start:].strip():
+        raise ValueError(f"unbalanced CSS near: {css[start:start + 60]!r}")
+    return blocks
+
+
+def parse(css):
+    """Minified Rules of a stylesheet, in source order."""
+    rules = []
+    for prelude, body in _blocks(_COMMENT.sub('', css)):
+        prelude = _squeeze(prelude)
+        if prelude.startswith('@keyframes') or prelude.startswith('@-webkit-keyframes'):
+            frames = ''.join(f"{_minify_selector(p)}{{{_minify_declarations(b)}}}" for p, b in _blocks(body))
+            name = prelude.split(None, 1)[1] if ' ' in prelude else ''
+            rules.append(Rule(f"{prelude}{{{frames}}}", 'keyframes', name, (), frozenset()))
+        elif prelude.startswith('@'):
+            inner = parse(body)
+            text = ''.join(rule.text for rule in inner)
+            rules.append(Rule(f"{prelude}{{{text}}}", 'at', prelude,
+                              tuple(s for rule in inner for s in rule.selectors),
+                              frozenset(p for rule in inner for p in rule.properties)))
+        else:
+            selector = _minify_selector(prelude)
+            declarations = _minify_declarations(body)
+            rules.append(Rule(f"{selector}{{{declarations}}}", 'style', selector,
+                              tuple(_split_top(selector, ',')),
+                              frozenset(_property_root(d.split(':', 1)[0]) for d in declarations.split(';') if d)))
+    return rules
+
+
+# ===========================================================
+# CASCADE SAFETY
+# ===========================================================
+def _property_root(name):
+    if name.startswith('--'):
+        return name
+    name = re.sub(r'^-(webkit|moz|ms|o)-', '', name)
+    return name.split('-', 1)[0]
+
+
+_PSEUDO_ELEMENT = re.compile(r'::?(before|after|first-line|first-letter|placeholder|selection|-webkit-[\w-]+)\b')
+
+
+def _subject(selector):
+    """(tag, id, pseudo-element) of the last compound selector."""
+    compound = re.split(r'[\s>+~]+(?![^()]*\))', selector.strip())[-1]
+    pseudo = _PSEUDO_ELEMENT.search(compound)
+    tag = re.match(r'^[a-zA-Z][\w-]*', compound)
+    element_id = re.search(r'#([\w-]+)', compound)
+    return (tag.group(0).lower() if tag else None,
+            element_id.group(1) if element_id else None,
+            pseudo.group(1) if pseudo else None)
+
+
+def _specificity(selector):
+    selector = re.sub(r':not\(([^)]*)\)', r' \1', selector)
+    selector = re.sub(r'"[^"]*"|\'[^\']*\'|\([^)]*\)', '', selector)
+    pseudo_elements = len(_PSEUDO_ELEMENT.findall(selector))
+    selector = _PSEUDO_ELEMENT.sub('', selector)
+    ids = len(re.findall(r'#[\w-]+', selector))
+    classes = len(re.findall(r'\.[\w-]+|\[[^\]]*\]|:[\w-]+', selector))
+    types = len(re.findall(r'(?:^|[\s>+~(])([a-zA-Z][\w-]*)', selector))
+    return ids, classes, types + pseudo_elements
+
+
+def _may_match_same(a, b):
+    tag_a, id_a, pseudo_a = _subject(a)
+    tag_b, id_b, pseudo_b = _subject(b)
+    if pseudo_a != pseudo_b:
+        return False
+    if tag_a and tag_b and tag_a != tag_b:
+        return False
+    if id_a and id_b and id_a != id_b:
+        return False
+    return True
+
+
+def conflicts(a, b):
+    """Could swapping the order of rules a and b change what a page looks like?"""
+    if a.kind == 'keyframes' or b.kind == 'keyframes':
+        return a.kind == b.kind and a.name == b.name
+    if not a.properties & b.properties:
+        return False
+    # Order only decides between declarations of equal specificity
+    return any(_specificity(x) == _specificity(y) and _may_match_same(x, y)
+               for x in a.selectors for y in b.selectors)
+
+
+# ===========================================================
+# BUNDLING
+# ===========================================================
+def _bundle_id(pages):
+    return hashlib.sha256('\n'.join(sorted(pages)).encode('utf-8')).hexdigest()[:10]
+
+
+def plan(sources):
+    """
+    Split {page: css} into shared bundles and page remnants.
+    Returns (bundles, pages): bundles maps id -> [rule text], pages maps
+    page -> (bundle ids in link order, [remaining rule text]).
+    """
+    parsed = {page: parse(css) for page, css in sources.items()}
+
+    users = defaultdict(set)
+    for page, rules in parsed.items():
+        for rule in rules:
+            users[rule.text].add(page)
+
+    # Group shared rules by the exact set of pages using them
+    groups = defaultdict(list)
+    for page in sorted(parsed):
+        for rule in parsed[page]:
+            pages = frozenset(users[rule.text])
+            if len(pages) >= SHARED_MIN_PAGES and rule.text not in groups[pages]:
+                groups[pages].append(rule.text)
+    bundles = {_bundle_id(pages): (pages, texts) for pages, texts in groups.items()
+               if sum(len(t) for t in texts) >= SHARED_MIN_BYTES}
+    bundle_of = {text: bundle_id for bundle_id, (_, texts) in bundles.items() for text in texts}
+
+    result = {}
+    for page, rules in parsed.items():
+        counts = defaultdict(int)
+        for rule in rules:
+            counts[rule.text] += 1
+
+        linked = []
+        for rule in rules:
+            bundle_id = bundle_of.get(rule.text)
+            if bundle_id and bundle_id not in linked:
+                linked.append(bundle_id)
+        bundle_position = {}
+        for bundle_id in linked:
+            for text in bundles[bundle_id][1]:
+                bundle_position[text] = len(bundle_position)
+
+        keep = {i for i, rule in enumerate(rules) if rule.text not in bundle_of or counts[rule.text] > 1}
+
+        # Keep any moved rule that would now land before a conflicting rule it used to follow
+        changed = True
+        while changed:
+            changed = False
+            for j, later in enumerate(rules):
+                if j in keep:
+                    continue
+                for i in range(j):
+                    earlier = rules[i]
+                    if not conflicts(earlier, later):
+                        continue
+                    if i in keep or bundle_position[earlier.text] > bundle_position[later.text]:
+                        keep.add(j)
+                        changed = True
+                        break
+
+        result[page] = (linked, [rule.text for i, rule in enumerate(rules) if i in keep])
+
+    return {bundle_id: texts for bundle_id, (_, texts) in bundles.items()}, result
+
+
+# ===========================================================
+# BUILD
+# ===========================================================
+def _sources():
+    return {os.path.splitext(os.path.basename(path))[0]: open(path, encoding='utf-8').read()
+            for path in sorted(glob.glob(os.path.join(SOURCE_DIR, '*.css')))}
+
+
+def _link(filename):
+    return f'<link rel="stylesheet" href="{{{{ url_for(\'static\', filename=\'css/{filename}\') }}}}">'
+
+
+def outputs():
+    """{path: content} for every generated file."""
+    bundles, pages = plan(_sources())
+    files = {}
+    for bundle_id, texts in bundles.items():
+        files[os.path.join(CSS_DIR, 'shared', f"{bundle_id}.css")] = '\n'.join(texts) + '\n'
+    for page, (linked, texts) in sorted(pages.items()):
+        links = [_link(f"shared/{bundle_id}.css") for bundle_id in linked]
+        if texts:
+            files[os.path.join(CSS_DIR, 'pages', f"{page}.css")] = '\n'.join(texts) + '\n'
+            links.append(_link(f"pages/{page}.css"))
+        files[os.path.join(LINKS_DIR, f"{page}.html")] = (
+            f"{{# Generated by `python stylesheets.py build` from styles/{page}.css #}}\n" + '\n'.join(links) + '\n')
+    return files
+
+
+def _stale(files):
+    generated = set(glob.glob(os.path.join(CSS_DIR, 'shared', '*.css'))
+                    + glob.glob(os.path.join(CSS_DIR, 'pages', '*.css'))
+                    + glob.glob(os.path.join(LINKS_DIR, '*.html')))
+    return sorted(generated - set(files))
+
+
+def build():
+    files = outputs()
+    for path, content in files.items():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+    for path in _stale(files):
+        os.remove(path)
+
+    source_bytes = sum(len(css) for css in _sources().values())
+    shared = [p for p in files if os.sep + 'shared' + os.sep in p]
+    print(f"✅ {len(_sources())} pages, {len(shared)} shared bundles, "
+          f"{source_bytes // 1024} KB of inline CSS moved out of the HTML")
+
+
+def check():
+    files = outputs()
+    problems = [path for path, content in files.items()
+                if not os.path.exists(path) or open(path, encoding='utf-8').read() != content]
+    problems += _stale(files)
+    for path in problems:
+        print(f"❌ Out of date: {path}")
+    if problems:
+        sys.exit("Run `python stylesheets.py build`")
+    print("✅ Stylesheets are up to date")
+
+
+if __name__ == '__main__':
+    commands = {'build': build, 'check': check}
+    if len(sys.argv) != 2 or sys.argv[1] not in commands:
+        sys.exit("usage: python stylesheets.py build|check")
+    commands[sys.argv[1]]()
@@ -0,0 +1,131 @@
+# ===========================================================
+# UPLOAD STORAGE (STREAMED, CONTENT-ADDRESSED)
+# ===========================================================
+"""
+Every upload route saves files through store().
+
+The upload is copied to disk in chunks while it is hashed, so memory use
+does not grow with file size, and it is abandoned as soon as it passes the
+size limit. The file type is taken from its first bytes rather than from
+the name the browser sent. Files are stored under their SHA-256, as
+static/uploads/<first two hex digits>/<hash>.<ext>, so identical uploads
+share one file and different files with the same name can no longer
+overwrite each other. Each stored file gets a row in the uploads table
+(schema migration 10) recording its hash, size, MIME type and first name.
+"""
+import hashlib
+import os
+import tempfile
+from collections import namedtuple
+
+import metrics
+
+
+UPLOAD_ROOT = os.path.join("static", "uploads")
+CHUNK_SIZE = 64 * 1024
+FILE_MODE = 0o644
+
+MB = 1024 * 1024
+MAX_PDF_BYTES = 25 * MB
+MAX_IMAGE_BYTES = 5 * MB
+
+# MIME type -> (magic prefix, stored extension)
+_SIGNATURES = {
+    'application/pdf': (b'%PDF-', 'pdf'),
+    'image/png': (b'\x89PNG\r\n\x1a\n', 'png'),
+    'image/jpeg': (b'\xff\xd8\xff', 'jpg'),
+    'image/gif': (b'GIF8', 'gif'),
+}
+PDF_TYPES = frozenset({'application/pdf'})
+IMAGE_TYPES = frozenset({'image/png', 'image/jpeg', 'image/gif'})
+
+
+class UploadError(Exception):
+    """An upload was rejected; the message is safe to show to the user."""
+
+
+class StoredUpload(namedtuple('StoredUpload', 'sha256 size mime_type name original_name')):
+    """`name` is the path under static/uploads, e.g. 'ab/abcd….pdf'."""
+
+    @property
+    def path(self):
+        return os.path.join(UPLOAD_ROOT, self.name)
+
+    @property
+    def url(self):
+        return f"/static/uploads/{self.name}"
+
+    @property
+    def size_mb(self):
+        return round(self.size / MB, 2)
+
+
+def is_private(name):
+    """PDFs are only served through the access-checked routes in downloads.py."""
+    return name.lower().endswith('.pdf')
+
+
+def _sniff(head):
+    for mime_type, (magic, _) in _SIGNATURES.items():
+        if head.startswith(magic):
+            return mime_type
+    return None
+
+
+def store(cur, file, allowed_types, max_bytes):
+    """
+    Stream a werkzeug FileStorage into content-addressed storage and record
+    it with `cur` (it commits with the caller's transaction). Returns a
+    StoredUpload, or raises UploadError.
+    """
+    if not file or not file.filename:
+        raise UploadError("No file was uploaded.")
+
+    os.makedirs(UPLOAD_ROOT, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    mime_type = None
+
+    fd, temp_path = tempfile.mkstemp(dir=UPLOAD_ROOT, prefix='.incoming-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if size == 0:
+                    mime_type = _sniff(chunk)
+                    if mime_type not in allowed_types:
+                        raise UploadError("Unsupported file type.")
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadError(f"File exceeds the {max_bytes // MB}MB limit.")
+                digest.update(chunk)
+                out.write(chunk)
+
+        if size == 0:
+            raise UploadError("The uploaded file is empty.")
+
+        sha256 = digest.hexdigest()
+        name = f"{sha256[:2]}/{sha256}.{_SIGNATURES[mime_type][1]}"
+        final_path = os.path.join(UPLOAD_ROOT, name)
+        if os.path.exists(final_path):
+            os.remove(temp_path)  # already stored: deduplicated
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.chmod(temp_path, FILE_MODE)  # mkstemp creates 0600; static files must be world-readable
+            os.replace(temp_path, final_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    original_name = os.path.basename(file.filename)[:255]
+    cur.execute("""
+        INSERT INTO uploads (sha256, size_bytes, mime_type, storage_path, original_name)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (sha256) DO NOTHING
+    """, (sha256, size, mime_type, name, original_name))
+
+    metrics.observe_upload(_SIGNATURES[mime_type][1], size)
+    return StoredUpload(sha256, size, mime_type, name, original_name)